@@ -0,0 +1,514 @@
+import numpy as np
+import pygame
+from settings import *
+from player import Player
+from simulation import Simulation, rect_distance, blast_damage
+from weapons import weapon_table
+from game_objects import projectile_pool
+from spatial_hash import CellIndex
+from nav import CPU_SPEED, RUN_SPEED
+
+# Arena CPUs share a small palette so their baked sprites stay cached
+ARENA_PALETTE = [(255, 120, 120), (120, 200, 255), (140, 255, 140), (255, 220, 100),
+                 (220, 140, 255), (255, 170, 80), (120, 255, 230), (200, 200, 200)]
+CPU_WIDTH = 40
+CPU_HEIGHT = 60
+ATTACK_CHANCE = 0.06
+# Up to this many platforms, one array test per platform beats a lookup per CPU in the map's index
+ARENA_SCAN_PLATFORMS = 32
+
+class WeaponArrays:
+    """weapon_table as arrays indexed by the same weapon ids, for vectorized lookups"""
+    def __init__(self):
+        weapons = weapon_table.weapons
+        self.names = [w.name for w in weapons]
+        self.ids = dict(weapon_table.ids)
+        self.damage = np.array([w.damage for w in weapons], np.float64)
+        self.melee = np.array([w.melee for w in weapons], bool)
+        self.gravity = np.array([w.gravity for w in weapons], np.float64)
+        self.blast_radius = np.array([w.blast_radius for w in weapons], np.float64)
+        # Same rules as Simulation.update_cpu and perform_attack
+        self.desired_range = np.array([w.range if w.melee else 300 for w in weapons], np.float64)
+        self.cooldown = np.array([max(200, 2000 // w.speed) * 1.5 for w in weapons], np.float64)
+        self.colors = [w.color for w in weapons]
+
+
+class ArenaSimulation(Simulation):
+    """Simulation for 100s of CPUs, with the CPUs and their shots in NumPy arrays.
+
+    The player is still a regular Player run by the Simulation code. Every
+    CPU's AI, gravity, platform landing and attacks run as a handful of
+    array operations per tick instead of a Python loop over objects. CPU
+    shots only hit the player; the player's shots stay Projectile objects
+    and are tested against all CPUs at once.
+    """
+    def __init__(self, player, seed=None, effects=True, particles=None):
+        self.weapons = WeaponArrays()
+        self.np_rng = np.random.default_rng(seed)
+        super().__init__(player, seed, effects, particles)
+        self.ai_target = Player("Target") # Stand-in for the closest CPU when the AI plays
+        # Radius queries for blasts, built on the first blast of a tick
+        self.cpu_index = CellIndex()
+        self.shot_index = CellIndex()
+        self.clear_cpus()
+        self.clear_shots()
+
+    def clear_cpus(self):
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.prev_x = np.zeros(0)
+        self.prev_y = np.zeros(0)
+        self.vx = np.zeros(0)
+        self.vy = np.zeros(0)
+        self.hp = np.zeros(0)
+        self.cooldown = np.zeros(0) # ms until the next attack is allowed, after last_attack
+        self.last_attack = np.zeros(0)
+        self.weapon = np.zeros(0, np.int16)
+        self.on_ground = np.zeros(0, bool)
+        self.facing_right = np.zeros(0, bool)
+        self.attacking = np.zeros(0, bool)
+        self.color = np.zeros(0, np.int8) # Index into the arena palette
+        self.nav_node = np.zeros(0, np.intp) # Platform last stood on, -1 before landing
+
+    def clear_shots(self):
+        capacity = ARENA_PROJECTILE_CAPACITY
+        self.shot_count = 0
+        self.shot_x = np.zeros(capacity)
+        self.shot_y = np.zeros(capacity)
+        self.shot_prev_x = np.zeros(capacity)
+        self.shot_prev_y = np.zeros(capacity)
+        self.shot_vx = np.zeros(capacity)
+        self.shot_vy = np.zeros(capacity)
+        self.shot_gravity = np.zeros(capacity)
+        self.shot_life = np.zeros(capacity, np.int16)
+        self.shot_weapon = np.zeros(capacity, np.int16)
+        self.shot_fields = [self.shot_x, self.shot_y, self.shot_prev_x, self.shot_prev_y, self.shot_vx,
+                            self.shot_vy, self.shot_gravity, self.shot_life, self.shot_weapon]
+
+    def cpu_fields(self):
+        return ["x", "y", "prev_x", "prev_y", "vx", "vy", "hp", "cooldown", "last_attack",
+                "weapon", "on_ground", "facing_right", "attacking", "color", "nav_node"]
+
+    @property
+    def cpu_count(self):
+        return len(self.x)
+
+    @property
+    def projectile_count(self):
+        return len(self.projectiles) + self.shot_count
+
+    def start(self, num_cpus, cpu_weapon=None, seed=None):
+        super().start(0, cpu_weapon, seed)
+        if seed is not None:
+            self.np_rng = np.random.default_rng(seed)
+        self.clear_shots()
+
+        n = num_cpus
+        rng = self.np_rng
+        weapon_name = cpu_weapon or self.player.current_weapon_name
+        # Spread out along the top of the screen, away from the player's corner
+        self.x = rng.uniform(200, self.world_width - CPU_WIDTH, n)
+        self.y = rng.uniform(0, HEIGHT / 3, n)
+        self.prev_x = self.x.copy()
+        self.prev_y = self.y.copy()
+        self.vx = np.zeros(n)
+        self.vy = np.zeros(n)
+        self.hp = np.full(n, float(ARENA_CPU_HP))
+        self.cooldown = np.zeros(n)
+        self.last_attack = np.zeros(n)
+        self.weapon = np.full(n, self.weapons.ids[weapon_name], np.int16)
+        self.on_ground = np.zeros(n, bool)
+        self.facing_right = np.zeros(n, bool)
+        self.attacking = np.zeros(n, bool)
+        self.color = rng.integers(0, len(ARENA_PALETTE), n).astype(np.int8)
+        self.nav_node = np.full(n, -1, np.intp)
+
+    def step(self, player_input=None):
+        if self.result:
+            return
+
+        if player_input is None:
+            self.update_ai_player()
+        else:
+            self.update_player(player_input)
+
+        if not self.result:
+            self.update_cpus()
+        self.update_projectiles()
+        if not self.result:
+            self.update_shots()
+
+        self.particles.update()
+
+        self.end_tick()
+
+    # --- The player ---
+
+    def closest_cpu_index(self):
+        if not self.cpu_count:
+            return None
+        return int(np.argmin(np.abs(self.x + CPU_WIDTH / 2 - self.player.rect.centerx)))
+
+    def update_ai_player(self):
+        """Drive the player with the CPU AI against the closest arena CPU"""
+        i = self.closest_cpu_index()
+        target = None
+        if i is not None:
+            target = self.ai_target
+            target.rect.topleft = (int(self.x[i]), int(self.y[i]))
+            target.on_ground = bool(self.on_ground[i])
+            target.nav_node = int(self.nav_node[i]) if self.nav_node[i] >= 0 else None
+        self.update_cpu(self.player, target)
+
+    def perform_attack(self, attacker):
+        if not attacker.current_weapon.melee:
+            super().perform_attack(attacker) # A Projectile, handled by update_projectiles
+            return
+        # Melee: same cooldown rules, but the hit box is tested against every CPU at once
+        if not self.start_attack(attacker):
+            return
+        weapon = attacker.current_weapon
+
+        hit_box = attacker.rect.copy()
+        hit_box.x += hit_box.width if attacker.facing_right else -hit_box.width
+        hits = self.overlapping(hit_box)
+        if len(hits):
+            self.hp[hits] -= weapon.damage
+            # Knockback
+            self.x[hits] += np.where(self.x[hits] + CPU_WIDTH / 2 > attacker.rect.centerx, 10, -10)
+            self.remove_dead()
+
+    def overlapping(self, rect):
+        """Indices of the CPUs whose rect overlaps rect"""
+        mask = ((self.x < rect.right) & (self.x + CPU_WIDTH > rect.left) &
+                (self.y < rect.bottom) & (self.y + CPU_HEIGHT > rect.top))
+        return np.nonzero(mask)[0]
+
+    def update_projectiles(self):
+        """The player's shots, each checked against all CPUs"""
+        alive = []
+        blasts = []
+        for p in self.projectiles:
+            if not p.update(self.world_width, self.world_height):
+                projectile_pool.release(p)
+                continue
+            hit = False
+            hits = self.overlapping(p.rect)
+            if len(hits):
+                hit = True
+                if not p.blast_radius:
+                    i = hits[0]
+                    self.hp[i] -= p.damage
+                    self.spawn_explosion(p.x, p.y, p.color)
+                    self.remove_dead()
+            else:
+                plats = self.platform_grid.cells.get((p.rect.x // self.platform_grid.cell_size,
+                                                      p.rect.y // self.platform_grid.cell_size))
+                if plats:
+                    for plat in plats:
+                        if p.rect.colliderect(plat.rect):
+                            if not p.blast_radius:
+                                self.spawn_explosion(p.x, p.y, GRAY)
+                            hit = True
+                            break
+            if not hit:
+                alive.append(p)
+            elif p.blast_radius:
+                blasts.append(p)
+            else:
+                projectile_pool.release(p)
+            if self.result:
+                break
+        if blasts:
+            alive = self.explode(blasts, alive)
+        self.projectiles = alive
+
+    def remove_dead(self):
+        dead = self.hp <= 0
+        if not dead.any():
+            return
+        for i in np.nonzero(dead)[0]:
+            self.player.coins += WIN_REWARD
+            self.spawn_explosion(self.x[i] + CPU_WIDTH / 2, self.y[i] + CPU_HEIGHT / 2, RED)
+        keep = ~dead
+        for name in self.cpu_fields():
+            setattr(self, name, getattr(self, name)[keep])
+        if not self.cpu_count:
+            self.result = "win"
+
+    # --- CPUs, all at once ---
+
+    def update_cpus(self):
+        n = self.cpu_count
+        if not n:
+            return
+        weapons = self.weapons
+        target = self.player.rect
+        rng = self.np_rng
+
+        # Face the player, walk into weapon range and back off when too close
+        center = self.x + CPU_WIDTH / 2
+        dist = np.abs(center - target.centerx)
+        self.facing_right = center < target.centerx
+        toward = np.where(self.facing_right, CPU_SPEED, -CPU_SPEED)
+        desired = weapons.desired_range[self.weapon]
+        self.vx = np.where(dist > desired, toward, np.where(dist < desired - 100, -toward, 0.0))
+        self.follow_routes()
+
+        self.update_cpu_physics()
+
+        # Attack
+        ready = self.time - self.last_attack >= self.cooldown
+        attack = (dist < desired + 50) & (rng.random(n) < ATTACK_CHANCE) & ready
+        attackers = np.nonzero(attack)[0]
+        if len(attackers):
+            self.last_attack[attackers] = self.time
+            self.attacking[attackers] = True
+            self.cooldown[attackers] = weapons.cooldown[self.weapon[attackers]]
+            melee = weapons.melee[self.weapon[attackers]]
+            if melee.any():
+                self.melee_attacks(attackers[melee])
+            if (~melee).any():
+                self.spawn_shots(attackers[~melee])
+
+        self.attacking &= self.time - self.last_attack <= ATTACK_POSE_MS
+
+    def follow_routes(self):
+        """CPUs on another platform than the player take the next edge of their nav path, like Simulation.route"""
+        nav = self.nav
+        goal = nav.locate(self.player)
+        if goal is None:
+            return
+        nodes = self.nav_node
+        placed = nodes >= 0
+        hops, searched = self.routes.hops(goal, np.unique(nodes[placed]), self.nav_searches)
+        self.nav_searches -= searched
+        nodes = np.where(placed, nodes, goal) # Nothing to follow until they've landed somewhere
+        follow = hops.has[nodes]
+        if not follow.any():
+            return
+        left = hops.left[nodes]
+        right = hops.right[nodes]
+        ground = self.on_ground
+        # Walk to the takeoff spot of a jump, then jump; walk and drop edges (and jumps in the air) keep going their way
+        outside = ground & hops.jump[nodes] & ((self.x < left) | (self.x > right))
+        vx = np.where(outside, np.where(self.x < (left + right) / 2, RUN_SPEED, -RUN_SPEED),
+                      hops.direction[nodes] * RUN_SPEED)
+        self.vx = np.where(follow, vx, self.vx)
+        self.vy[follow & ground & hops.jump[nodes] & ~outside] = -JUMP_SPEED
+
+    def update_cpu_physics(self):
+        self.prev_x = self.x.copy()
+        self.prev_y = self.y.copy()
+
+        # Apply Gravity
+        self.vy += self.GRAVITY
+        self.y += self.vy
+        bottom = self.y + CPU_HEIGHT
+        falling = self.vy > 0
+        on_ground = np.zeros(len(self.y), bool)
+
+        # Land on platforms, same test as Platform.check_collision
+        left = self.x
+        right = self.x + CPU_WIDTH
+        if len(self.platforms) <= ARENA_SCAN_PLATFORMS:
+            for node, plat in enumerate(self.platforms):
+                landed = (falling & (right >= plat.x) & (left <= plat.x + plat.width) &
+                          (bottom >= plat.y) & (bottom <= plat.y + plat.height + np.abs(self.vy) + 5))
+                self.y[landed] = plat.y - CPU_HEIGHT
+                bottom[landed] = plat.y
+                on_ground |= landed
+                self.nav_node[landed] = node
+        else:
+            landing = self.collision.landing
+            node_of = self.nav.node_ids
+            for i in np.nonzero(falling)[0].tolist():
+                plat = landing(left[i], right[i], bottom[i], self.vy[i])
+                if plat:
+                    self.y[i] = plat.y - CPU_HEIGHT
+                    bottom[i] = plat.y
+                    on_ground[i] = True
+                    self.nav_node[i] = node_of[id(plat)]
+        # Keep in bounds
+        below = bottom > self.world_height
+        self.y[below] = self.world_height - CPU_HEIGHT
+        on_ground |= below
+        self.nav_node[below] = self.nav.floor
+        self.vy[on_ground] = 0
+        self.on_ground = on_ground
+
+        self.x += self.vx
+        np.clip(self.x, 0, self.world_width - CPU_WIDTH, out=self.x)
+
+    def melee_attacks(self, attackers):
+        player = self.player
+        target = player.rect
+        hit_x = self.x[attackers] + np.where(self.facing_right[attackers], CPU_WIDTH, -CPU_WIDTH)
+        hit_y = self.y[attackers]
+        hits = attackers[(hit_x < target.right) & (hit_x + CPU_WIDTH > target.left) &
+                         (hit_y < target.bottom) & (hit_y + CPU_HEIGHT > target.top)]
+        for i in hits:
+            player.take_damage(self.weapons.damage[self.weapon[i]])
+            # Knockback
+            player.rect.x += 10 if self.x[i] + CPU_WIDTH / 2 < target.centerx else -10
+            if player.hp <= 0:
+                self.handle_kill(None, player)
+                return
+
+    def spawn_shots(self, shooters):
+        room = ARENA_PROJECTILE_CAPACITY - self.shot_count
+        shooters = shooters[:room]
+        k = len(shooters)
+        if not k:
+            return
+        start, end = self.shot_count, self.shot_count + k
+        right = self.facing_right[shooters]
+        # Spawn at weapon position with a slight arc up
+        self.shot_x[start:end] = np.where(right, self.x[shooters] + CPU_WIDTH, self.x[shooters])
+        self.shot_y[start:end] = self.y[shooters] + CPU_HEIGHT / 2
+        self.shot_prev_x[start:end] = self.shot_x[start:end]
+        self.shot_prev_y[start:end] = self.shot_y[start:end]
+        self.shot_vx[start:end] = np.where(right, 10, -10)
+        self.shot_vy[start:end] = -2
+        self.shot_weapon[start:end] = self.weapon[shooters]
+        self.shot_gravity[start:end] = self.weapons.gravity[self.weapon[shooters]]
+        self.shot_life[start:end] = PROJECTILE_LIFE
+        self.shot_count = end
+
+    def update_shots(self):
+        n = self.shot_count
+        if not n:
+            return
+        x, y = self.shot_x[:n], self.shot_y[:n]
+        self.shot_prev_x[:n] = x
+        self.shot_prev_y[:n] = y
+        x += self.shot_vx[:n]
+        y += self.shot_vy[:n]
+        self.shot_vy[:n] += self.shot_gravity[:n]
+        self.shot_life[:n] -= 1
+        # Projectile rects are whole pixels
+        left = np.trunc(x)
+        top = np.trunc(y)
+        gone = (self.shot_life[:n] <= 0) | (y > self.world_height) | (x < 0) | (x > self.world_width)
+
+        explosive = self.weapons.blast_radius[self.shot_weapon[:n]] > 0
+
+        # Hits on the player
+        target = self.player.rect
+        hit = ~gone & (left < target.right) & (left + PROJECTILE_SIZE > target.left) & \
+              (top < target.bottom) & (top + PROJECTILE_SIZE > target.top)
+        for i in np.nonzero(hit & ~explosive)[0]:
+            self.player.take_damage(self.weapons.damage[self.shot_weapon[i]])
+            self.spawn_explosion(x[i], y[i], self.weapons.colors[self.shot_weapon[i]])
+            if self.player.hp <= 0:
+                self.handle_kill(None, self.player)
+                break
+
+        # Platform collision
+        blocked = np.zeros(n, bool)
+        if len(self.platforms) <= ARENA_SCAN_PLATFORMS:
+            for plat in self.platforms:
+                blocked |= ((left < plat.rect.right) & (left + PROJECTILE_SIZE > plat.rect.left) &
+                            (top < plat.rect.bottom) & (top + PROJECTILE_SIZE > plat.rect.top))
+        else:
+            query = self.platform_grid.query_point
+            for i in np.nonzero(~gone & ~hit)[0].tolist():
+                shot = pygame.Rect(left[i], top[i], PROJECTILE_SIZE, PROJECTILE_SIZE)
+                blocked[i] = any(shot.colliderect(plat.rect) for plat in query(left[i], top[i]))
+        blocked &= ~gone & ~hit
+        for i in np.nonzero(blocked & ~explosive)[0]:
+            self.spawn_explosion(x[i], y[i], GRAY)
+        blasting = np.nonzero((hit | blocked) & explosive)[0]
+        if len(blasting) and not self.result:
+            self.projectiles = self.explode([], self.projectiles, blasting)
+
+        # Compact the survivors to the front (explode zeroes the life of shots it set off)
+        keep = ~(gone | hit | blocked) & (self.shot_life[:n] > 0)
+        live = int(keep.sum())
+        if live < n:
+            for field in self.shot_fields:
+                field[:live] = field[:n][keep]
+        self.shot_count = live
+
+    # --- Blasts ---
+
+    def explode(self, blasts, projectiles, shots=()):
+        """Set off the player's explosives in `blasts` and the CPU shots at indices `shots`.
+
+        The player's blasts hurt CPUs and the CPUs' blasts hurt the player;
+        either kind sets off any explosive of both kinds it reaches. Returns
+        what's left of `projectiles`.
+        """
+        grid = self.blast_grid
+        grid.clear()
+        for p in projectiles:
+            if p.blast_radius:
+                grid.insert(p, p.rect)
+        n = self.shot_count
+        explosive = self.weapons.blast_radius[self.shot_weapon[:n]] > 0
+        live_shots = explosive.copy() # Explosive CPU shots that haven't gone off
+        live_shots[np.asarray(shots, np.intp)] = False
+        bombs = np.nonzero(live_shots)[0]
+        if len(bombs):
+            self.shot_index.build(self.shot_x[bombs], self.shot_y[bombs], self.world_width)
+        if self.cpu_count:
+            self.cpu_index.build(self.x, self.y, self.world_width)
+
+        queue = [self.projectile_blast(p) for p in blasts] + [self.shot_blast(i) for i in shots]
+        detonated = set(blasts)
+        player = self.player
+        waves = []
+        for x, y, radius, damage, color, players in queue: # Grows as blasts set off other explosives
+            if players:
+                near = self.cpu_index.query(x - radius - CPU_WIDTH, y - radius - CPU_HEIGHT, x + radius, y + radius)
+                if len(near):
+                    left = self.x[near]
+                    top = self.y[near]
+                    dx = np.maximum(np.maximum(left - x, x - (left + CPU_WIDTH)), 0)
+                    dy = np.maximum(np.maximum(top - y, y - (top + CPU_HEIGHT)), 0)
+                    distance = np.hypot(dx, dy)
+                    inside = distance <= radius
+                    self.hp[near[inside]] -= blast_damage(damage, distance[inside], radius)
+            elif player.hp > 0:
+                distance = rect_distance(player.rect, x, y)
+                if distance <= radius:
+                    player.take_damage(blast_damage(damage, distance, radius))
+
+            # Chain reactions
+            for other in grid.query_radius(x, y, radius):
+                if other not in detonated and rect_distance(other.rect, x, y) <= radius:
+                    detonated.add(other)
+                    queue.append(self.projectile_blast(other))
+            if len(bombs):
+                near = bombs[self.shot_index.query(x - radius - PROJECTILE_SIZE, y - radius - PROJECTILE_SIZE,
+                                                   x + radius, y + radius)]
+                near = near[live_shots[near]]
+                if len(near):
+                    left = np.trunc(self.shot_x[near])
+                    top = np.trunc(self.shot_y[near])
+                    dx = np.maximum(np.maximum(left - x, x - (left + PROJECTILE_SIZE)), 0)
+                    dy = np.maximum(np.maximum(top - y, y - (top + PROJECTILE_SIZE)), 0)
+                    caught = near[np.hypot(dx, dy) <= radius]
+                    live_shots[caught] = False
+                    queue.extend(self.shot_blast(i) for i in caught.tolist())
+            waves.append((x, y, radius, color))
+
+        if self.effects:
+            self.particles.spawn_shockwaves(waves)
+        self.shot_life[:n][explosive & ~live_shots] = 0
+        for p in detonated:
+            projectile_pool.release(p)
+        self.remove_dead()
+        if player.hp <= 0:
+            self.handle_kill(None, player)
+        return [p for p in projectiles if p not in detonated]
+
+    def projectile_blast(self, p):
+        """(x, y, radius, damage, color, the player's) for a blast from one of the player's projectiles"""
+        return (p.rect.centerx, p.rect.centery, p.blast_radius, p.damage, p.color, True)
+
+    def shot_blast(self, i):
+        weapon = self.shot_weapon[i]
+        weapons = self.weapons
+        return (int(self.shot_x[i]) + PROJECTILE_SIZE // 2, int(self.shot_y[i]) + PROJECTILE_SIZE // 2,
+                weapons.blast_radius[weapon], weapons.damage[weapon], weapons.colors[weapon], False)
@@ -0,0 +1,97 @@
+"""Run CPU-vs-CPU battles headless and report win rates per weapon.
+
+    python batch_sim.py --matches 5000 --workers 4 --seed 1
+"""
+import argparse
+import multiprocessing
+import random
+import time
+from settings import *
+from player import Player
+from simulation import Simulation
+
+MAX_MATCH_TICKS = TICK_RATE * 120 # Call it a draw after two simulated minutes
+
+def run_match(sim, weapon_a, weapon_b, num_cpus, seed=None):
+    """Play one match, returns "a", "b" or "draw" """
+    player = sim.player
+    if weapon_a not in player.inventory:
+        player.inventory.append(weapon_a)
+    player.equip_weapon(weapon_a)
+    sim.start(num_cpus, cpu_weapon=weapon_b, seed=seed)
+
+    while not sim.result and sim.tick_count < MAX_MATCH_TICKS:
+        sim.step()
+
+    if sim.result == "win":
+        return "a"
+    if sim.result == "loss":
+        return "b"
+    return "draw"
+
+def run_batch(args):
+    """Worker entry point, plays `count` matches from its own seed"""
+    seed, count, num_cpus = args
+    rng = random.Random(seed)
+    weapons = list(WEAPONS_DATA)
+    sim = Simulation(Player("Side A", is_cpu=True), seed=seed, effects=False)
+
+    stats = {name: [0, 0, 0] for name in weapons} # [matches, wins, draws]
+    for _ in range(count):
+        weapon_a = rng.choice(weapons)
+        weapon_b = rng.choice(weapons)
+        outcome = run_match(sim, weapon_a, weapon_b, num_cpus, rng.getrandbits(32))
+        stats[weapon_a][0] += 1
+        stats[weapon_b][0] += 1
+        if outcome == "a":
+            stats[weapon_a][1] += 1
+        elif outcome == "b":
+            stats[weapon_b][1] += 1
+        else:
+            stats[weapon_a][2] += 1
+            stats[weapon_b][2] += 1
+    return stats
+
+def merge_stats(results):
+    total = {name: [0, 0, 0] for name in WEAPONS_DATA}
+    for stats in results:
+        for name, counts in stats.items():
+            for i, value in enumerate(counts):
+                total[name][i] += value
+    return total
+
+def print_report(stats, elapsed, matches):
+    print(f"{matches} matches in {elapsed:.1f}s ({matches / elapsed * 60:.0f} matches/min)")
+    print(f"{'Weapon':<18}{'Cost':>6}{'Dmg':>5}{'Played':>8}{'Win %':>8}{'Draw %':>8}")
+    rows = sorted(stats.items(), key=lambda item: item[1][1] / max(1, item[1][0]), reverse=True)
+    for name, (played, wins, draws) in rows:
+        data = WEAPONS_DATA[name]
+        win_rate = 100 * wins / played if played else 0
+        draw_rate = 100 * draws / played if played else 0
+        print(f"{name:<18}{data['cost']:>6}{data['damage']:>5}{played:>8}{win_rate:>8.1f}{draw_rate:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless CPU-vs-CPU weapon balance runs")
+    parser.add_argument("--matches", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1, help="Processes to spread matches over")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cpus", type=int, default=1, help="Opponents facing side A")
+    args = parser.parse_args()
+
+    # Each worker gets its own seed so runs are repeatable for a given --workers
+    workers = max(1, args.workers)
+    counts = [args.matches // workers + (1 if i < args.matches % workers else 0) for i in range(workers)]
+    tasks = [(args.seed * 1000 + i, count, args.cpus) for i, count in enumerate(counts) if count]
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = [run_batch(task) for task in tasks]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(run_batch, tasks)
+    elapsed = time.perf_counter() - start
+
+    print_report(merge_stats(results), elapsed, args.matches)
+
+if __name__ == "__main__":
+    main()
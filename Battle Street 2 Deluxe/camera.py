@@ -0,0 +1,55 @@
+import pygame
+from settings import *
+
+class Camera:
+    """Which part of the world is on screen. Follows the player with a dead zone.
+
+    x and y are the world position of the screen's top-left corner, always
+    whole pixels so the background chunks line up with the entities.
+    """
+    def __init__(self, world_width=WIDTH, world_height=HEIGHT, width=WIDTH, height=HEIGHT):
+        self.width = width
+        self.height = height
+        self.x = 0
+        self.y = 0
+        self.set_world(world_width, world_height)
+
+    def set_world(self, world_width, world_height):
+        self.world_width = world_width
+        self.world_height = world_height
+        self.clamp()
+
+    @property
+    def scrolls(self):
+        return self.world_width > self.width or self.world_height > self.height
+
+    @property
+    def rect(self):
+        return pygame.Rect(self.x, self.y, self.width, self.height)
+
+    def clamp(self):
+        self.x = max(0, min(self.x, self.world_width - self.width))
+        self.y = max(0, min(self.y, self.world_height - self.height))
+
+    def center_on(self, rect):
+        self.x = rect.centerx - self.width // 2
+        self.y = rect.centery - self.height // 2
+        self.clamp()
+
+    def follow(self, rect):
+        """Scroll just enough to keep rect's centre inside the dead zone"""
+        dx = rect.centerx - (self.x + self.width // 2)
+        dy = rect.centery - (self.y + self.height // 2)
+        if dx > CAMERA_DEADZONE:
+            self.x += dx - CAMERA_DEADZONE
+        elif dx < -CAMERA_DEADZONE:
+            self.x += dx + CAMERA_DEADZONE
+        if dy > CAMERA_DEADZONE:
+            self.y += dy - CAMERA_DEADZONE
+        elif dy < -CAMERA_DEADZONE:
+            self.y += dy + CAMERA_DEADZONE
+        self.clamp()
+
+    def view(self, margin=0):
+        """World rect on screen, grown by margin for sprites that stick out of their rect"""
+        return pygame.Rect(self.x - margin, self.y - margin, self.width + margin * 2, self.height + margin * 2)
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+import pygame
+from settings import *
+
+class ChunkCache:
+    """The map background cut into CHUNK_SIZE squares, baked on demand.
+
+    Only the chunks the camera has looked at recently are kept as surfaces
+    (least recently used are dropped past `capacity`), so memory stays the
+    same however big the world is. Platforms are sorted into the chunks
+    they touch once, up front.
+    """
+    def __init__(self, map_data, platforms, world_width=WIDTH, world_height=HEIGHT,
+                 size=CHUNK_SIZE, capacity=CHUNK_CACHE_SIZE):
+        self.bg_color = map_data['bg_color']
+        self.platforms = platforms
+        self.world_width = world_width
+        self.world_height = world_height
+        self.size = size
+        self.capacity = capacity
+        self.surfaces = OrderedDict()
+        self.builds = 0
+        self.chunk_platforms = {}
+        for plat in platforms:
+            for key in self.chunks_in(plat.rect):
+                self.chunk_platforms.setdefault(key, []).append(plat)
+
+    def chunks_in(self, rect):
+        size = self.size
+        for cx in range(max(0, rect.left // size), (rect.right - 1) // size + 1):
+            for cy in range(max(0, rect.top // size), (rect.bottom - 1) // size + 1):
+                yield cx, cy
+
+    def get(self, key):
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.build(key)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def build(self, key):
+        self.builds += 1
+        cx, cy = key
+        origin = (cx * self.size, cy * self.size)
+        surface = pygame.Surface((self.size, self.size))
+        surface.fill(self.bg_color)
+        for plat in self.chunk_platforms.get(key, ()):
+            # Painted in place rather than blitted, a floor can be far wider than a chunk
+            plat.paint(surface, plat.x - origin[0], plat.y - origin[1])
+        return surface.convert() if pygame.display.get_surface() else surface
+
+    def draw_view(self, surface, view):
+        """Blit the chunks covering the world rect `view` onto surface"""
+        surface.fill(self.bg_color) # Anything past the world's edge
+        size = self.size
+        surface.blits([(self.get(key), (key[0] * size - view.x, key[1] * size - view.y))
+                       for key in self.chunks_in(view.clip(pygame.Rect(0, 0, self.world_width, self.world_height)))],
+                      False)
+
+    def memory_bytes(self):
+        return sum(s.get_width() * s.get_height() * s.get_bytesize() for s in self.surfaces.values())
@@ -0,0 +1,6 @@
+"""Content hashes for the files the compiled caches are built from (maps, weapon textures)"""
+import hashlib
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
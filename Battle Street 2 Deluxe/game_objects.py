@@ -1,9 +1,13 @@
 import pygame
 import math
-import random
 from settings import *
+from particles import particle_pool
+from sprite_cache import sprite_cache
+from weapons import weapon_table
 
 class Platform:
+    __slots__ = ("x", "y", "width", "height", "color", "rect")
+
     def __init__(self, x, y, width, height, color=(100, 100, 100)):
         self.x = x
         self.y = y
@@ -13,17 +17,27 @@ class Platform:
         self.rect = pygame.Rect(x, y, width, height)
         
     def draw(self, screen):
+        key = ("platform", self.width, self.height, self.color)
+        screen.blit(sprite_cache.get(key, self.render), self.rect)
+
+    def render(self):
+        surface = pygame.Surface((self.width, self.height))
+        self.paint(surface, 0, 0)
+        return surface
+
+    def paint(self, surface, x, y):
+        """Draw straight onto surface with the top-left at (x, y), clipped to the surface"""
         # Draw platform with 3D effect
-        pygame.draw.rect(screen, self.color, self.rect)
+        pygame.draw.rect(surface, self.color, (x, y, self.width, self.height)) # fill() mis-clips negative x
         # Top highlight
-        pygame.draw.rect(screen, tuple(min(c + 30, 255) for c in self.color), 
-                        (self.x, self.y, self.width, 3))
+        pygame.draw.rect(surface, tuple(min(c + 30, 255) for c in self.color), 
+                        (x, y, self.width, 3))
         # Bottom shadow
-        pygame.draw.rect(screen, tuple(max(c - 30, 0) for c in self.color), 
-                        (self.x, self.y + self.height - 3, self.width, 3))
+        pygame.draw.rect(surface, tuple(max(c - 30, 0) for c in self.color), 
+                        (x, y + self.height - 3, self.width, 3))
         # Side shadow
-        pygame.draw.rect(screen, tuple(max(c - 20, 0) for c in self.color), 
-                        (self.x + self.width - 3, self.y, 3, self.height))
+        pygame.draw.rect(surface, tuple(max(c - 20, 0) for c in self.color), 
+                        (x + self.width - 3, y, 3, self.height))
     
     def check_collision(self, player, player_vy):
         """Check if player is landing on this platform"""
@@ -48,6 +62,8 @@ class Platform:
         return False
 
 class Collectible:
+    __slots__ = ("x", "y", "type", "size", "lifetime", "bounce_offset", "bounce_speed", "rect")
+
     def __init__(self, x, y, type):
         self.x = x
         self.y = y
@@ -65,112 +81,138 @@ class Collectible:
         return self.lifetime > 0
         
     def draw(self, screen):
-        y = self.y + self.bounce_offset
+        image = sprite_cache.get(("collectible", self.type, self.size), self.render)
+        screen.blit(image, (self.x - self.size, self.y + self.bounce_offset - self.size))
+
+    def render(self):
+        # Drawn around the centre of a size*2 square
+        surface = pygame.Surface((self.size * 2, self.size * 2), pygame.SRCALPHA)
+        x = y = self.size
         if self.type == "coin":
             # Draw coin
-            pygame.draw.circle(screen, YELLOW, (int(self.x), int(y)), self.size)
-            pygame.draw.circle(screen, ORANGE, (int(self.x), int(y)), self.size - 5)
-            pygame.draw.circle(screen, YELLOW, (int(self.x), int(y)), self.size - 8)
+            pygame.draw.circle(surface, YELLOW, (x, y), self.size)
+            pygame.draw.circle(surface, ORANGE, (x, y), self.size - 5)
+            pygame.draw.circle(surface, YELLOW, (x, y), self.size - 8)
         elif self.type == "health":
             # Draw health pack
-            pygame.draw.circle(screen, WHITE, (int(self.x), int(y)), self.size)
-            pygame.draw.circle(screen, RED, (int(self.x), int(y)), self.size - 3)
+            pygame.draw.circle(surface, WHITE, (x, y), self.size)
+            pygame.draw.circle(surface, RED, (x, y), self.size - 3)
             # Cross
-            pygame.draw.line(screen, WHITE, (self.x - 8, y), (self.x + 8, y), 3)
-            pygame.draw.line(screen, WHITE, (self.x, y - 8), (self.x, y + 8), 3)
+            pygame.draw.line(surface, WHITE, (x - 8, y), (x + 8, y), 3)
+            pygame.draw.line(surface, WHITE, (x, y - 8), (x, y + 8), 3)
         elif self.type == "speed":
             # Draw speed boost
-            pygame.draw.circle(screen, CYAN, (int(self.x), int(y)), self.size)
-            pygame.draw.polygon(screen, WHITE, [
-                (self.x - 5, y + 5),
-                (self.x + 10, y),
-                (self.x - 5, y - 5)
+            pygame.draw.circle(surface, CYAN, (x, y), self.size)
+            pygame.draw.polygon(surface, WHITE, [
+                (x - 5, y + 5),
+                (x + 10, y),
+                (x - 5, y - 5)
             ])
         elif self.type == "damage":
             # Draw damage boost
-            pygame.draw.circle(screen, (255, 100, 100), (int(self.x), int(y)), self.size)
-            pygame.draw.polygon(screen, WHITE, [
-                (self.x, y - 8),
-                (self.x + 8, y + 8),
-                (self.x - 8, y + 8)
+            pygame.draw.circle(surface, (255, 100, 100), (x, y), self.size)
+            pygame.draw.polygon(surface, WHITE, [
+                (x, y - 8),
+                (x + 8, y + 8),
+                (x - 8, y + 8)
             ])
+        return surface
             
     def check_collision(self, player):
         return self.rect.colliderect(player.rect)
 
 class ExplosionParticle:
-    """Cartoon explosion particle for visual effects"""
-    def __init__(self, x, y, color):
-        self.x = x
-        self.y = y
-        self.base_color = color
-        self.particles = []
-        # Create particles in a burst pattern
-        for i in range(15):
-            angle = (i / 15) * 2 * math.pi
-            speed = random.uniform(2, 5)
-            self.particles.append({
-                'x': x,
-                'y': y,
-                'vx': math.cos(angle) * speed,
-                'vy': math.sin(angle) * speed,
-                'size': random.randint(3, 8),
-                'life': random.randint(20, 40),
-                'max_life': 40
-            })
-    
-    def update(self):
-        for particle in self.particles[:]:
-            particle['x'] += particle['vx']
-            particle['y'] += particle['vy']
-            particle['life'] -= 1
-            if particle['life'] <= 0:
-                self.particles.remove(particle)
-        return len(self.particles) > 0  # Return True if still alive
-    
-    def draw(self, screen):
-        for particle in self.particles:
-            # Fade out as life decreases
-            life_ratio = particle['life'] / particle['max_life']
-            size = int(particle['size'] * life_ratio)
-            if size > 0:
-                # Create colorful cartoon explosion with multiple colors
-                colors = [self.base_color, YELLOW, ORANGE, RED, WHITE]
-                color_idx = int((1 - life_ratio) * (len(colors) - 1))
-                color = colors[min(color_idx, len(colors) - 1)]
-                pygame.draw.circle(screen, color, (int(particle['x']), int(particle['y'])), size)
+    """Cartoon explosion burst for visual effects, spawned into the shared particle pool"""
+    __slots__ = ("pool",)
+
+    def __init__(self, x, y, color, pool=None):
+        self.pool = pool or particle_pool
+        self.pool.spawn_burst(x, y, color)
 
 class Projectile:
-    def __init__(self, x, y, vx, vy, weapon_name, owner):
+    """A shot in flight. Get these from projectile_pool so they are reused between shots."""
+    __slots__ = ("x", "y", "vx", "vy", "weapon_id", "damage", "owner", "radius", "color",
+                 "rect", "prev_x", "prev_y", "expired", "expiry", "gravity", "blast_radius")
+
+    def __init__(self, x, y, vx, vy, weapon_id, owner):
+        self.rect = pygame.Rect(x, y, PROJECTILE_SIZE, PROJECTILE_SIZE)
+        self.radius = 5
+        self.reset(x, y, vx, vy, weapon_id, owner)
+
+    def reset(self, x, y, vx, vy, weapon_id, owner):
+        weapon = weapon_table.weapons[weapon_id]
         self.x = x
         self.y = y
         self.vx = vx
         self.vy = vy
-        self.weapon_name = weapon_name
-        self.data = WEAPONS_DATA[weapon_name]
+        self.weapon_id = weapon_id
+        self.damage = weapon.damage
+        self.color = weapon.color
+        self.gravity = weapon.gravity # Grenades arc down
+        self.blast_radius = weapon.blast_radius # 0 unless it explodes
         self.owner = owner
-        self.radius = 5
-        self.color = self.data['color']
-        self.rect = pygame.Rect(x, y, 10, 10)
-        self.life = 100
-        
-        # Gravity for grenades
-        self.gravity = 0.5 if self.data.get('explosion') else 0
+        self.rect.x = x
+        self.rect.y = y
+        self.prev_x = x
+        self.prev_y = y
+        self.expired = False
+        self.expiry = None # The simulation's timer for expire()
 
-    def update(self):
+    @property
+    def weapon_name(self):
+        return weapon_table.weapons[self.weapon_id].name
+
+    def update(self, world_width=WIDTH, world_height=HEIGHT):
+        self.prev_x = self.x
+        self.prev_y = self.y
         self.x += self.vx
         self.y += self.vy
         self.vy += self.gravity
         self.rect.x = self.x
         self.rect.y = self.y
-        self.life -= 1
-        
+
         # Check bounds
-        if self.y > HEIGHT or self.x < 0 or self.x > WIDTH:
-            self.life = 0
-            
-        return self.life > 0
+        if self.y > world_height or self.x < 0 or self.x > world_width:
+            return False
+        return not self.expired
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), self.radius)
+    def expire(self):
+        self.expired = True
+        self.expiry = None
+
+    def draw(self, screen, alpha=1.0, offset=(0, 0)):
+        x = self.prev_x + (self.x - self.prev_x) * alpha - offset[0]
+        y = self.prev_y + (self.y - self.prev_y) * alpha - offset[1]
+        return pygame.draw.circle(screen, self.color, (int(x), int(y)), self.radius)
+
+
+
+class ProjectilePool:
+    """Free list of spent Projectiles, so firing doesn't allocate a new object and Rect every shot"""
+    def __init__(self, capacity=PROJECTILE_POOL_SIZE):
+        self.capacity = capacity # Spares kept beyond this are left to the garbage collector
+        self.free = []
+
+    def acquire(self, x, y, vx, vy, weapon_id, owner):
+        if self.free:
+            p = self.free.pop()
+            p.reset(x, y, vx, vy, weapon_id, owner)
+            return p
+        return Projectile(x, y, vx, vy, weapon_id, owner)
+
+    def release(self, p):
+        if p.expiry is not None:
+            p.expiry.cancel() # Or it would expire whichever shot reuses p
+            p.expiry = None
+        if len(self.free) < self.capacity:
+            p.owner = None # Don't keep a finished match's fighters alive
+            self.free.append(p)
+
+    def release_all(self, projectiles):
+        for p in projectiles:
+            self.release(p)
+
+    def clear(self):
+        self.free = []
 
+projectile_pool = ProjectilePool()
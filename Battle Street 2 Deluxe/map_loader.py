@@ -0,0 +1,248 @@
+"""Battle maps from JSON files in maps/, compiled into a landing index.
+
+A map file lists its platforms:
+
+    {"width": 8000, "height": 700,
+     "platforms": [{"x": 0, "y": 650, "width": 8000, "height": 50, "color": [60, 60, 60]}, ...]}
+
+("width" and "height" are the world size and default to one screen,
+"color" is optional, the map's ground_color from MAPS is used otherwise).
+The compiled map is cached in maps/compiled/ next to the source's mtime,
+size and hash, so it is only rebuilt when the JSON changes.
+
+    python map_loader.py        # compile every map in MAPS ahead of time
+"""
+import array
+import bisect
+import json
+import os
+import struct
+from settings import *
+from game_objects import Platform
+from file_hash import file_hash
+from nav import NavGraph
+
+MAP_VERSION = 2
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MAPS_DIR = os.path.join(SCRIPT_DIR, "maps")
+MAP_CACHE_DIR = os.path.join(MAPS_DIR, "compiled")
+CACHE_HEADER = struct.Struct("<4sI") # Magic, JSON header length, then the arrays
+
+def height_band(height):
+    """Platforms are grouped by height rounded up to a power of two"""
+    band = 8
+    while band < height:
+        band *= 2
+    return band
+
+class CollisionIndex:
+    """Platforms bucketed into vertical columns, each sorted by top y.
+
+    A landing check only looks at the one to three columns under the
+    entity, and bisects to the platforms whose top is near its feet, so it
+    costs O(log n) however many platforms the map has. Inside a column the
+    platforms are split by height band, so a tall floor doesn't widen the
+    search window for every thin ledge above it.
+    """
+    def __init__(self, platforms, column_width=COLLISION_COLUMN_WIDTH, columns=None):
+        self.platforms = platforms
+        self.column_width = column_width
+        if columns is None:
+            columns = self.build_columns()
+        # Column -> [(band height, sorted tops, platforms in the same order), ...]
+        self.columns = {}
+        for (col, band), order in sorted(columns.items()):
+            self.columns.setdefault(col, []).append(
+                (band, [platforms[i].y for i in order], [platforms[i] for i in order]))
+
+    def build_columns(self):
+        """(column, height band) -> platform indices sorted by top y"""
+        width = self.column_width
+        columns = {}
+        for i, plat in enumerate(self.platforms):
+            band = height_band(plat.height)
+            # Edges count as overlapping, same as Platform.check_collision
+            for col in range(plat.x // width, (plat.x + plat.width) // width + 1):
+                columns.setdefault((col, band), []).append(i)
+        for order in columns.values():
+            order.sort(key=lambda i: (self.platforms[i].y, i))
+        return columns
+
+    def landing(self, left, right, bottom, vel_y):
+        """The topmost platform an entity falling at vel_y lands on, or None.
+
+        Same test as Platform.check_collision for every platform at once.
+        """
+        if vel_y <= 0:
+            return None
+        slack = abs(vel_y) + 5
+        width = self.column_width
+        best = None
+        for col in range(int(left // width), int(right // width) + 1):
+            for band, tops, plats in self.columns.get(col, ()):
+                i = bisect.bisect_left(tops, bottom - band - slack)
+                n = len(tops)
+                while i < n and tops[i] <= bottom:
+                    plat = plats[i]
+                    if (bottom <= plat.y + plat.height + slack and
+                            right >= plat.x and left <= plat.x + plat.width):
+                        if best is None or plat.y < best.y:
+                            best = plat
+                        break # Sorted by top, the rest of this band is lower
+                    i += 1
+        return best
+
+
+class Level:
+    """A loaded map: world size, platforms, their landing index and the CPUs' nav graph"""
+    def __init__(self, map_name, collision, width=WIDTH, height=HEIGHT):
+        self.map_name = map_name
+        self.platforms = collision.platforms
+        self.collision = collision
+        self.width = width
+        self.height = height
+        self._nav = None
+
+    @property
+    def nav(self):
+        """NavGraph of the platforms, built on first use (Simulation.load_map) and kept with the level"""
+        if self._nav is None:
+            self._nav = NavGraph(self)
+        return self._nav
+
+
+def map_path(map_name, maps_dir=None):
+    return os.path.join(maps_dir or MAPS_DIR, MAPS[map_name]["file"])
+
+def cache_path(map_name, cache_dir=None):
+    return os.path.join(cache_dir or MAP_CACHE_DIR, map_name + ".mapc")
+
+def source_info(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def read_map_file(path, map_name):
+    with open(path, 'r') as f:
+        data = json.load(f)
+    default_color = MAPS[map_name]["ground_color"]
+    platforms = []
+    for entry in data["platforms"]:
+        color = tuple(entry.get("color", default_color))
+        platforms.append(Platform(int(entry["x"]), int(entry["y"]), int(entry["width"]), int(entry["height"]), color))
+    return Level(map_name, CollisionIndex(platforms), int(data.get("width", WIDTH)), int(data.get("height", HEIGHT)))
+
+def write_cache(path, source, level):
+    collision = level.collision
+    platforms = collision.platforms
+    ids = {id(plat): i for i, plat in enumerate(platforms)}
+    rects = array.array('i')
+    colors = bytearray()
+    for plat in platforms:
+        rects.extend((plat.x, plat.y, plat.width, plat.height))
+        colors.extend(plat.color)
+    order = array.array('i')
+    columns = []
+    for col, bands in sorted(collision.columns.items()):
+        for band, tops, plats in bands:
+            columns.append([col, band, len(plats)])
+            order.extend(ids[id(plat)] for plat in plats)
+    header = json.dumps({
+        "version": MAP_VERSION,
+        "source": source,
+        "column_width": collision.column_width,
+        "width": level.width,
+        "height": level.height,
+        "count": len(platforms),
+        "columns": columns,
+    }).encode("utf-8")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(CACHE_HEADER.pack(b"BS2M", len(header)))
+        f.write(header)
+        f.write(rects.tobytes())
+        f.write(bytes(colors))
+        f.write(order.tobytes())
+    os.replace(tmp_path, path)
+
+def read_cache(path, source_path, map_name):
+    """Level from a compiled map, or None if it's missing or stale"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, header_len = CACHE_HEADER.unpack_from(data)
+        if magic != b"BS2M":
+            return None
+        offset = CACHE_HEADER.size
+        header = json.loads(data[offset:offset + header_len])
+        offset += header_len
+    except (OSError, ValueError, struct.error):
+        return None
+    if header.get("version") != MAP_VERSION or header.get("column_width") != COLLISION_COLUMN_WIDTH:
+        return None
+    source = header["source"]
+    current = source_info(source_path)
+    if current["size"] != source["size"]:
+        return None
+    # Checkouts touch mtimes, only then is the file hashed
+    touched = current["mtime_ns"] != source["mtime_ns"]
+    if touched and file_hash(source_path) != source["sha1"]:
+        return None
+
+    count = header["count"]
+    rects = array.array('i')
+    rects.frombytes(data[offset:offset + count * 4 * rects.itemsize])
+    offset += count * 4 * rects.itemsize
+    colors = data[offset:offset + count * 3]
+    offset += count * 3
+    order = array.array('i')
+    order.frombytes(data[offset:])
+
+    platforms = [Platform(rects[i * 4], rects[i * 4 + 1], rects[i * 4 + 2], rects[i * 4 + 3],
+                          tuple(colors[i * 3:i * 3 + 3])) for i in range(count)]
+    columns = {}
+    start = 0
+    try:
+        for col, band, length in header["columns"]:
+            columns[(col, band)] = order[start:start + length]
+            start += length
+    except (KeyError, TypeError, ValueError):
+        return None # Written by a different version of this file
+    collision = CollisionIndex(platforms, header["column_width"], columns)
+    level = Level(map_name, collision, header["width"], header["height"])
+    if touched:
+        # Same contents, stamp the new mtime so the next load doesn't hash it again
+        try:
+            write_cache(path, dict(current, sha1=source["sha1"]), level)
+        except OSError:
+            pass
+    return level
+
+def compile_map(map_name, maps_dir=None, cache_dir=None):
+    """Parse a map file, build its index and write the cache. Returns the Level."""
+    path = map_path(map_name, maps_dir)
+    level = read_map_file(path, map_name)
+    source = dict(source_info(path), sha1=file_hash(path))
+    try:
+        write_cache(cache_path(map_name, cache_dir), source, level)
+    except OSError as e:
+        print(f"Could not cache compiled map {map_name}: {e}")
+    return level
+
+_levels = {} # map name -> (source stat, Level), so a new Simulation doesn't reload its map
+
+def load_level(map_name, maps_dir=None, cache_dir=None):
+    path = map_path(map_name, maps_dir)
+    source = source_info(path)
+    loaded = _levels.get(map_name)
+    if loaded and loaded[0] == (path, source):
+        return loaded[1]
+    level = read_cache(cache_path(map_name, cache_dir), path, map_name) or compile_map(map_name, maps_dir, cache_dir)
+    _levels[map_name] = ((path, source), level)
+    return level
+
+if __name__ == "__main__":
+    for name in MAPS:
+        level = compile_map(name)
+        print(f"{name}: {level.width}x{level.height}, {len(level.platforms)} platforms in {len(level.collision.columns)} columns")
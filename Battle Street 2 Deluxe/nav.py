@@ -0,0 +1,294 @@
+"""Navigation graph for the CPU AI: platforms are nodes, walk, drop and jump links are edges.
+
+Edges are found by flying a fighter-sized body off every platform with
+the same tick-by-tick physics as Simulation.update_physics (GRAVITY,
+JUMP_SPEED and the map's landing index), so every link the AI plans is
+one it can actually make. A graph is built once per map (Level.nav) and
+paths are A* searches, cached per (from, to) platform pair by a NavRoutes
+that every match starts afresh, so which paths are already known (and so
+what the per-tick search budget lets through) never depends on what ran
+before it in the process.
+"""
+import heapq
+import numpy as np
+import pygame
+from settings import *
+
+FIGHTER_WIDTH = 40
+FIGHTER_HEIGHT = 60
+CPU_SPEED = 5 * 0.7 # Player.speed with the CPU's balanced movement
+RUN_SPEED = 5 # Player.speed, CPUs follow nav edges flat out (the upper ledges are out of reach any slower)
+
+# Edge kinds
+WALK = 0 # Walk onto a platform at the same height
+DROP = 1 # Walk off the edge and fall
+JUMP = 2
+EDGE_KINDS = ("walk", "drop", "jump")
+
+class NavEdge:
+    """A link between two platforms.
+
+    Walk and drop edges are taken by walking in `direction` until the
+    fighter falls off. Jump edges by jumping with rect.x between left and
+    right while moving in direction (-1, 0 or 1), and keeping that up in
+    the air. cost is in ticks, from the middle of the source platform.
+    """
+    __slots__ = ("source", "target", "kind", "left", "right", "direction", "cost")
+
+    def __init__(self, source, target, kind, left, right, direction, cost):
+        self.source = source
+        self.target = target
+        self.kind = kind
+        self.left = left
+        self.right = right
+        self.direction = direction
+        self.cost = cost
+
+    def __repr__(self):
+        return f"NavEdge({self.source} -> {self.target} {EDGE_KINDS[self.kind]} x {self.left}..{self.right} dir {self.direction})"
+
+
+class NavHops:
+    """Next edge from each node toward one goal as arrays, for arena CPUs. Filled in as nodes ask."""
+    def __init__(self, count):
+        self.known = np.zeros(count, bool)
+        self.has = np.zeros(count, bool)
+        self.jump = np.zeros(count, bool)
+        self.left = np.zeros(count)
+        self.right = np.zeros(count)
+        self.direction = np.zeros(count)
+
+    def fill(self, routes, goal, nodes, searches):
+        """Look up the nodes not known yet, running at most `searches` new A* searches. Returns how many ran."""
+        ran = 0
+        for node in nodes[~self.known[nodes]].tolist():
+            if not routes.cached(node, goal):
+                if ran == searches:
+                    continue # Next tick
+                ran += 1
+            self.known[node] = True
+            edge = routes.next_edge(node, goal)
+            if edge:
+                self.has[node] = True
+                self.jump[node] = edge.kind == JUMP
+                self.left[node] = edge.left
+                self.right[node] = edge.right
+                self.direction[node] = edge.direction
+        return ran
+
+
+class NavGraph:
+    def __init__(self, level, width=FIGHTER_WIDTH, height=FIGHTER_HEIGHT, speed=RUN_SPEED):
+        self.collision = level.collision
+        self.platforms = level.platforms
+        self.world_width = level.width
+        self.world_height = level.height
+        self.width = width
+        self.height = height
+        self.speed = speed
+        # The bottom of the world is a node too, maps don't have to have a ground platform
+        self.floor = len(self.platforms)
+        self.node_ids = {id(plat): i for i, plat in enumerate(self.platforms)}
+        # (left, right, top) of every node
+        self.spans = [(plat.x, plat.x + plat.width, plat.y) for plat in self.platforms]
+        self.spans.append((0, self.world_width, self.world_height))
+        self.edges = [[] for _ in self.spans]
+        self.build()
+
+    @property
+    def edge_count(self):
+        return sum(len(edges) for edges in self.edges)
+
+    # --- Building ---
+
+    def build(self):
+        for node in range(self.floor):
+            self.link(node)
+        # Only worth it when something can fall that far
+        if any(edge.target == self.floor for edges in self.edges for edge in edges):
+            self.link(self.floor)
+
+    def link(self, node):
+        """Find every edge out of node, keeping the cheapest one to each other node"""
+        left, right, top = self.spans[node]
+        center = (left + right) / 2
+        best = {}
+
+        def offer(target, kind, x0, x1, direction, cost):
+            if target is not None and target != node and (target not in best or cost < best[target].cost):
+                best[target] = NavEdge(node, target, kind, x0, x1, direction, cost)
+
+        # Walk off either end
+        for direction, x in ((-1, left), (1, right - self.width)):
+            walked = abs(x + self.width / 2 - center) / self.speed
+            target, ticks = self.fly(x, top, direction * self.speed, 0, node)
+            if target is not None:
+                kind = WALK if self.spans[target][2] == top else DROP
+                offer(target, kind, left - self.width, right, direction, walked + ticks)
+
+        # Jump from every NAV_SAMPLE_STEP pixels along it, standing still or moving either way.
+        # Runs of takeoff points that land on the same platform become one edge.
+        xs = list(range(left - self.width + 1, right, NAV_SAMPLE_STEP)) + [right - 1]
+        reach = self.jump_reach()
+        for direction in (-1, 0, 1):
+            run = []
+            for x in xs + [None]:
+                target = None
+                if x is not None and self.others_near(node, x - reach, x + self.width + reach):
+                    target, ticks = self.fly(x, top, direction * self.speed, -JUMP_SPEED)
+                if run and (target != run[0][1] or x is None):
+                    # Stay off the ends of a run, the ticks between samples weren't tried
+                    x0, x1 = (run[1][0], run[-2][0]) if len(run) >= 3 else (run[0][0], run[-1][0])
+                    mid_x, run_target, mid_ticks = run[len(run) // 2]
+                    walked = abs(mid_x + self.width / 2 - center) / self.speed
+                    offer(run_target, JUMP, x0, x1, direction, walked + mid_ticks)
+                    run = []
+                if target is not None and target != node:
+                    run.append((x, target, ticks))
+
+        self.edges[node] = sorted(best.values(), key=lambda edge: edge.cost)
+
+    def jump_reach(self):
+        """How far sideways a jump gets before it's back at takeoff height"""
+        return self.speed * 2 * JUMP_SPEED / GRAVITY
+
+    def others_near(self, node, left, right):
+        """Is any platform but node's between left and right? Otherwise a jump there can only come back down on it."""
+        width = self.collision.column_width
+        own = self.platforms[node] if node < self.floor else None
+        for col in range(int(left // width), int(right // width) + 1):
+            for _, _, plats in self.collision.columns.get(col, ()):
+                for plat in plats:
+                    if plat is not own and plat.x <= right and plat.x + plat.width >= left:
+                        return True
+        return False
+
+    def fly(self, x, bottom, vx, vy, walk_on=None):
+        """Where a fighter leaving (x, bottom) at (vx, vy) lands, as (node, ticks) or (None, ticks).
+
+        Ticks exactly like update_physics. With walk_on it walks along that
+        platform until it falls off, and (node, ticks) of it if it can't.
+        """
+        rect = pygame.Rect(x, bottom - self.height, self.width, self.height)
+        landing = self.collision.landing
+        world_width = self.world_width
+        world_height = self.world_height
+        for tick in range(1, NAV_MAX_AIR_TICKS + 1):
+            vy += GRAVITY
+            rect.y += vy
+            plat = landing(rect.left, rect.right, rect.bottom, vy)
+            if plat:
+                node = self.node_ids[id(plat)]
+                if node != walk_on:
+                    return node, tick
+                rect.bottom = plat.y
+                vy = 0
+            elif rect.bottom > world_height:
+                return self.floor, tick
+            last_x = rect.x
+            rect.x += vx
+            if rect.left < 0: rect.left = 0
+            if rect.right > world_width: rect.right = world_width
+            if walk_on is not None and rect.x == last_x:
+                return walk_on, tick # Walked into the edge of the world
+        return None, NAV_MAX_AIR_TICKS
+
+    # --- Queries ---
+
+    def node_at(self, rect):
+        """Node a fighter standing with its feet at rect.bottom is on, or None"""
+        if rect.bottom >= self.world_height:
+            return self.floor
+        plat = self.collision.landing(rect.left, rect.right, rect.bottom, 1)
+        return self.node_ids[id(plat)] if plat else None
+
+    def locate(self, fighter):
+        """The node fighter stands on, or last stood on while it's in the air"""
+        if fighter.on_ground:
+            node = fighter.nav_node
+            rect = fighter.rect
+            if node is not None:
+                left, right, top = self.spans[node]
+                if rect.bottom == top and rect.right >= left and rect.left <= right:
+                    return node # Still there, no lookup needed
+            node = self.node_at(rect)
+            if node is not None:
+                fighter.nav_node = node
+        return fighter.nav_node
+
+    def heuristic(self, node, goal):
+        """Ticks it takes at least to cover the sideways gap between two nodes"""
+        left, right, _ = self.spans[node]
+        goal_left, goal_right, _ = self.spans[goal]
+        return max(0, goal_left - right, left - goal_right) / self.speed
+
+    def find_path(self, start, goal):
+        """A* from start to goal, the list of edges to take or None"""
+        costs = {start: 0}
+        came_by = {start: None}
+        heap = [(self.heuristic(start, goal), 0, start)]
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == goal:
+                break
+            if cost > costs[node]:
+                continue # Already reached more cheaply
+            for edge in self.edges[node]:
+                new_cost = cost + edge.cost
+                target = edge.target
+                if new_cost < costs.get(target, float("inf")):
+                    costs[target] = new_cost
+                    came_by[target] = edge
+                    heapq.heappush(heap, (new_cost + self.heuristic(target, goal), new_cost, target))
+        else:
+            return None
+        path = []
+        edge = came_by[goal]
+        while edge:
+            path.append(edge)
+            edge = came_by[edge.source]
+        path.reverse()
+        return path
+
+
+class NavRoutes:
+    """One match's paths over a NavGraph: find_path results per (from, to) and NavHops per goal.
+
+    The graph is shared by everything on the map, this isn't; Simulation
+    makes a new one in start().
+    """
+    def __init__(self, nav):
+        self.nav = nav
+        self.paths = {} # (from, to) -> edges to follow, None if there's no way
+        self.hop_tables = {} # goal -> NavHops
+
+    def cached(self, start, goal):
+        """Can next_edge(start, goal) answer without a search?"""
+        return start == goal or (start, goal) in self.paths
+
+    def path(self, start, goal):
+        """Cached find_path. Every node along a path gets the rest of it cached too."""
+        key = (start, goal)
+        if key in self.paths:
+            return self.paths[key]
+        path = self.nav.find_path(start, goal)
+        if path is None:
+            self.paths[key] = None
+            return None
+        for i, edge in enumerate(path):
+            self.paths.setdefault((edge.source, goal), path[i:])
+        return path
+
+    def next_edge(self, start, goal):
+        """The edge to take from start toward goal, None if already there or there's no way"""
+        if start == goal:
+            return None
+        path = self.path(start, goal)
+        return path[0] if path else None
+
+    def hops(self, goal, nodes, searches=NAV_SEARCHES_PER_TICK):
+        """NavHops toward goal and the number of searches run, filled in for the nodes in the nodes array"""
+        table = self.hop_tables.get(goal)
+        if table is None:
+            table = self.hop_tables[goal] = NavHops(len(self.nav.spans))
+        return table, table.fill(self, goal, nodes, searches)
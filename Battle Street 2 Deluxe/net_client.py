@@ -0,0 +1,256 @@
+"""Playing on a battle server (server.py): input goes out every tick, snapshots come back.
+
+The client predicts its own player. Every input is applied locally right
+away with Simulation.move_player and kept until a snapshot says the
+server has applied it; each snapshot puts the player back where the
+server has it and replays the inputs still in flight. Everyone else is
+drawn NET_INTERP_TICKS in the past, between the two snapshots either side
+of that moment, so they move smoothly although snapshots only come every
+NET_SNAPSHOT_INTERVAL ticks. Shots fly on the client from their spawn
+record.
+"""
+import socket
+import time
+from collections import deque
+from settings import *
+from player import Player
+from simulation import Simulation, PlayerInput
+from arena import ARENA_PALETTE
+from game_objects import Projectile
+from net_protocol import (NO_BASE, MSG_LEAVE, MSG_WELCOME, MSG_FULL, MSG_ROSTER, MSG_SNAPSHOT,
+                          X, Y, VEL_Y, HP, FLAGS, WEAPON, FACING_RIGHT, ATTACKING, ON_GROUND, ALIVE,
+                          shot_position, decode_snapshot, encode_input, encode_join, decode_welcome, decode_roster)
+
+JOIN_RETRY = 0.25 # Seconds between JOINs until the server answers
+CLOCK_SMOOTHING = 0.05 # How fast the estimate of the server's clock follows new snapshots
+
+class NetClient:
+    def __init__(self, host, port=NET_PORT, name="Player", weapon="Fist"):
+        self.address = (socket.gethostbyname(host), port)
+        self.name = name
+        self.weapon = weapon
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.slot = None
+        self.map_name = None
+        self.sim = None # Local Simulation for the map and movement rules, it never steps
+        self.seq = 0
+        self.pending = deque() # (sequence, mask) the server hasn't applied yet
+        self.recent_masks = deque(maxlen=NET_INPUT_REDUNDANCY)
+        self.sent_at = {} # Sequence -> send time, for the input latency
+        self.latencies = [] # ms from sending an input to a snapshot that includes it
+        self.states = {} # tick -> WorldState, bases for the next deltas
+        self.latest = None
+        self.names = {} # slot -> name
+        self.hits = [] # (x, y) where someone lost hp, for the hit bursts
+        self.clock_offset = None # Server tick minus local time in ticks
+        self.last_heard = time.perf_counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.snapshots = 0
+        # Stand-ins for drawing, reused frame to frame
+        self.others = {} # slot -> Player
+        self.spare_projectiles = []
+
+    def join(self, timeout=3.0):
+        """Ask for a slot, raises OSError if the server doesn't let us in"""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            self.send(encode_join(self.name, self.weapon))
+            retry = time.perf_counter() + JOIN_RETRY
+            while time.perf_counter() < retry:
+                data = self.recv()
+                if data is None:
+                    time.sleep(0.005)
+                elif data[0] == MSG_FULL:
+                    raise ConnectionRefusedError("the server is full")
+                elif data[0] == MSG_WELCOME:
+                    self.welcome(data)
+                    return self
+        raise TimeoutError("no answer from the server")
+
+    def welcome(self, data):
+        self.slot, tick, self.map_name = decode_welcome(data)
+        player = Player(self.name)
+        player.color = ARENA_PALETTE[self.slot % len(ARENA_PALETTE)]
+        if self.weapon in WEAPONS_DATA:
+            player.inventory.append(self.weapon)
+            player.equip_weapon(self.weapon)
+        self.sim = Simulation(player, effects=False)
+        self.sim.load_map(self.map_name)
+        self.last_heard = time.perf_counter()
+
+    @property
+    def player(self):
+        return self.sim.player
+
+    @property
+    def connected(self):
+        return time.perf_counter() - self.last_heard < NET_TIMEOUT
+
+    def send(self, data):
+        try:
+            self.sock.sendto(data, self.address)
+            self.bytes_out += len(data)
+        except OSError:
+            pass
+
+    def recv(self):
+        try:
+            data, address = self.sock.recvfrom(4096)
+        except (BlockingIOError, ConnectionResetError):
+            return None
+        if address != self.address or not data:
+            return None
+        self.bytes_in += len(data)
+        self.last_heard = time.perf_counter()
+        return data
+
+    def poll(self):
+        while True:
+            data = self.recv()
+            if data is None:
+                return
+            kind = data[0]
+            if kind == MSG_SNAPSHOT:
+                self.receive_snapshot(data)
+            elif kind == MSG_ROSTER:
+                self.names = decode_roster(data)
+
+    def receive_snapshot(self, data):
+        decoded = decode_snapshot(data, self.states)
+        if decoded is None:
+            return # Its base is gone, the next one will be a full snapshot
+        state, input_seq = decoded
+        previous = self.latest
+        if previous and state.tick <= previous.tick:
+            return # Arrived out of order
+        self.snapshots += 1
+        self.states[state.tick] = state
+        for tick in [tick for tick in self.states if tick < state.tick - NET_HISTORY]:
+            del self.states[tick]
+        self.latest = state
+
+        now = time.perf_counter()
+        sample = state.tick - now * TICK_RATE
+        if self.clock_offset is None or abs(sample - self.clock_offset) > NET_INTERP_TICKS * 2:
+            self.clock_offset = sample
+        else:
+            self.clock_offset += (sample - self.clock_offset) * CLOCK_SMOOTHING
+        for seq in [seq for seq in self.sent_at if seq <= input_seq]:
+            self.latencies.append((now - self.sent_at.pop(seq)) * 1000)
+
+        if previous:
+            for slot, record in state.fighters.items():
+                old = previous.fighters.get(slot)
+                if old and record[HP] < old[HP]:
+                    self.hits.append((record[X] + 20, record[Y] + 30))
+        self.reconcile(state, input_seq)
+
+    def reconcile(self, state, input_seq):
+        """Take the server's word for our player, then replay the inputs it hasn't seen yet"""
+        pending = self.pending
+        while pending and pending[0][0] <= input_seq:
+            pending.popleft()
+        record = state.fighters.get(self.slot)
+        if record is None:
+            return
+        player = self.player
+        prev = (player.prev_x, player.prev_y)
+        player.rect.x = record[X]
+        player.rect.y = record[Y]
+        player.vel_y = record[VEL_Y] / 4
+        player.on_ground = bool(record[FLAGS] & ON_GROUND)
+        player.hp = record[HP]
+        player.weapon_id = record[WEAPON]
+        player.is_attacking = bool(record[FLAGS] & ATTACKING)
+        if not pending:
+            player.prev_x, player.prev_y = prev
+        if record[FLAGS] & ALIVE:
+            for seq, mask in pending:
+                self.sim.move_player(player, PlayerInput.from_mask(mask))
+
+    def tick(self, player_input):
+        """Send this tick's input and apply it to our player straight away"""
+        self.poll()
+        mask = player_input.to_mask() if player_input else 0
+        self.seq += 1
+        self.pending.append((self.seq, mask))
+        self.recent_masks.append(mask)
+        self.sent_at[self.seq] = time.perf_counter()
+        ack = self.latest.tick if self.latest else NO_BASE
+        self.send(encode_input(ack, self.seq, self.recent_masks))
+        # Forget inputs the server is never going to confirm (we're cut off)
+        while len(self.pending) > NET_HISTORY:
+            self.pending.popleft()
+        for seq in [seq for seq in self.sent_at if seq <= self.seq - NET_HISTORY]:
+            del self.sent_at[seq]
+
+        record = self.latest.fighters.get(self.slot) if self.latest else None
+        if record and record[FLAGS] & ALIVE:
+            self.sim.move_player(self.player, PlayerInput.from_mask(mask))
+
+    def render_tick(self, now=None):
+        now = time.perf_counter() if now is None else now
+        return now * TICK_RATE + self.clock_offset - NET_INTERP_TICKS
+
+    def update_view(self, view, now=None):
+        """Pose everyone in `view` (a pipeline.SnapshotView) for drawing"""
+        self.poll()
+        view.player = self.player
+        for x, y in self.hits:
+            view.particles.spawn_burst(x, y, RED)
+        self.hits = []
+        if not self.latest:
+            return
+        render = self.render_tick(now)
+        # The snapshots either side of the render tick
+        before = after = None
+        for tick in sorted(self.states):
+            if tick <= render:
+                before = tick
+            else:
+                after = tick
+                break
+        before = self.states[before if before is not None else after]
+        after = self.states[after] if after is not None else before
+        t = 0.0 if after.tick == before.tick else (render - before.tick) / (after.tick - before.tick)
+
+        others = []
+        for slot, record in after.fighters.items():
+            if slot == self.slot or not record[FLAGS] & ALIVE:
+                continue
+            start = before.fighters.get(slot, record)
+            fighter = self.others.get(slot)
+            if fighter is None:
+                fighter = self.others[slot] = Player(self.names.get(slot, f"Player {slot + 1}"))
+                fighter.color = ARENA_PALETTE[slot % len(ARENA_PALETTE)]
+            fighter.username = self.names.get(slot, fighter.username)
+            fighter.rect.x = round(start[X] + (record[X] - start[X]) * t)
+            fighter.rect.y = round(start[Y] + (record[Y] - start[Y]) * t)
+            fighter.save_position() # Already in between, the scene's alpha doesn't move it
+            fighter.hp = record[HP]
+            fighter.facing_right = bool(record[FLAGS] & FACING_RIGHT)
+            fighter.is_attacking = bool(record[FLAGS] & ATTACKING)
+            fighter.weapon_id = record[WEAPON]
+            others.append(fighter)
+        view.battle_cpus = others
+
+        spare = self.spare_projectiles
+        spare.extend(view.projectiles)
+        projectiles = []
+        for shot in after.shots.values():
+            if render < shot[0]:
+                continue
+            x, y = shot_position(shot, render)
+            if spare:
+                p = spare.pop()
+                p.reset(x, y, 0, 0, shot[5], None)
+            else:
+                p = Projectile(x, y, 0, 0, shot[5], None)
+            projectiles.append(p)
+        view.projectiles = projectiles
+
+    def close(self):
+        self.send(bytes((MSG_LEAVE,)))
+        self.sock.close()
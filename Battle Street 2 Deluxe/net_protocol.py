@@ -0,0 +1,218 @@
+"""Packets between server.py and net_client.py, all over UDP.
+
+Client to server:
+    JOIN     b"J", version, name, weapon
+    INPUT    b"I", last snapshot tick received (the ack), newest input
+             sequence number, then the last few input masks, oldest first
+    LEAVE    b"L"
+
+Server to client:
+    WELCOME  b"W", slot, server tick, map name
+    FULL     b"F" (no free slot, or a different protocol version)
+    ROSTER   b"R", (slot, name) for every player
+    SNAPSHOT b"S", tick, base tick, last input sequence applied, body
+
+A snapshot body is the world quantized to integers and written as a delta
+against the last snapshot the client acked (or against nothing, when it
+hasn't acked one the server still remembers):
+
+    present slots (u32 bitmap), changed slots (u32 bitmap),
+    per changed slot, lowest first: a bitmask of changed fields, then each changed field
+    as a zigzag varint of (new - old),
+    shots spawned since the base: id, age, x, y, vx, vy, weapon as varints,
+    shots gone since the base: their ids.
+
+Shots are never sent while in flight, their path is fixed from the
+spawn record (see shot_position).
+"""
+import struct
+from replay import pack_name, unpack_name
+from weapons import weapon_table
+
+PROTOCOL_VERSION = 1
+MSG_JOIN = ord("J")
+MSG_INPUT = ord("I")
+MSG_LEAVE = ord("L")
+MSG_WELCOME = ord("W")
+MSG_FULL = ord("F")
+MSG_ROSTER = ord("R")
+MSG_SNAPSHOT = ord("S")
+NO_BASE = 0xFFFFFFFF
+
+JOIN = struct.Struct("<BB") # type, version, then the name and weapon
+INPUT = struct.Struct("<BIIB") # type, ack tick, newest sequence, mask count, then the masks
+WELCOME = struct.Struct("<BBI") # type, slot, tick, then the map name
+SNAPSHOT = struct.Struct("<BIII") # type, tick, base tick, input sequence applied, then the body
+BITMAPS = struct.Struct("<II")
+
+# Fighter record fields, all ints: x and y in pixels, vel_y in quarter pixels
+X, Y, VEL_Y, HP, FLAGS, WEAPON, KILLS, DEATHS = range(8)
+FIGHTER_FIELDS = 8
+EMPTY_FIGHTER = (0,) * FIGHTER_FIELDS
+FACING_RIGHT = 1
+ATTACKING = 2
+ON_GROUND = 4
+ALIVE = 8
+
+def write_varint(out, value):
+    value = value * 2 if value >= 0 else -value * 2 - 1 # Zigzag, small negatives stay short
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1), pos
+
+
+class WorldState:
+    """One tick of the world, quantized: fighter records by slot and shot spawn records by id"""
+    __slots__ = ("tick", "fighters", "shots")
+
+    def __init__(self, tick=0, fighters=None, shots=None):
+        self.tick = tick
+        self.fighters = fighters or {} # slot -> fighter record tuple
+        self.shots = shots or {} # id -> (spawn tick, x, y, vx, vy, weapon)
+
+EMPTY_STATE = WorldState()
+
+def fighter_record(fighter, kills=0, deaths=0):
+    flags = ((FACING_RIGHT if fighter.facing_right else 0) | (ATTACKING if fighter.is_attacking else 0) |
+             (ON_GROUND if fighter.on_ground else 0) | (ALIVE if fighter.hp > 0 else 0))
+    rect = fighter.rect
+    return (rect.x, rect.y, round(fighter.vel_y * 4), round(fighter.hp), flags, fighter.weapon_id, kills, deaths)
+
+def shot_position(shot, tick):
+    """Where a shot from its spawn record is at `tick` (may be fractional), same path as Projectile.update"""
+    spawn_tick, x, y, vx, vy, weapon = shot
+    n = tick - spawn_tick
+    gravity = weapon_table.weapons[weapon].gravity
+    return x + vx * n, y + vy * n + gravity * n * (n - 1) / 2
+
+def encode_body(state, base):
+    out = bytearray(8)
+    present = changed = 0
+    base_fighters = base.fighters
+    for slot, record in sorted(state.fighters.items()):
+        present |= 1 << slot
+        old = base_fighters.get(slot)
+        if record == old:
+            continue
+        old = old or EMPTY_FIGHTER
+        changed |= 1 << slot
+        mask = 0
+        for i in range(FIGHTER_FIELDS):
+            if record[i] != old[i]:
+                mask |= 1 << i
+        out.append(mask)
+        for i in range(FIGHTER_FIELDS):
+            if mask & (1 << i):
+                write_varint(out, record[i] - old[i])
+    BITMAPS.pack_into(out, 0, present, changed)
+
+    base_shots = base.shots
+    spawned = [(shot_id, shot) for shot_id, shot in state.shots.items() if shot_id not in base_shots]
+    write_varint(out, len(spawned))
+    for shot_id, (spawn_tick, x, y, vx, vy, weapon) in spawned:
+        for value in (shot_id, state.tick - spawn_tick, x, y, vx, vy, weapon):
+            write_varint(out, value)
+    gone = [shot_id for shot_id in base_shots if shot_id not in state.shots]
+    write_varint(out, len(gone))
+    for shot_id in gone:
+        write_varint(out, shot_id)
+    return bytes(out)
+
+def decode_body(data, pos, tick, base):
+    present, changed = BITMAPS.unpack_from(data, pos)
+    pos += BITMAPS.size
+    fighters = {}
+    for slot, record in base.fighters.items():
+        if present & (1 << slot):
+            fighters[slot] = record
+    for slot in range(32):
+        if not changed & (1 << slot):
+            continue
+        mask = data[pos]
+        pos += 1
+        record = list(base.fighters.get(slot, EMPTY_FIGHTER))
+        for i in range(FIGHTER_FIELDS):
+            if mask & (1 << i):
+                delta, pos = read_varint(data, pos)
+                record[i] += delta
+        fighters[slot] = tuple(record)
+
+    shots = dict(base.shots)
+    count, pos = read_varint(data, pos)
+    for _ in range(count):
+        values = []
+        for _ in range(7):
+            value, pos = read_varint(data, pos)
+            values.append(value)
+        shot_id, age, x, y, vx, vy, weapon = values
+        shots[shot_id] = (tick - age, x, y, vx, vy, weapon)
+    count, pos = read_varint(data, pos)
+    for _ in range(count):
+        shot_id, pos = read_varint(data, pos)
+        shots.pop(shot_id, None)
+    return WorldState(tick, fighters, shots)
+
+def encode_snapshot(tick, base_tick, input_seq, body):
+    return SNAPSHOT.pack(MSG_SNAPSHOT, tick, base_tick, input_seq) + body
+
+def decode_snapshot(data, states):
+    """(WorldState, input sequence applied), or None if the base isn't in `states` any more"""
+    _, tick, base_tick, input_seq = SNAPSHOT.unpack_from(data)
+    if base_tick == NO_BASE:
+        base = EMPTY_STATE
+    else:
+        base = states.get(base_tick)
+        if base is None:
+            return None
+    return decode_body(data, SNAPSHOT.size, tick, base), input_seq
+
+def encode_input(ack, seq, masks):
+    return INPUT.pack(MSG_INPUT, ack, seq, len(masks)) + bytes(masks)
+
+def decode_input(data):
+    _, ack, seq, count = INPUT.unpack_from(data)
+    return ack, seq, data[INPUT.size:INPUT.size + count]
+
+def encode_join(name, weapon):
+    return JOIN.pack(MSG_JOIN, PROTOCOL_VERSION) + pack_name(name[:32]) + pack_name(weapon)
+
+def decode_join(data):
+    _, version = JOIN.unpack_from(data)
+    name, pos = unpack_name(data, JOIN.size)
+    weapon, _ = unpack_name(data, pos)
+    return version, name, weapon
+
+def encode_welcome(slot, tick, map_name):
+    return WELCOME.pack(MSG_WELCOME, slot, tick) + pack_name(map_name)
+
+def decode_welcome(data):
+    _, slot, tick = WELCOME.unpack_from(data)
+    map_name, _ = unpack_name(data, WELCOME.size)
+    return slot, tick, map_name
+
+def encode_roster(names):
+    parts = [bytes((MSG_ROSTER, len(names)))]
+    for slot, name in names.items():
+        parts.append(bytes((slot,)) + pack_name(name))
+    return b"".join(parts)
+
+def decode_roster(data):
+    names = {}
+    pos = 2
+    for _ in range(data[1]):
+        slot = data[pos]
+        names[slot], pos = unpack_name(data, pos + 1)
+    return names
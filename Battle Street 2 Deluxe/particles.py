@@ -0,0 +1,158 @@
+import math
+import numpy as np
+import pygame
+from settings import *
+
+# Colours a burst fades through after its own base colour
+RAMP_TAIL = (YELLOW, ORANGE, RED, WHITE)
+SHOCKWAVE_LIFE = 30 # Ticks for a shockwave ring to reach the edge of its blast
+
+class ParticlePool:
+    """Fixed-capacity particle storage, one NumPy array per field.
+
+    Live particles are always packed into the first `count` slots, dead ones
+    are squeezed out with a mask after every update.
+    """
+    def __init__(self, capacity=PARTICLE_CAPACITY, seed=None):
+        self.capacity = capacity
+        self.count = 0
+        self.x = np.zeros(capacity, np.float32)
+        self.y = np.zeros(capacity, np.float32)
+        self.vx = np.zeros(capacity, np.float32)
+        self.vy = np.zeros(capacity, np.float32)
+        self.size = np.zeros(capacity, np.float32)
+        self.life = np.zeros(capacity, np.int16)
+        self.color = np.zeros(capacity, np.uint8) # Index into self.ramps
+        self.fields = [self.x, self.y, self.vx, self.vy, self.size, self.life, self.color]
+        self.rng = np.random.default_rng(seed)
+        self.burst_scale = 1.0 # Share of the particles bursts and blasts spawn, lowered by the quality governor
+
+        # Precomputed colour ramps, one per base colour seen so far
+        self.ramps = []
+        self.ramp_ids = {}
+
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def ramp_id(self, color):
+        color = tuple(color)
+        ramp = self.ramp_ids.get(color)
+        if ramp is None:
+            ramp = len(self.ramps)
+            self.ramps.append((color,) + RAMP_TAIL)
+            self.ramp_ids[color] = ramp
+        return ramp
+
+    def spawn_burst(self, x, y, color, amount=PARTICLES_PER_BURST):
+        amount = min(max(1, int(amount * self.burst_scale)), self.capacity - self.count)
+        if amount <= 0:
+            return
+        start, end = self.count, self.count + amount
+
+        # Evenly spread around a circle with random speeds
+        angles = np.arange(amount, dtype=np.float32) * (2 * math.pi / amount)
+        speeds = self.rng.uniform(2, 5, amount).astype(np.float32)
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.vx[start:end] = np.cos(angles) * speeds
+        self.vy[start:end] = np.sin(angles) * speeds
+        self.size[start:end] = self.rng.integers(3, PARTICLE_MAX_SIZE + 1, amount)
+        self.life[start:end] = self.rng.integers(20, 41, amount)
+        self.color[start:end] = self.ramp_id(color)
+        self.count = end
+
+    def spawn_shockwaves(self, blasts, amount=SHOCKWAVE_PARTICLES):
+        """One expanding ring per (x, y, radius, color) blast, every ring in a single batch.
+
+        Ring particles all start at the centre and reach the blast's radius
+        just as they fade out.
+        """
+        amount = max(1, int(amount * self.burst_scale))
+        count = min(len(blasts), (self.capacity - self.count) // amount)
+        if count <= 0:
+            return
+        total = count * amount
+        start, end = self.count, self.count + total
+        x, y, radius, colors = zip(*blasts[:count])
+
+        angles = np.tile(np.arange(amount, dtype=np.float32) * (2 * math.pi / amount), count)
+        speeds = np.repeat(np.asarray(radius, np.float32) / SHOCKWAVE_LIFE, amount)
+        self.x[start:end] = np.repeat(np.asarray(x, np.float32), amount)
+        self.y[start:end] = np.repeat(np.asarray(y, np.float32), amount)
+        self.vx[start:end] = np.cos(angles) * speeds
+        self.vy[start:end] = np.sin(angles) * speeds
+        self.size[start:end] = PARTICLE_MAX_SIZE
+        self.life[start:end] = SHOCKWAVE_LIFE
+        self.color[start:end] = np.repeat([self.ramp_id(color) for color in colors], amount)
+        self.count = end
+
+    def update(self):
+        n = self.count
+        if not n:
+            return
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.life[:n] -= 1
+
+        alive = self.life[:n] > 0
+        live = int(np.count_nonzero(alive))
+        if live < n:
+            for field in self.fields:
+                field[:live] = field[:n][alive]
+        self.count = live
+
+    def draw(self, screen, offset=(0, 0), lod=0):
+        """Draw every live particle that's on screen, returns the area covered.
+
+        lod 1 draws squares instead of circles, lod 2 also skips every other particle.
+        """
+        n = self.count
+        if not n:
+            return None
+        x = self.x[:n] - offset[0]
+        y = self.y[:n] - offset[1]
+        size = self.size[:n]
+        life = self.life[:n]
+        color = self.color[:n]
+        # Cull the ones off screen (bursts elsewhere on a big map)
+        width, height = screen.get_size()
+        reach = PARTICLE_MAX_SIZE
+        visible = (x > -reach) & (x < width + reach) & (y > -reach) & (y < height + reach)
+        if not visible.all():
+            if not visible.any():
+                return None
+            x, y, size, life, color = x[visible], y[visible], size[visible], life[visible], color[visible]
+        if lod >= 2:
+            x, y, size, life, color = x[::2], y[::2], size[::2], life[::2], color[::2]
+
+        # Fade out as life decreases, stepping through the burst's ramp
+        ratio = life / PARTICLE_MAX_LIFE
+        sizes = (size * ratio).astype(np.int32)
+        stages = np.minimum(((1 - ratio) * (len(RAMP_TAIL))).astype(np.int32), len(RAMP_TAIL))
+
+        ramps = self.ramps
+        points = zip(x.astype(np.int32).tolist(), y.astype(np.int32).tolist(), sizes.tolist(), color.tolist(),
+                     stages.tolist())
+        if lod:
+            fill = screen.fill
+            for px, py, radius, ramp, stage in points:
+                if radius > 0:
+                    fill(ramps[ramp][stage], (px - radius, py - radius, radius * 2, radius * 2))
+        else:
+            circle = pygame.draw.circle
+            for px, py, radius, ramp, stage in points:
+                if radius > 0:
+                    circle(screen, ramps[ramp][stage], (px, py), radius)
+
+        # Bounding box of the whole cloud is plenty for dirty-rect purposes
+        reach = int(size.max()) + 1
+        left = int(x.min()) - reach
+        top = int(y.min()) - reach
+        return pygame.Rect(left, top, int(x.max()) + reach - left, int(y.max()) + reach - top)
+
+    def clear(self):
+        self.count = 0
+
+
+# Shared by every explosion in the game
+particle_pool = ParticlePool()
@@ -0,0 +1,445 @@
+"""Battles with the simulation in a worker thread or process.
+
+The worker owns the match: it steps its own Simulation at TICK_RATE and,
+after every tick, copies the world into one of three snapshot slots in a
+shared memory block. The main thread sends the player's input the other
+way through the same block and draws whichever snapshot was published
+last, so a slow frame no longer holds up the simulation or the other way
+round.
+
+Triple buffering: the worker writes into a slot that is neither the
+latest one nor the one being read, then makes it the latest. The reader
+claims the latest slot and copies it out. Only those two swaps take the
+lock, and a published slot is never written to again while it is being
+read.
+
+In "process" mode the simulation gets a core of its own. "thread" mode
+shares the interpreter and only overlaps with the parts of drawing that
+let go of the GIL (blits and scaling), but needs nothing from the OS.
+"""
+import multiprocessing
+import random
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from settings import *
+from player import Player
+from simulation import Simulation, PlayerInput, INPUT_ATTACK
+from arena import ArenaSimulation, WeaponArrays
+from replay import ReplayRecorder
+from particles import ParticlePool
+from game_objects import Projectile
+
+SNAPSHOT_SLOTS = 3
+SHOT_CAPACITY = PROJECTILE_POOL_SIZE + ARENA_PROJECTILE_CAPACITY
+START_TIMEOUT = 10 # Seconds to wait for the worker's first snapshot
+RESULTS = (None, "win", "loss")
+
+# Control block, written by the main thread (the last two under the lock)
+INPUT, ATTACKS, STOP, LATEST, READING = range(5)
+CONTROL_FIELDS = 5
+# Per-slot header
+H_TICK, H_PUBLISHED, H_RESULT, H_COINS, H_FIGHTERS, H_SHOTS, H_PARTICLES = range(7)
+HEADER_FIELDS = 7
+# Fighter rows, the player first. COLOR is packed RGB, or the palette index for arena CPUs
+F_ID, F_X, F_Y, F_PREV_X, F_PREV_Y, F_HP, F_MAX_HP, F_FACING, F_ATTACKING, F_WEAPON, F_COLOR = range(11)
+FIGHTER_FIELDS = 11
+# Shot rows. OBJECT is 1 for Projectiles, 0 for arena CPU shots
+S_X, S_Y, S_PREV_X, S_PREV_Y, S_WEAPON, S_OBJECT = range(6)
+SHOT_FIELDS = 6
+# Particle rows, COLOR is the packed RGB base colour of the burst's ramp
+P_X, P_Y, P_SIZE, P_LIFE, P_COLOR = range(5)
+PARTICLE_FIELDS = 5
+
+def pack_rgb(color):
+    # 24 bits, exact in a float32
+    return (color[0] << 16) | (color[1] << 8) | color[2]
+
+def unpack_rgb(packed):
+    packed = int(packed)
+    return ((packed >> 16) & 255, (packed >> 8) & 255, packed & 255)
+
+
+class SnapshotBuffer:
+    """The shared memory block: control words, then SNAPSHOT_SLOTS snapshots.
+
+    Created by the main thread (name=None) and attached to by the worker.
+    """
+    def __init__(self, fighters, name=None):
+        self.fighter_capacity = fighters
+        layout = [((CONTROL_FIELDS,), np.int64),
+                  ((SNAPSHOT_SLOTS, HEADER_FIELDS), np.float64),
+                  ((SNAPSHOT_SLOTS, fighters, FIGHTER_FIELDS), np.float32),
+                  ((SNAPSHOT_SLOTS, SHOT_CAPACITY, SHOT_FIELDS), np.float32),
+                  ((SNAPSHOT_SLOTS, PARTICLE_CAPACITY, PARTICLE_FIELDS), np.float32)]
+        size = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for shape, dtype in layout)
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.name = self.shm.name
+        arrays = []
+        offset = 0
+        for shape, dtype in layout:
+            array = np.ndarray(shape, dtype, buffer=self.shm.buf, offset=offset)
+            offset += array.nbytes
+            arrays.append(array)
+        self.control, self.header, self.fighters, self.shots, self.particles = arrays
+        if name is None:
+            self.control[:] = 0
+            self.control[LATEST] = self.control[READING] = -1
+
+    def close(self, unlink=False):
+        # The arrays point into the block, they have to go before it can be closed
+        self.control = self.header = self.fighters = self.shots = self.particles = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class SnapshotWriter:
+    """Worker side: copies a Simulation into the next free slot and publishes it"""
+    def __init__(self, buffer, lock, sim):
+        self.buffer = buffer
+        self.lock = lock
+        self.sim = sim
+        self.arena = isinstance(sim, ArenaSimulation)
+        # CPU number for each Player, so the main thread keeps their name labels straight
+        self.ids = {id(cpu): i + 1 for i, cpu in enumerate(sim.battle_cpus)}
+        self.ramp_colors = np.zeros(0, np.float32)
+
+    def publish(self):
+        buffer = self.buffer
+        control = buffer.control
+        with self.lock:
+            busy = (control[LATEST], control[READING])
+            slot = next(s for s in range(SNAPSHOT_SLOTS) if s not in busy)
+        sim = self.sim
+        header = buffer.header[slot]
+        header[H_FIGHTERS] = self.write_fighters(buffer.fighters[slot])
+        header[H_SHOTS] = self.write_shots(buffer.shots[slot])
+        header[H_PARTICLES] = self.write_particles(buffer.particles[slot])
+        header[H_TICK] = sim.tick_count
+        header[H_RESULT] = RESULTS.index(sim.result)
+        header[H_COINS] = sim.player.coins
+        header[H_PUBLISHED] = time.perf_counter()
+        with self.lock:
+            control[LATEST] = slot
+
+    def write_fighters(self, out):
+        sim = self.sim
+        rows = [sim.player] if self.arena else [sim.player] + sim.battle_cpus
+        rows = rows[:len(out)]
+        for i, f in enumerate(rows):
+            out[i] = (self.ids.get(id(f), 0), f.rect.x, f.rect.y, f.prev_x, f.prev_y, f.hp, f.max_hp,
+                      f.facing_right, f.is_attacking, f.weapon_id, pack_rgb(f.color))
+        start = len(rows)
+        if not self.arena:
+            return start
+        n = min(len(sim.x), len(out) - start)
+        cpus = out[start:start + n]
+        cpus[:, F_ID] = np.arange(1, n + 1)
+        for field, column in ((F_X, sim.x), (F_Y, sim.y), (F_PREV_X, sim.prev_x), (F_PREV_Y, sim.prev_y),
+                              (F_HP, sim.hp), (F_FACING, sim.facing_right), (F_ATTACKING, sim.attacking),
+                              (F_WEAPON, sim.weapon), (F_COLOR, sim.color)):
+            cpus[:, field] = column[:n]
+        cpus[:, F_MAX_HP] = 80
+        return start + n
+
+    def write_shots(self, out):
+        sim = self.sim
+        projectiles = sim.projectiles[:len(out)]
+        for i, p in enumerate(projectiles):
+            out[i] = (p.x, p.y, p.prev_x, p.prev_y, p.weapon_id, 1)
+        start = len(projectiles)
+        if not self.arena:
+            return start
+        n = min(sim.shot_count, len(out) - start)
+        shots = out[start:start + n]
+        for field, column in ((S_X, sim.shot_x), (S_Y, sim.shot_y), (S_PREV_X, sim.shot_prev_x),
+                              (S_PREV_Y, sim.shot_prev_y), (S_WEAPON, sim.shot_weapon)):
+            shots[:, field] = column[:n]
+        shots[:, S_OBJECT] = 0
+        return start + n
+
+    def write_particles(self, out):
+        pool = self.sim.particles
+        n = min(pool.count, len(out))
+        if len(self.ramp_colors) != len(pool.ramps):
+            self.ramp_colors = np.array([pack_rgb(ramp[0]) for ramp in pool.ramps], np.float32)
+        out[:n, P_X] = pool.x[:n]
+        out[:n, P_Y] = pool.y[:n]
+        out[:n, P_SIZE] = pool.size[:n]
+        out[:n, P_LIFE] = pool.life[:n]
+        out[:n, P_COLOR] = self.ramp_colors[pool.color[:n]]
+        return n
+
+
+def make_worker_simulation(setup):
+    # Maps registered at runtime (benchmarks, tools) aren't in a fresh process's settings
+    MAPS.setdefault(setup["map_name"], setup["map_data"])
+    player = Player(setup["username"])
+    player.coins = setup["coins"]
+    player.inventory = list(setup["inventory"])
+    player.current_weapon_name = setup["weapon"]
+    sim_class = ArenaSimulation if setup["arena"] else Simulation
+    # Its own particles, the main thread's pool isn't the worker's to touch
+    sim = sim_class(player, particles=ParticlePool())
+    sim.load_map(setup["map_name"])
+    sim.start(setup["num_cpus"], seed=setup["seed"])
+    return sim
+
+def worker_main(shm_name, lock, setup, realtime=True):
+    """Play one match, publishing a snapshot after every tick. Runs in the worker."""
+    buffer = SnapshotBuffer(setup["num_cpus"] + 1, shm_name)
+    try:
+        sim = make_worker_simulation(setup)
+        recorder = ReplayRecorder(setup["seed"], setup["num_cpus"], setup["weapon"], sim.map_name)
+        writer = SnapshotWriter(buffer, lock, sim)
+        writer.publish()
+        control = buffer.control
+        attacks_seen = 0
+        tick_s = TICK_MS / 1000
+        next_tick = time.perf_counter()
+        try:
+            while not control[STOP] and not sim.result:
+                if realtime:
+                    next_tick += tick_s
+                    delay = next_tick - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        # Running behind, drop the backlog instead of spiraling
+                        next_tick = max(next_tick, time.perf_counter() - tick_s * MAX_TICKS_PER_FRAME)
+                mask = int(control[INPUT])
+                attacks = int(control[ATTACKS])
+                if mask < 0:
+                    player_input = None # The CPU AI plays
+                else:
+                    if attacks != attacks_seen:
+                        mask |= INPUT_ATTACK
+                    player_input = PlayerInput.from_mask(mask)
+                    recorder.record(player_input)
+                attacks_seen = attacks
+                sim.step(player_input)
+                writer.publish()
+        finally:
+            recorder.save(REPLAY_FILE)
+    finally:
+        buffer.close()
+
+
+class SnapshotView:
+    """The latest snapshot, dressed up as enough of a Simulation for the battle scenes to draw.
+
+    Fighters are stand-in Players and shots stand-in Projectiles, reused
+    from frame to frame. Arena CPUs and their shots are arrays, like
+    ArenaSimulation's.
+    """
+    def __init__(self, sim, player, arena):
+        # The map comes from the main thread's own Simulation, which sits idle
+        self.map_name = sim.map_name
+        self.current_map_data = sim.current_map_data
+        self.platforms = sim.platforms
+        self.world_width = sim.world_width
+        self.world_height = sim.world_height
+        self.arena = arena
+        self.player = Player(player.username)
+        self.cpus = {} # CPU number -> stand-in Player
+        self.battle_cpus = []
+        self.projectiles = []
+        self.spare_projectiles = []
+        self.particles = ParticlePool()
+        self.tick_count = -1
+        self.published = 0.0
+        self.result = None
+        self.coins = player.coins
+        if arena:
+            self.weapons = WeaponArrays()
+            self.load_arena(np.zeros((0, FIGHTER_FIELDS), np.float32), np.zeros((0, SHOT_FIELDS), np.float32))
+
+    @property
+    def cpu_count(self):
+        return len(self.x) if self.arena else len(self.battle_cpus)
+
+    @property
+    def projectile_count(self):
+        return len(self.projectiles) + (self.shot_count if self.arena else 0)
+
+    def clear_projectiles(self):
+        self.projectiles = []
+
+    def load(self, buffer, slot):
+        header = buffer.header[slot]
+        self.tick_count = int(header[H_TICK])
+        self.published = header[H_PUBLISHED]
+        self.result = RESULTS[int(header[H_RESULT])]
+        self.coins = int(header[H_COINS])
+        fighters = buffer.fighters[slot][:int(header[H_FIGHTERS])].copy()
+        shots = buffer.shots[slot][:int(header[H_SHOTS])].copy()
+        self.load_particles(buffer.particles[slot][:int(header[H_PARTICLES])])
+
+        self.pose(self.player, fighters[0])
+        objects = shots[:, S_OBJECT] > 0
+        self.load_projectiles(shots[objects])
+        if self.arena:
+            self.load_arena(fighters[1:], shots[~objects])
+            return
+        cpus = []
+        for row in fighters[1:]:
+            number = int(row[F_ID])
+            cpu = self.cpus.get(number)
+            if cpu is None:
+                cpu = self.cpus[number] = Player(f"CPU {number}", is_cpu=True, rng=random.Random(number))
+            self.pose(cpu, row)
+            cpus.append(cpu)
+        self.battle_cpus = cpus
+
+    def pose(self, fighter, row):
+        fighter.rect.x = int(row[F_X])
+        fighter.rect.y = int(row[F_Y])
+        fighter.prev_x = float(row[F_PREV_X])
+        fighter.prev_y = float(row[F_PREV_Y])
+        fighter.hp = float(row[F_HP])
+        fighter.max_hp = float(row[F_MAX_HP])
+        fighter.facing_right = bool(row[F_FACING])
+        fighter.is_attacking = bool(row[F_ATTACKING])
+        fighter.weapon_id = int(row[F_WEAPON])
+        fighter.color = unpack_rgb(row[F_COLOR])
+
+    def load_projectiles(self, rows):
+        # Only drawn, never stepped, so they don't come from (or go back to) projectile_pool
+        spare = self.spare_projectiles
+        spare.extend(self.projectiles)
+        projectiles = []
+        for x, y, prev_x, prev_y, weapon in rows[:, :S_OBJECT].tolist():
+            weapon = int(weapon)
+            if spare:
+                p = spare.pop()
+                p.reset(x, y, 0, 0, weapon, None)
+            else:
+                p = Projectile(x, y, 0, 0, weapon, None)
+            p.prev_x = prev_x
+            p.prev_y = prev_y
+            projectiles.append(p)
+        self.projectiles = projectiles
+
+    def load_arena(self, cpus, shots):
+        self.x = cpus[:, F_X].astype(np.float64)
+        self.y = cpus[:, F_Y].astype(np.float64)
+        self.prev_x = cpus[:, F_PREV_X].astype(np.float64)
+        self.prev_y = cpus[:, F_PREV_Y].astype(np.float64)
+        self.hp = cpus[:, F_HP].astype(np.float64)
+        self.facing_right = cpus[:, F_FACING] > 0
+        self.attacking = cpus[:, F_ATTACKING] > 0
+        self.weapon = cpus[:, F_WEAPON].astype(np.int16)
+        self.color = cpus[:, F_COLOR].astype(np.int8)
+        self.shot_count = len(shots)
+        self.shot_x = shots[:, S_X].astype(np.float64)
+        self.shot_y = shots[:, S_Y].astype(np.float64)
+        self.shot_prev_x = shots[:, S_PREV_X].astype(np.float64)
+        self.shot_prev_y = shots[:, S_PREV_Y].astype(np.float64)
+        self.shot_weapon = shots[:, S_WEAPON].astype(np.int16)
+
+    def load_particles(self, rows):
+        pool = self.particles
+        n = len(rows)
+        pool.count = n
+        if not n:
+            return
+        pool.x[:n] = rows[:, P_X]
+        pool.y[:n] = rows[:, P_Y]
+        pool.size[:n] = rows[:, P_SIZE]
+        pool.life[:n] = rows[:, P_LIFE]
+        # Base colours to this pool's own ramp ids
+        colors, inverse = np.unique(rows[:, P_COLOR], return_inverse=True)
+        ramps = np.array([pool.ramp_id(unpack_rgb(c)) for c in colors.tolist()], np.uint8)
+        pool.color[:n] = ramps[inverse]
+
+
+class Pipeline:
+    """Main thread side of one pipelined match: starts the worker, feeds it input, reads snapshots.
+
+    Raises OSError or RuntimeError if the worker can't be started, the
+    scene then runs the match itself.
+    """
+    realtime = True # Tick at TICK_RATE. Benchmarks turn this off to run the worker flat out.
+
+    def __init__(self, game_sim, player, num_cpus, arena, mode="thread"):
+        self.mode = mode
+        self.setup = {
+            "username": player.username,
+            "coins": player.coins,
+            "inventory": list(player.inventory),
+            "weapon": player.current_weapon_name,
+            "num_cpus": num_cpus,
+            "seed": random.getrandbits(32), # Fresh per match, like BattleScene
+            "map_name": game_sim.map_name,
+            "map_data": game_sim.current_map_data,
+            "arena": arena,
+        }
+        self.buffer = SnapshotBuffer(num_cpus + 1)
+        self.view = SnapshotView(game_sim, player, arena)
+        self.worker = None
+
+    def start(self):
+        if self.mode == "process":
+            # spawn, not fork: a forked copy of an initialized SDL isn't safe to use
+            context = multiprocessing.get_context("spawn")
+            self.lock = context.Lock()
+            worker_class = context.Process
+        else:
+            self.lock = threading.Lock()
+            worker_class = threading.Thread
+        self.worker = worker_class(target=worker_main, args=(self.buffer.name, self.lock, self.setup, self.realtime),
+                                   daemon=True)
+        try:
+            self.worker.start()
+            # The scene needs a first snapshot to place its camera
+            deadline = time.perf_counter() + START_TIMEOUT
+            while not self.refresh():
+                if not self.worker.is_alive() or time.perf_counter() > deadline:
+                    raise RuntimeError(f"battle worker ({self.mode}) didn't start")
+                time.sleep(0.005)
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    @property
+    def running(self):
+        return self.worker is not None and self.worker.is_alive()
+
+    def send_input(self, player_input):
+        control = self.buffer.control
+        if player_input is None:
+            control[INPUT] = -1
+            return
+        control[INPUT] = player_input.to_mask() & ~INPUT_ATTACK
+        if player_input.attack:
+            control[ATTACKS] += 1
+
+    def refresh(self):
+        """Load the latest snapshot into the view, if there's a new one"""
+        buffer = self.buffer
+        control = buffer.control
+        with self.lock:
+            slot = int(control[LATEST])
+            control[READING] = slot
+        if slot < 0 or buffer.header[slot, H_TICK] == self.view.tick_count:
+            return False
+        self.view.load(buffer, slot)
+        return True
+
+    def alpha(self):
+        """How far between the snapshot's last two ticks to draw, from how long ago it was published"""
+        return min(1.0, max(0.0, (time.perf_counter() - self.view.published) * TICK_RATE))
+
+    def stop(self):
+        if self.buffer is None:
+            return
+        self.buffer.control[STOP] = 1
+        if self.worker is not None and self.worker.is_alive():
+            self.worker.join(START_TIMEOUT)
+            if self.worker.is_alive() and self.mode == "process":
+                self.worker.terminate()
+        self.buffer.close(unlink=True)
+        self.buffer = None
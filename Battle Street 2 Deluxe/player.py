@@ -1,9 +1,24 @@
 import pygame
 import random
 from settings import *
+from text_cache import render_text
+from sprite_cache import sprite_cache
+from weapons import weapon_table, FIST_ID
+
+# Room around the 40x60 body rect for the head, arms and shadow in the baked sprite
+BODY_PAD_X = 30
+BODY_PAD_Y = 40
+BODY_PAD_BOTTOM = 10
+HP_BAR_WIDTH = 50
+HP_BAR_HEIGHT = 5
 
 class Player:
-    def __init__(self, username="Player", is_cpu=False):
+    __slots__ = ("username", "is_cpu", "coins", "hp", "max_hp", "inventory", "weapon_id",
+                 "rect", "prev_x", "prev_y", "vel_y", "vel_x", "on_ground", "facing_right", "speed",
+                 "timers", "is_attacking", "role", "vehicle", "hat", "color",
+                 "nav_node", "route_key", "route_edge")
+
+    def __init__(self, username="Player", is_cpu=False, rng=None):
         self.username = username
         self.is_cpu = is_cpu
         self.coins = STARTING_COINS
@@ -12,10 +27,12 @@ class Player:
         
         # New inventory system matching original
         self.inventory = ["Fist"] 
-        self.current_weapon_name = "Fist"
+        self.weapon_id = FIST_ID # Index into weapon_table, see current_weapon_name
         
         # Physics
         self.rect = pygame.Rect(100, 300, 40, 60) # Original size was 40x60
+        self.prev_x = self.rect.x # Position at the previous tick, for render interpolation
+        self.prev_y = self.rect.y
         self.vel_y = 0
         self.vel_x = 0
         self.on_ground = False
@@ -23,24 +40,38 @@ class Player:
         self.speed = 5
         
         # Combat
-        self.last_attack_time = 0
-        self.attack_cooldown = 0
+        self.timers = {} # Running TimerWheel timers by name: "cooldown" and "attack"
         self.is_attacking = False
+
+        # CPU AI navigation (nav.py)
+        self.nav_node = None # Platform last stood on
+        self.route_key = None # (platform, target's platform) route_edge was looked up for
+        self.route_edge = None # NavEdge being followed
         
         # Original Game Stats
         self.role = "Fighter"
         self.vehicle = "None"
         self.hat = None
         
-        # Appearance
+        # Appearance (pass the match's rng so replays get the same colours)
         if self.is_cpu:
-            self.color = (random.randint(50, 255), random.randint(50, 255), random.randint(50, 255))
+            rng = rng or random
+            self.color = (rng.randint(50, 255), rng.randint(50, 255), rng.randint(50, 255))
         else:
             self.color = BLUE
 
     @property
     def current_weapon(self):
-        return WEAPONS_DATA[self.current_weapon_name]
+        return weapon_table.weapons[self.weapon_id]
+
+    @property
+    def current_weapon_name(self):
+        return weapon_table.weapons[self.weapon_id].name
+
+    @current_weapon_name.setter
+    def current_weapon_name(self, name):
+        # Old saves can name weapons that no longer exist
+        self.weapon_id = weapon_table.id_of(name) if name in WEAPONS_DATA else FIST_ID
 
     def equip_weapon(self, weapon_name):
         if weapon_name in self.inventory:
@@ -72,86 +103,140 @@ class Player:
         self.hp = self.max_hp
         self.is_attacking = False
         self.vel_y = 0
+        # Leftover state from the last battle would make matches unrepeatable
+        self.vel_x = 0
+        self.on_ground = False
+        self.facing_right = True
+        self.clear_timers()
+        self.clear_route()
+        self.save_position()
+
+    def clear_timers(self):
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers.clear()
+
+    def clear_route(self):
+        self.nav_node = None
+        self.route_key = None
+        self.route_edge = None
+
+    def save_position(self):
+        self.prev_x = self.rect.x
+        self.prev_y = self.rect.y
+
+    def interpolated_rect(self, alpha):
+        rect = self.rect.copy()
+        rect.x = round(self.prev_x + (self.rect.x - self.prev_x) * alpha)
+        rect.y = round(self.prev_y + (self.rect.y - self.prev_y) * alpha)
+        return rect
+
+    def body_key(self, has_weapon_img):
+        # Everything the baked body sprite depends on
+        return ("player", self.rect.size, self.color, self.hat, self.is_cpu,
+                self.facing_right, self.hp > 50, has_weapon_img)
+
+    def render_body(self, has_weapon_img):
+        """Bake shadow, body, head, face and arms into one surface"""
+        surface = pygame.Surface((self.rect.width + BODY_PAD_X * 2, self.rect.height + BODY_PAD_Y + BODY_PAD_BOTTOM), pygame.SRCALPHA)
+        rect = pygame.Rect(BODY_PAD_X, BODY_PAD_Y, self.rect.width, self.rect.height)
 
-    def draw(self, screen, weapon_textures=None):
         # Draw shadows
-        pygame.draw.ellipse(screen, (0, 0, 0, 100), (self.rect.x, self.rect.bottom - 5, self.rect.width, 10))
+        pygame.draw.ellipse(surface, BLACK, (rect.x, rect.bottom - 5, rect.width, 10))
         
         # Body
-        pygame.draw.rect(screen, self.color, self.rect, border_radius=10)
-        pygame.draw.rect(screen, BLACK, self.rect, 2, border_radius=10)
+        pygame.draw.rect(surface, self.color, rect, border_radius=10)
+        pygame.draw.rect(surface, BLACK, rect, 2, border_radius=10)
         
         # Head
         head_radius = 20
-        head_center = (self.rect.centerx, self.rect.top - head_radius + 5)
-        pygame.draw.circle(screen, LIGHT_BLUE if self.is_cpu else WHITE, head_center, head_radius)
-        pygame.draw.circle(screen, BLACK, head_center, head_radius, 2)
+        head_center = (rect.centerx, rect.top - head_radius + 5)
+        pygame.draw.circle(surface, LIGHT_BLUE if self.is_cpu else WHITE, head_center, head_radius)
+        pygame.draw.circle(surface, BLACK, head_center, head_radius, 2)
         
         # Eyes (Directional)
         eye_color = BLACK
         look_offset = 3 if self.facing_right else -3
-        pygame.draw.circle(screen, eye_color, (head_center[0] - 7 + look_offset, head_center[1] - 2), 3)
-        pygame.draw.circle(screen, eye_color, (head_center[0] + 7 + look_offset, head_center[1] - 2), 3)
+        pygame.draw.circle(surface, eye_color, (head_center[0] - 7 + look_offset, head_center[1] - 2), 3)
+        pygame.draw.circle(surface, eye_color, (head_center[0] + 7 + look_offset, head_center[1] - 2), 3)
         
         # Mouth (simple smile if high HP, straight if low)
         if self.hp > 50:
-            pygame.draw.arc(screen, BLACK, (head_center[0] - 10, head_center[1], 20, 10), 3.14, 0, 2)
+            pygame.draw.arc(surface, BLACK, (head_center[0] - 10, head_center[1], 20, 10), 3.14, 0, 2)
         else:
-             pygame.draw.line(screen, BLACK, (head_center[0] - 5, head_center[1] + 10), (head_center[0] + 5, head_center[1] + 10), 2)
+             pygame.draw.line(surface, BLACK, (head_center[0] - 5, head_center[1] + 10), (head_center[0] + 5, head_center[1] + 10), 2)
 
         # Arms
-        arm_start_y = self.rect.top + 20
-        
-        # Weapon Handling
-        weapon_img = None
-        if weapon_textures and self.current_weapon_name in weapon_textures:
-            weapon_img = weapon_textures[self.current_weapon_name]
-        
-        hand_pos = (self.rect.right + 5 if self.facing_right else self.rect.left - 5, arm_start_y + 15)
+        arm_start_y = rect.top + 20
+        hand_pos = (rect.right + 5 if self.facing_right else rect.left - 5, arm_start_y + 15)
         
         if self.facing_right:
             # Right Arm (Holding Weapon)
-            pygame.draw.line(screen, BLACK, (self.rect.right - 5, arm_start_y), hand_pos, 4)
-            if weapon_img:
-                # Rotate weapon if attacking?
-                # For now just draw it
-                img_rect = weapon_img.get_rect(center=hand_pos)
-                if self.is_attacking:
-                    # Swing effect
-                    img_rect.x += 10
-                    img_rect.y += 5
-                screen.blit(weapon_img, img_rect)
-            else:
+            pygame.draw.line(surface, BLACK, (rect.right - 5, arm_start_y), hand_pos, 4)
+            if not has_weapon_img:
                  # Default rect weapon
-                 pygame.draw.line(screen, GRAY, hand_pos, (hand_pos[0]+20, hand_pos[1]), 5)
+                 pygame.draw.line(surface, GRAY, hand_pos, (hand_pos[0]+20, hand_pos[1]), 5)
 
             # Left Arm
-            pygame.draw.line(screen, BLACK, (self.rect.left + 5, arm_start_y), (self.rect.left - 10, arm_start_y + 10), 4)
+            pygame.draw.line(surface, BLACK, (rect.left + 5, arm_start_y), (rect.left - 10, arm_start_y + 10), 4)
 
         else:
              # Left Arm (Holding Weapon)
-            pygame.draw.line(screen, BLACK, (self.rect.left + 5, arm_start_y), hand_pos, 4)
-            if weapon_img:
-                flipped_img = pygame.transform.flip(weapon_img, True, False)
-                img_rect = flipped_img.get_rect(center=hand_pos)
-                if self.is_attacking:
-                     img_rect.x -= 10
-                screen.blit(flipped_img, img_rect)
-            else:
-                 pygame.draw.line(screen, GRAY, hand_pos, (hand_pos[0]-20, hand_pos[1]), 5)
+            pygame.draw.line(surface, BLACK, (rect.left + 5, arm_start_y), hand_pos, 4)
+            if not has_weapon_img:
+                 pygame.draw.line(surface, GRAY, hand_pos, (hand_pos[0]-20, hand_pos[1]), 5)
             
             # Right Arm
-            pygame.draw.line(screen, BLACK, (self.rect.right - 5, arm_start_y), (self.rect.right + 10, arm_start_y + 10), 4)
+            pygame.draw.line(surface, BLACK, (rect.right - 5, arm_start_y), (rect.right + 10, arm_start_y + 10), 4)
+
+        return surface
+
+    def draw(self, screen, weapon_textures=None, alpha=1.0, flipped_textures=None, offset=(0, 0), label=True):
+        rect = self.interpolated_rect(alpha)
+        rect.move_ip(-offset[0], -offset[1]) # World to screen
 
-        # Username
-        font = pygame.font.SysFont(FONT_NAME, 20)
-        text_surf = font.render(self.username, True, BLACK)
-        text_rect = text_surf.get_rect(midbottom=(self.rect.centerx, self.rect.top - 45))
-        screen.blit(text_surf, text_rect)
+        # Weapon Handling (textures facing left are flipped once, up front)
+        weapon_img = None
+        name = self.current_weapon_name
+        if weapon_textures and name in weapon_textures:
+            if self.facing_right:
+                weapon_img = weapon_textures[name]
+            elif flipped_textures and name in flipped_textures:
+                weapon_img = flipped_textures[name]
+            else:
+                weapon_img = sprite_cache.get(("flipped", name), lambda: pygame.transform.flip(weapon_textures[name], True, False))
+
+        has_weapon_img = weapon_img is not None
+        body = sprite_cache.get(self.body_key(has_weapon_img), lambda: self.render_body(has_weapon_img))
+        # Area drawn this frame, for dirty-rect rendering
+        dirty = screen.blit(body, (rect.x - BODY_PAD_X, rect.y - BODY_PAD_Y))
+
+        if weapon_img:
+            hand_pos = (rect.right + 5 if self.facing_right else rect.left - 5, rect.top + 35)
+            img_rect = weapon_img.get_rect(center=hand_pos)
+            if self.is_attacking:
+                # Swing effect
+                if self.facing_right:
+                    img_rect.x += 10
+                    img_rect.y += 5
+                else:
+                    img_rect.x -= 10
+            dirty.union_ip(screen.blit(weapon_img, img_rect))
+
+        # Username, dropped at low quality tiers
+        if label:
+            text_surf = render_text(self.username, 20, BLACK)
+            text_rect = text_surf.get_rect(midbottom=(rect.centerx, rect.top - 45))
+            dirty.union_ip(screen.blit(text_surf, text_rect))
         
         # HP Bar
-        bar_width = 50
-        bar_height = 5
-        fill = (self.hp / self.max_hp) * bar_width
-        pygame.draw.rect(screen, RED, (self.rect.centerx - bar_width/2, self.rect.top - 40, bar_width, bar_height))
-        pygame.draw.rect(screen, GREEN, (self.rect.centerx - bar_width/2, self.rect.top - 40, fill, bar_height))
+        fill = int((self.hp / self.max_hp) * HP_BAR_WIDTH)
+        bar = sprite_cache.get(("hp_bar", fill), lambda: self.render_hp_bar(fill))
+        dirty.union_ip(screen.blit(bar, (rect.centerx - HP_BAR_WIDTH // 2, rect.top - 40)))
+        return dirty
+
+    def render_hp_bar(self, fill):
+        bar = pygame.Surface((HP_BAR_WIDTH, HP_BAR_HEIGHT))
+        bar.fill(RED)
+        bar.fill(GREEN, (0, 0, fill, HP_BAR_HEIGHT))
+        return bar
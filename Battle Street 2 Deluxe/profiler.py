@@ -0,0 +1,259 @@
+import csv
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from collections import deque
+import pygame
+from settings import *
+from text_cache import get_font
+
+class Profiler:
+    """Frame-phase timer with an overlay and trace export.
+
+    Phases are registered as (class, method name, phase name). While the
+    profiler is off the methods are the untouched originals, so it costs
+    nothing; enable() swaps in timing wrappers and disable() puts the
+    originals back. Each wrapped call becomes a span in the current frame;
+    the game loop closes frames with begin_frame()/end_frame(), and note()
+    logs one-off events such as quality tier changes between them.
+    """
+    def __init__(self, history=PROFILER_HISTORY):
+        self.enabled = False
+        self.points = [] # (owner, attr, phase name)
+        self.originals = [] # (owner, attr, original or None if inherited)
+        self.frames = deque(maxlen=history) # (index, start, duration, spans, counts)
+        self.spans = [] # (phase, start, duration, depth) for the frame in progress
+        self.depth = 0
+        self.frame_index = 0
+        self.frame_start = None
+        self.counters = None # Called at the end of each frame for entity counts
+        self.notes = deque(maxlen=history) # (frame index, time, text, args), kept even while off
+        self.thread = None # Only calls on the thread that enabled the profiler are timed
+        self.origin = time.perf_counter()
+
+        # Overlay
+        self.overlay_lines = []
+        self.overlay_surface = None
+
+        # tracemalloc, only while memory tracking is on
+        self.memory = False
+        self.snapshot = None
+        self.snapshot_frame = 0
+        self.alloc = None # (bytes per frame, blocks per frame, top sites)
+
+    # --- Instrumentation ---
+
+    def register(self, owner, attr, phase):
+        self.points.append((owner, attr, phase))
+        if self.enabled:
+            self.patch(owner, attr, phase)
+
+    def patch(self, owner, attr, phase):
+        self.originals.append((owner, attr, owner.__dict__.get(attr)))
+        setattr(owner, attr, self.wrap(getattr(owner, attr), phase))
+
+    def wrap(self, func, phase):
+        profiler = self
+        perf = time.perf_counter
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            if threading.get_ident() != profiler.thread:
+                return func(*args, **kwargs) # e.g. the pipelined battle worker
+            start = perf()
+            profiler.depth += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.depth -= 1
+                profiler.spans.append((phase, start, perf() - start, profiler.depth))
+        return timed
+
+    def enable(self, memory=False):
+        if not self.enabled:
+            self.enabled = True
+            self.thread = threading.get_ident()
+            for owner, attr, phase in self.points:
+                self.patch(owner, attr, phase)
+        self.set_memory(memory or self.memory)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        for owner, attr, original in reversed(self.originals):
+            if original is None:
+                delattr(owner, attr)
+            else:
+                setattr(owner, attr, original)
+        self.originals = []
+        self.enabled = False
+        self.set_memory(False)
+        self.frame_start = None
+        self.spans = []
+        self.depth = 0
+
+    def set_memory(self, on):
+        if on == self.memory:
+            return
+        self.memory = on
+        if on:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.snapshot = None
+            self.take_snapshot()
+        else:
+            self.snapshot = None
+            self.alloc = None
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    # --- Frames ---
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+        self.spans = []
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        end = time.perf_counter()
+        counts = self.counters() if self.counters else {}
+        self.frames.append((self.frame_index, self.frame_start, end - self.frame_start, self.spans, counts))
+        self.frame_index += 1
+        self.frame_start = None
+        self.spans = []
+
+        if self.memory and self.frame_index - self.snapshot_frame >= PROFILER_SNAPSHOT_EVERY:
+            self.take_snapshot()
+        if self.frame_index % PROFILER_OVERLAY_REFRESH == 0:
+            self.overlay_lines = self.report_lines()
+            self.overlay_surface = None
+
+    def note(self, text, **args):
+        """Log a one-off event (e.g. a quality tier change), shown in the overlay and exports"""
+        self.notes.append((self.frame_index, time.perf_counter(), text, args))
+        print(text)
+        if self.enabled:
+            self.overlay_lines = self.report_lines()
+            self.overlay_surface = None
+
+    def take_snapshot(self):
+        """Net allocations per frame since the last snapshot, and where they came from"""
+        # The profiler's own span history would otherwise top the list
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+        frames = max(1, self.frame_index - self.snapshot_frame)
+        if self.snapshot is None:
+            self.snapshot = snapshot
+            self.snapshot_frame = self.frame_index
+            return
+        stats = snapshot.compare_to(self.snapshot, "lineno")
+        size = sum(stat.size_diff for stat in stats)
+        count = sum(stat.count_diff for stat in stats)
+        top = [f"{stat.traceback[0].filename.split('/')[-1]}:{stat.traceback[0].lineno} {stat.size_diff / frames:+.0f} B"
+               for stat in stats[:3] if stat.size_diff]
+        self.alloc = (size / frames, count / frames, top)
+        self.snapshot = snapshot
+        self.snapshot_frame = self.frame_index
+        print(f"Allocations: {size / frames:+.0f} bytes, {count / frames:+.1f} blocks per frame")
+        for line in top:
+            print(f"  {line}")
+
+    # --- Stats ---
+
+    def percentiles(self, values, points=(0.5, 0.95, 0.99)):
+        if not values:
+            return [0.0 for _ in points]
+        values = sorted(values)
+        return [values[min(len(values) - 1, int(p * len(values)))] for p in points]
+
+    def phase_totals(self):
+        """Mean ms per frame spent in each phase"""
+        totals = {}
+        for _, _, _, spans, _ in self.frames:
+            for phase, _, duration, _ in spans:
+                totals[phase] = totals.get(phase, 0.0) + duration
+        frames = max(1, len(self.frames))
+        return {phase: total / frames * 1000 for phase, total in totals.items()}
+
+    def report_lines(self):
+        durations = [frame[2] * 1000 for frame in self.frames]
+        p50, p95, p99 = self.percentiles(durations)
+        lines = [f"frame ms  p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f}"]
+        for phase, ms in sorted(self.phase_totals().items()):
+            indent = "  " * phase.count(".")
+            lines.append(f"{indent}{phase.split('.')[-1]:<14} {ms:6.2f}")
+        if self.frames and self.frames[-1][4]:
+            lines.append("  ".join(f"{name} {count}" for name, count in self.frames[-1][4].items()))
+        if self.notes:
+            lines.append(self.notes[-1][2])
+        if self.alloc:
+            lines.append(f"alloc/frame {self.alloc[0]:+.0f} B  {self.alloc[1]:+.1f} blocks")
+        return lines
+
+    # --- Overlay ---
+
+    def draw_overlay(self, surface):
+        """Draws the stats box in the top right corner, returns its rect"""
+        if self.overlay_surface is None:
+            lines = self.overlay_lines or ["profiling..."]
+            # Rendered straight from the font, these lines would only churn the text cache
+            font = get_font(16)
+            rendered = [font.render(line, True, WHITE) for line in lines]
+            width = max(img.get_width() for img in rendered) + 12
+            height = sum(img.get_height() for img in rendered) + 10
+            box = pygame.Surface((width, height), pygame.SRCALPHA)
+            box.fill((0, 0, 0, 170))
+            y = 5
+            for img in rendered:
+                box.blit(img, (6, y))
+                y += img.get_height()
+            self.overlay_surface = box
+        return surface.blit(self.overlay_surface, (WIDTH - self.overlay_surface.get_width() - 5, 55))
+
+    # --- Export ---
+
+    def export_chrome(self, path=PROFILE_TRACE_FILE):
+        """Chrome trace-event JSON, open in chrome://tracing or Perfetto"""
+        events = []
+        for index, start, duration, spans, counts in self.frames:
+            events.append({"name": "frame", "cat": "frame", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": (start - self.origin) * 1e6, "dur": duration * 1e6, "args": {"frame": index}})
+            for phase, span_start, span_duration, _ in spans:
+                events.append({"name": phase, "cat": phase.split(".")[0], "ph": "X", "pid": 1, "tid": 1,
+                               "ts": (span_start - self.origin) * 1e6, "dur": span_duration * 1e6})
+            if counts:
+                events.append({"name": "entities", "ph": "C", "pid": 1, "tid": 1,
+                               "ts": (start - self.origin) * 1e6, "args": counts})
+        for index, when, text, args in self.notes:
+            events.append({"name": text, "cat": "note", "ph": "i", "s": "g", "pid": 1, "tid": 1,
+                           "ts": (when - self.origin) * 1e6, "args": dict(args, frame=index)})
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def export_csv(self, path=PROFILE_CSV_FILE):
+        """One row per span: frame, phase, depth, start and duration in ms"""
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "phase", "depth", "start_ms", "duration_ms"])
+            for index, start, duration, spans, _ in self.frames:
+                writer.writerow([index, "frame", 0, f"{(start - self.origin) * 1000:.3f}", f"{duration * 1000:.3f}"])
+                # Spans are stored as they finish, list them in start order
+                for phase, span_start, span_duration, depth in sorted(spans, key=lambda span: span[1]):
+                    writer.writerow([index, phase, depth + 1, f"{(span_start - self.origin) * 1000:.3f}",
+                                     f"{span_duration * 1000:.3f}"])
+            # Notes as zero-length rows at depth 0
+            for index, when, text, _ in self.notes:
+                writer.writerow([index, text, 0, f"{(when - self.origin) * 1000:.3f}", "0.000"])
+
+    def export(self):
+        self.export_chrome()
+        self.export_csv()
+        print(f"Profile of {len(self.frames)} frames written to {PROFILE_TRACE_FILE} and {PROFILE_CSV_FILE}")
+
+
+profiler = Profiler()
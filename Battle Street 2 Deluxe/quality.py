@@ -0,0 +1,69 @@
+from collections import deque
+from settings import *
+from profiler import profiler
+
+# Scale modes from cheapest to best looking, a tier's "scale" caps the player's choice
+SCALE_QUALITY = ("integer", "nearest", "smooth")
+
+def capped_scale_mode(mode, cap):
+    """The player's scale mode, or the tier's cap if that's cheaper"""
+    return min(mode, cap, key=SCALE_QUALITY.index)
+
+
+class QualityGovernor:
+    """Steps render quality through QUALITY_TIERS to keep battle frames within the budget.
+
+    record() is fed the work time of every battle frame. Once a whole
+    window's mean is over budget it drops a tier; it only climbs back
+    after the mean has stayed well under budget (QUALITY_UP_AT) for
+    QUALITY_UP_DELAY frames. The window starts over after every change,
+    so the next decision only sees frames drawn at the new tier; if that
+    decision undoes a step up, the wait before the next one doubles.
+    Changes are logged to the profiler and handed to on_change(tier).
+    """
+    def __init__(self, target_ms=QUALITY_TARGET_MS, tiers=QUALITY_TIERS, on_change=None):
+        self.target_ms = target_ms
+        self.tiers = tiers
+        self.level = 0 # Index into tiers, 0 is the best
+        self.tier = tiers[0]
+        self.on_change = on_change
+        self.window = deque(maxlen=QUALITY_WINDOW)
+        self.calm = 0 # Frames in a row the window has been under QUALITY_UP_AT
+        self.up_delay = QUALITY_UP_DELAY
+        self.probing = False # Stepped up and the new tier's first window isn't in yet
+
+    def record(self, ms):
+        window = self.window
+        window.append(ms)
+        if len(window) < window.maxlen:
+            return
+        mean = sum(window) / len(window)
+        if mean > self.target_ms * QUALITY_DOWN_AT:
+            self.calm = 0
+            if self.level < len(self.tiers) - 1:
+                if self.probing:
+                    self.up_delay = min(self.up_delay * 2, QUALITY_UP_DELAY * 32) # That tier still doesn't fit
+                self.set_level(self.level + 1, mean)
+            return
+        if self.probing:
+            self.probing = False
+            self.up_delay = QUALITY_UP_DELAY
+        if mean < self.target_ms * QUALITY_UP_AT and self.level > 0:
+            self.calm += 1
+            if self.calm >= self.up_delay:
+                self.set_level(self.level - 1, mean)
+        else:
+            self.calm = 0
+
+    def set_level(self, level, mean=None):
+        previous = self.level
+        self.level = level
+        self.tier = self.tiers[level]
+        self.probing = level < previous
+        self.window.clear()
+        self.calm = 0
+        if mean is not None:
+            profiler.note(f"quality tier {previous} -> {level} ({mean:.1f} ms/frame, budget {self.target_ms:.1f})",
+                          tier=level, mean_ms=round(mean, 2))
+        if self.on_change:
+            self.on_change(self.tier)
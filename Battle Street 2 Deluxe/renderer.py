@@ -0,0 +1,108 @@
+import pygame
+from settings import *
+
+class Compositor:
+    """Presents game_surface to the screen, redrawing only what changed.
+
+    Battles restore a cached background layer (map + platforms + HUD) under
+    last frame's dirty rects and push just those rects to the display. On
+    maps bigger than the screen the layer is recomposed from the map's
+    chunks whenever the camera moves, and that frame is presented in full. Static
+    screens (menu, shop...) are redrawn and presented only when their ui key
+    changes, so an idle menu costs almost nothing.
+    """
+    def __init__(self, screen, game_surface, viewport):
+        self.screen = screen
+        self.surface = game_surface
+        self.viewport = viewport
+        self.map_layer = None
+        self.chunks = None # ChunkCache the map layer is composed from
+        self.draw_hud = None
+        self.scroll = None # Camera position the map layer was composed at
+        self.dirty = [] # Game-space rects drawn this frame
+        self.prev_dirty = [] # Drawn last frame, erased at the start of this one
+        self.full_redraw = True
+        self.ui_key = None # Key of the static screen currently on display
+        self.overlay = None # Optional draw(surface) -> rect, drawn on top of every frame
+
+    def build_map_layer(self, chunks, draw_hud=None):
+        self.chunks = chunks
+        self.draw_hud = draw_hud
+        if self.map_layer is None:
+            layer = pygame.Surface((WIDTH, HEIGHT))
+            self.map_layer = layer.convert() if pygame.display.get_surface() else layer
+        self.scroll = None
+        self.scroll_to(0, 0)
+
+    def scroll_to(self, x, y):
+        """Recompose the map layer for a camera at (x, y), if it moved"""
+        if self.scroll == (x, y):
+            return
+        self.scroll = (x, y)
+        self.chunks.draw_view(self.map_layer, pygame.Rect(x, y, WIDTH, HEIGHT))
+        if self.draw_hud:
+            self.draw_hud(self.map_layer)
+        self.invalidate()
+
+    def invalidate(self):
+        """Next frame redraws and presents the whole screen"""
+        self.full_redraw = True
+        self.ui_key = None
+
+    # --- Battle: background layer + dirty rects ---
+
+    def begin_layered_frame(self):
+        if self.full_redraw:
+            self.surface.blit(self.map_layer, (0, 0))
+        else:
+            for rect in self.prev_dirty:
+                self.surface.blit(self.map_layer, rect, rect)
+        self.dirty = []
+
+    def mark(self, rect):
+        if rect:
+            self.dirty.append(rect)
+
+    def end_layered_frame(self):
+        if self.overlay:
+            self.mark(self.overlay(self.surface))
+        bounds = self.surface.get_rect()
+        self.dirty = [rect.clip(bounds) for rect in self.dirty]
+        if self.full_redraw:
+            self.present_full()
+        else:
+            self.present_rects(self.prev_dirty + self.dirty)
+        self.prev_dirty = self.dirty
+        self.full_redraw = False
+
+    # --- Static screens ---
+
+    def is_current(self, ui_key):
+        return not self.full_redraw and ui_key == self.ui_key
+
+    def end_static_frame(self, ui_key):
+        if self.overlay:
+            self.overlay(self.surface)
+        self.present_full()
+        self.ui_key = ui_key
+        self.prev_dirty = []
+        self.full_redraw = False
+
+    # --- Output ---
+
+    def present_full(self):
+        self.viewport.present(self.screen, self.surface)
+        pygame.display.flip()
+
+    def present_rects(self, rects):
+        viewport = self.viewport
+        if not viewport.integer_scale or viewport.mode == "smooth" or viewport.needs_clear:
+            # Fractional or filtered scaling bleeds across rect edges, present everything
+            self.present_full()
+            return
+
+        updated = []
+        for rect in rects:
+            if rect.width and rect.height:
+                updated.append(viewport.present_rect(self.screen, self.surface, rect))
+        pygame.display.update(updated)
@@ -0,0 +1,112 @@
+import struct
+from settings import *
+from player import Player
+from simulation import Simulation, PlayerInput
+from arena import ArenaSimulation
+
+# File layout: header, weapon and map names (length-prefixed UTF-8), then
+# run-length encoded input masks, one (ticks, mask) pair per run
+REPLAY_MAGIC = b"BS2R"
+REPLAY_VERSION = 2 # 2: CPUs plan their jumps on the nav graph, older recordings play out differently
+HEADER = struct.Struct("<4sBIH") # magic, version, seed, cpu count
+RUN = struct.Struct("<HB") # ticks, input mask
+MAX_RUN = 0xFFFF
+
+def pack_name(name):
+    data = name.encode("utf-8")
+    return struct.pack("<B", len(data)) + data
+
+def unpack_name(data, offset):
+    length = data[offset]
+    return data[offset + 1:offset + 1 + length].decode("utf-8"), offset + 1 + length
+
+
+class ReplayRecorder:
+    """Records the player's input for one match, tick by tick"""
+    def __init__(self, seed, num_cpus, weapon, map_name="Street"):
+        self.seed = seed
+        self.num_cpus = num_cpus
+        self.weapon = weapon
+        self.map_name = map_name
+        self.runs = [] # [ticks, mask]
+        self.ticks = 0
+
+    def record(self, player_input):
+        mask = player_input.to_mask()
+        last = self.runs[-1] if self.runs else None
+        if last and last[1] == mask and last[0] < MAX_RUN:
+            last[0] += 1
+        else:
+            self.runs.append([1, mask])
+        self.ticks += 1
+
+    def to_bytes(self):
+        parts = [HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, self.num_cpus),
+                 pack_name(self.weapon), pack_name(self.map_name)]
+        parts.extend(RUN.pack(ticks, mask) for ticks, mask in self.runs)
+        return b"".join(parts)
+
+    def save(self, path):
+        try:
+            with open(path, 'wb') as f:
+                f.write(self.to_bytes())
+        except Exception as e:
+            print(f"Error saving replay: {e}")
+
+
+class Replay:
+    """A recorded match that can be played back into a Simulation"""
+    def __init__(self, seed, num_cpus, weapon, map_name, runs):
+        self.seed = seed
+        self.num_cpus = num_cpus
+        self.weapon = weapon
+        self.map_name = map_name
+        self.runs = runs
+        self.ticks = sum(ticks for ticks, _ in runs)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, num_cpus = HEADER.unpack_from(data, 0)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError("Not a Battle Street replay (or an unsupported version)")
+        weapon, offset = unpack_name(data, HEADER.size)
+        map_name, offset = unpack_name(data, offset)
+        runs = [RUN.unpack_from(data, pos) for pos in range(offset, len(data), RUN.size)]
+        return cls(seed, num_cpus, weapon, map_name, runs)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def inputs(self):
+        """PlayerInput for every recorded tick, in order"""
+        for ticks, mask in self.runs:
+            player_input = PlayerInput.from_mask(mask)
+            for _ in range(ticks):
+                yield player_input
+
+    def setup(self, sim):
+        """Put sim in the exact starting state of the recorded match"""
+        player = sim.player
+        if self.weapon not in player.inventory:
+            player.inventory.append(self.weapon)
+        player.equip_weapon(self.weapon)
+        sim.load_map(self.map_name)
+        sim.start(self.num_cpus, seed=self.seed)
+
+    def make_simulation(self, effects=False):
+        sim_class = ArenaSimulation if self.num_cpus > MAX_BATTLE_CPUS else Simulation
+        sim = sim_class(Player("Replay"), effects=effects)
+        self.setup(sim)
+        return sim
+
+
+def play_headless(replay):
+    """Re-run a replay at full speed, returns the finished Simulation"""
+    sim = replay.make_simulation()
+    for player_input in replay.inputs():
+        sim.step(player_input)
+        if sim.result:
+            break
+    return sim
@@ -1,32 +1,143 @@
+import atexit
 import json
 import os
+import threading
+import time
 
 SAVE_FILE = "battle_street_save.json"
+SAVE_DEBOUNCE = 0.25 # Seconds to wait for more saves before writing
+SAVE_MAX_DELAY = 2.0 # Seconds a save can be held back by newer ones, counted from the first
 
-def load_game():
-    if not os.path.exists(SAVE_FILE):
-        return None
-    
-    try:
-        with open(SAVE_FILE, 'r') as f:
-            data = json.load(f)
-        return data
-    except Exception as e:
-        print(f"Error loading save: {e}")
-        return None
-
-def save_game(player):
+def backup_path(path):
+    return path + ".bak"
+
+def read_save(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def load_game(path=SAVE_FILE):
+    # Fall back to the previous save if the current one is missing or corrupt
+    for candidate in (path, backup_path(path)):
+        if not os.path.exists(candidate):
+            continue
+        try:
+            data = read_save(candidate)
+            if candidate != path:
+                print(f"Recovered save from {candidate}")
+            return data
+        except Exception as e:
+            print(f"Error loading save {candidate}: {e}")
+    return None
+
+def write_atomic(path, data):
+    """Write to a temp file, fsync, then rename over the old save (kept as .bak)"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    if os.path.exists(path):
+        os.replace(path, backup_path(path))
+    os.replace(tmp_path, path)
+
+    # Make the renames themselves durable where the OS allows it
+    if hasattr(os, "O_DIRECTORY"):
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
+
+class SaveWriter:
+    """Writes saves on a background thread so the game loop never waits on disk.
+
+    Only the newest pending save for each path is kept, so a burst of
+    purchases turns into a single write once things have been quiet for
+    `debounce` seconds, or `max_delay` after the first of them at the latest.
+    """
+    def __init__(self, debounce=SAVE_DEBOUNCE, max_delay=SAVE_MAX_DELAY):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.cond = threading.Condition()
+        self.pending = {} # path -> data waiting to be written
+        self.first_submit = 0 # When the oldest pending save came in
+        self.last_submit = 0
+        self.writing = False
+        self.flushing = False
+        self.thread = None
+        self.writes = 0
+
+    def submit(self, path, data):
+        with self.cond:
+            now = time.monotonic()
+            if not self.pending:
+                self.first_submit = now
+            self.pending[path] = data
+            self.last_submit = now
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="SaveWriter", daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                # Debounce: keep waiting while saves keep coming in, up to max_delay
+                while not self.flushing:
+                    due = min(self.last_submit + self.debounce, self.first_submit + self.max_delay)
+                    remaining = due - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                pending = self.pending
+                self.pending = {}
+                self.writing = True
+
+            for path, data in pending.items():
+                try:
+                    write_atomic(path, data)
+                    self.writes += 1
+                except Exception as e:
+                    print(f"Error saving game: {e}")
+
+            with self.cond:
+                self.writing = False
+                self.cond.notify_all()
+
+    def flush(self, timeout=5):
+        """Block until every submitted save is on disk (used on quit)"""
+        with self.cond:
+            self.flushing = True
+            self.cond.notify_all()
+            deadline = time.monotonic() + timeout
+            while self.pending or self.writing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            self.flushing = False
+
+
+_writer = SaveWriter()
+
+def save_game(player, path=SAVE_FILE):
+    # Snapshot now, on the game thread, the write happens in the background
     data = {
         "username": player.username,
         "coins": player.coins,
-        "inventory": player.inventory,
+        "inventory": list(player.inventory),
         "current_weapon": player.current_weapon_name
     }
-    
-    try:
-        with open(SAVE_FILE, 'w') as f:
-            json.dump(data, f)
-        print("Game saved!")
-    except Exception as e:
-        print(f"Error saving game: {e}")
+    _writer.submit(path, data)
+
+def flush_saves(timeout=5):
+    _writer.flush(timeout)
 
+atexit.register(flush_saves)
@@ -0,0 +1,598 @@
+import random
+import numpy as np
+import pygame
+from settings import *
+from ui import Button, ListView
+from simulation import PlayerInput
+from replay import ReplayRecorder
+from arena import ArenaSimulation, ARENA_PALETTE, CPU_WIDTH
+from player import Player, BODY_PAD_X, BODY_PAD_Y, HP_BAR_WIDTH
+from sprite_cache import sprite_cache
+from camera import Camera
+from pipeline import Pipeline, SnapshotView
+
+# Sprites, held weapons and name labels reach this far outside an entity's rect
+CULL_MARGIN = 100
+
+class Scene:
+    """One screen of the game. Game keeps a stack of these and only runs the top one.
+
+    enter() runs when the scene is pushed, exit() when it is popped and should
+    let go of anything the scene created. Static scenes (everything but
+    battles) are only redrawn when ui_key() changes.
+    """
+    name = ""
+    static = True
+
+    def __init__(self, game):
+        self.game = game
+
+    def enter(self):
+        pass
+
+    def exit(self):
+        pass
+
+    def handle_event(self, event, mouse_pos):
+        pass
+
+    def update(self):
+        pass
+
+    def ui_key(self):
+        return ()
+
+    def draw(self, surface, alpha=1.0):
+        pass
+
+
+class UsernameScene(Scene):
+    name = "USERNAME"
+
+    def enter(self):
+        self.input_text = ""
+
+    def handle_event(self, event, mouse_pos):
+        if event.type != pygame.KEYDOWN:
+            return
+        if event.key == pygame.K_RETURN:
+            if len(self.input_text) > 0:
+                self.game.player.username = self.input_text
+                self.game.save_data() # Save username
+                self.game.pop_scene()
+        elif event.key == pygame.K_BACKSPACE:
+            self.input_text = self.input_text[:-1]
+        else:
+            if len(self.input_text) < 15:
+                self.input_text += event.unicode
+
+    def ui_key(self):
+        return (self.input_text,)
+
+    def draw(self, surface, alpha=1.0):
+        game = self.game
+        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        overlay.fill((0,0,0,128))
+        surface.blit(overlay, (0,0))
+
+        game.draw_text("Enter Username:", 48, WHITE, WIDTH/2, HEIGHT/3)
+        pygame.draw.rect(surface, WHITE, (WIDTH/2 - 150, HEIGHT/2, 300, 50))
+        game.draw_text(self.input_text, 48, BLACK, WIDTH/2, HEIGHT/2)
+        game.draw_text("Press Enter to Confirm", 22, GRAY, WIDTH/2, HEIGHT * 0.75)
+
+
+class MenuScene(Scene):
+    name = "MENU"
+
+    def __init__(self, game):
+        super().__init__(game)
+        # UI Buttons (Center them based on original coords, we will scale input too)
+        self.buttons = [
+            Button(WIDTH/2 - 100, HEIGHT/2 + 60, 200, 50, "Play vs CPU"),
+            Button(WIDTH/2 - 100, HEIGHT/2 + 120, 200, 50, "Weapon Shop"),
+            Button(WIDTH/2 - 100, HEIGHT/2 + 180, 200, 50, "Change Username", font_size=24),
+            Button(WIDTH/2 - 100, HEIGHT/2 + 240, 200, 50, "Quit")
+        ]
+
+    def handle_event(self, event, mouse_pos):
+        game = self.game
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            game.quit()
+            return
+
+        for btn in self.buttons:
+            btn.check_hover(mouse_pos)
+            if btn.is_clicked_custom(event, mouse_pos):
+                if btn.text == "Play vs CPU":
+                    game.push_scene(CpuSelectScene(game))
+                elif btn.text == "Weapon Shop":
+                    game.push_scene(ShopScene(game))
+                elif btn.text == "Change Username":
+                    game.push_scene(UsernameScene(game))
+                elif btn.text == "Quit":
+                    game.quit()
+                return
+
+    def ui_key(self):
+        player = self.game.player
+        return (player.username, player.coins, tuple(btn.is_hovered for btn in self.buttons))
+
+    def draw(self, surface, alpha=1.0):
+        game = self.game
+        game.draw_text(TITLE, 64, RED, WIDTH/2, HEIGHT/4)
+        game.draw_text(f"Welcome, {game.player.username}!", 32, BLACK, WIDTH/2, HEIGHT/2 - 40)
+        game.draw_text(f"Coins: {game.player.coins}", 32, YELLOW, WIDTH/2, HEIGHT/2)
+        game.draw_text("Team Banana Labs Studios", 16, GRAY, WIDTH - 100, HEIGHT - 20)
+
+        for btn in self.buttons:
+            btn.draw(surface)
+
+
+class CpuSelectScene(Scene):
+    name = "CPU_SELECT"
+
+    def enter(self):
+        self.cpu_count_text = ""
+
+    def handle_event(self, event, mouse_pos):
+        game = self.game
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                game.save_data()
+                game.pop_scene()
+                return
+            if event.key == pygame.K_RETURN:
+                try:
+                    val = int(self.cpu_count_text)
+                    if 1 <= val <= ARENA_MAX_CPUS:
+                        game.num_cpus = val
+                        game.switch_scene(game.battle_scene(val)(game, val))
+                        return
+                    else:
+                        self.cpu_count_text = ""
+                        game.show_message(f"Sorry only number is one through {ARENA_MAX_CPUS}")
+                except ValueError:
+                    self.cpu_count_text = ""
+            elif event.key == pygame.K_BACKSPACE:
+                self.cpu_count_text = self.cpu_count_text[:-1]
+            else:
+                if event.unicode.isdigit() and len(self.cpu_count_text) < len(str(ARENA_MAX_CPUS)):
+                    self.cpu_count_text += event.unicode
+
+        game.exit_button.check_hover(mouse_pos)
+        if game.exit_button.is_clicked_custom(event, mouse_pos):
+            game.pop_scene()
+
+    def ui_key(self):
+        return (self.cpu_count_text, self.game.exit_button.is_hovered)
+
+    def draw(self, surface, alpha=1.0):
+        game = self.game
+        game.draw_text("How many players (CPUs)?", 48, BLACK, WIDTH/2, HEIGHT/3)
+        game.draw_text(f"(1-{MAX_BATTLE_CPUS}, or up to {ARENA_MAX_CPUS} for Arena mode)", 32, BLACK, WIDTH/2, HEIGHT/3 + 50)
+        game.draw_text(self.cpu_count_text, 48, BLUE, WIDTH/2, HEIGHT/2)
+        game.exit_button.draw(surface)
+
+
+SHOP_SORTS = ("cost", "damage", "speed", "name")
+
+def sort_index(catalog):
+    """Weapon names in each shop order, computed once per catalog"""
+    names = list(catalog)
+    orders = {"name": sorted(names, key=str.lower)}
+    for field in SHOP_SORTS[:-1]:
+        orders[field] = sorted(names, key=lambda n: catalog[n][field])
+    return orders
+
+
+class ShopScene(Scene):
+    name = "SHOP"
+
+    def enter(self):
+        self.orders = sort_index(WEAPONS_DATA)
+        self.sort = "cost"
+        self.order = self.orders[self.sort]
+        self.list = ListView(WIDTH/2 - 250, 100, 500, HEIGHT - 150, 50, self.bind_row)
+        self.list.set_count(len(self.order))
+        self.sort_button = Button(WIDTH - 170, 10, 160, 40, "Sort: Cost", font_size=20)
+
+    def exit(self):
+        self.list = None
+        self.orders = None
+        self.order = None
+
+    def bind_row(self, btn, index):
+        player = self.game.player
+        name = self.order[index]
+        data = WEAPONS_DATA[name]
+        color = WHITE
+        status = f"{data['cost']} Coins"
+        if name in player.inventory:
+            color = LIGHT_BLUE
+            status = "Owned"
+            if name == player.current_weapon_name:
+                color = GREEN
+                status = "Equipped"
+        btn.key = name
+        btn.text = f"{name} ({data['damage']} dmg) - {status}"
+        btn.bg_color = color
+
+    def cycle_sort(self):
+        self.sort = SHOP_SORTS[(SHOP_SORTS.index(self.sort) + 1) % len(SHOP_SORTS)]
+        self.order = self.orders[self.sort]
+        self.sort_button.text = f"Sort: {self.sort.title()}"
+        self.list.scroll_to(0)
+
+    def handle_event(self, event, mouse_pos):
+        game = self.game
+        # Shop scrolling
+        if event.type == pygame.MOUSEWHEEL:
+            self.list.scroll_by(-event.y * 20)
+
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            game.save_data()
+            game.pop_scene()
+            return
+
+        if game.exit_button.is_clicked_custom(event, mouse_pos):
+            game.save_data()
+            game.pop_scene()
+            return
+
+        self.sort_button.check_hover(mouse_pos)
+        if self.sort_button.is_clicked_custom(event, mouse_pos):
+            self.cycle_sort()
+            return
+
+        weapon_name = self.list.handle_event(event, mouse_pos)
+        if weapon_name:
+            game.try_buy(weapon_name)
+            self.list.rebind() # Owned/equipped labels changed
+
+    def ui_key(self):
+        rows = tuple((btn.text, btn.rect.y, btn.is_hovered) for btn in self.list.rows)
+        return (self.game.player.coins, self.sort_button.text, self.sort_button.is_hovered, rows)
+
+    def draw(self, surface, alpha=1.0):
+        game = self.game
+        game.draw_text("Weapon Shop", 48, BLACK, WIDTH/2, 50)
+        game.draw_text(f"Your Coins: {game.player.coins}", 32, YELLOW, WIDTH/2, 80)
+
+        self.list.draw(surface)
+        self.sort_button.draw(surface)
+        game.exit_button.draw(surface)
+
+
+class BattleScene(Scene):
+    """A match against CPUs, or the playback of a recorded one.
+
+    input_source, if given, is called every tick instead of reading the
+    keyboard. Returning None lets the CPU AI drive the player.
+    """
+    name = "BATTLE"
+    static = False
+
+    def __init__(self, game, num_cpus, replay=None, input_source=None):
+        super().__init__(game)
+        self.num_cpus = num_cpus
+        self.replay = replay
+        self.input_source = input_source
+        self.sim = None
+        self.recorder = None
+        self.replay_inputs = None
+        self.attack_queued = False # Attack pressed since the last tick
+        self.camera = None
+
+    def enter(self):
+        game = self.game
+        if self.replay:
+            # Play it in its own simulation so the real player's coins are untouched
+            self.sim = self.replay.make_simulation(effects=True)
+            self.replay_inputs = self.replay.inputs()
+        else:
+            self.start_match()
+        self.camera = Camera(self.sim.world_width, self.sim.world_height)
+        self.camera.center_on(self.sim.player.rect)
+        game.build_map_layer(self.sim)
+
+    def start_match(self):
+        self.sim = self.make_simulation()
+        # Fresh seed per match, recorded so the battle can be replayed exactly
+        seed = random.getrandbits(32)
+        self.sim.start(self.num_cpus, seed=seed)
+        self.recorder = ReplayRecorder(seed, self.num_cpus, self.game.player.current_weapon_name, self.sim.map_name)
+
+    def make_simulation(self):
+        return self.game.sim
+
+    def exit(self):
+        if self.recorder:
+            self.recorder.save(REPLAY_FILE)
+        if self.replay:
+            self.game.build_map_layer(self.game.sim)
+
+        # Let go of the match's entities
+        self.sim.battle_cpus = []
+        self.sim.clear_projectiles()
+        self.sim.particles.clear()
+        self.sim = None
+        self.recorder = None
+        self.replay_inputs = None
+
+    def handle_event(self, event, mouse_pos):
+        game = self.game
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                game.pop_scene()
+                game.save_data() # Save when returning to menu
+            elif event.key == pygame.K_k:
+                self.attack_queued = True
+
+        # Mouse Events
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            # Check if clicking a UI button first
+            if game.exit_button.is_clicked_custom(event, mouse_pos):
+                game.pop_scene()
+                game.save_data()
+            else:
+                self.attack_queued = True
+
+    def read_input(self):
+        if self.input_source:
+            return self.input_source()
+        keys = pygame.key.get_pressed()
+        return PlayerInput(
+            left=keys[pygame.K_a],
+            right=keys[pygame.K_d],
+            jump=keys[pygame.K_SPACE],
+            attack=self.attack_queued
+        )
+
+    def update(self):
+        if self.replay_inputs:
+            player_input = next(self.replay_inputs, None)
+            if player_input is None:
+                self.end(self.sim.result)
+                return
+        else:
+            player_input = self.read_input()
+            if self.recorder and player_input:
+                self.recorder.record(player_input)
+        self.attack_queued = False
+        self.sim.step(player_input)
+
+        if self.sim.result:
+            self.end(self.sim.result)
+
+    def end(self, result):
+        game = self.game
+        game.pop_scene()
+        if self.replay:
+            game.show_message(f"Replay finished: {result or 'no result'}")
+            return
+
+        if result == "win":
+            game.show_message(f"You Won! +{WIN_REWARD * self.num_cpus} Coins")
+        else:
+            game.show_message("You Lost! -10 Coins")
+        game.save_data() # Save coins
+
+    def draw(self, surface, alpha=1.0):
+        # Background, platforms and HUD come from the cached map layer,
+        # only the moving entities are drawn and presented each frame
+        game = self.game
+        compositor = game.compositor
+        sim = self.sim
+        camera = self.camera
+        camera.follow(sim.player.interpolated_rect(alpha))
+        compositor.scroll_to(camera.x, camera.y) # Only does anything on maps bigger than the screen
+        compositor.begin_layered_frame()
+
+        self.draw_entities(surface, alpha)
+
+        # Particles, as many and as detailed as the quality tier allows
+        quality = game.quality.tier
+        sim.particles.burst_scale = quality["particles"] # For bursts spawned from here on
+        compositor.mark(sim.particles.draw(surface, (camera.x, camera.y), quality["particle_lod"]))
+
+        if game.message:
+            compositor.mark(game.draw_text(game.message, 36, RED, WIDTH/2, HEIGHT * 0.8))
+
+        compositor.end_layered_frame()
+
+    def draw_entities(self, surface, alpha):
+        game = self.game
+        compositor = game.compositor
+        sim = self.sim
+        # Everything is drawn shifted by the camera, and skipped if it's off screen
+        offset = (self.camera.x, self.camera.y)
+        view = self.camera.view(CULL_MARGIN)
+        labels = game.quality.tier["labels"]
+
+         # Draw Objects
+        for p in sim.projectiles:
+            if view.collidepoint(p.x, p.y):
+                compositor.mark(p.draw(surface, alpha, offset))
+
+        # Draw Player
+        compositor.mark(sim.player.draw(surface, game.weapon_textures, alpha, game.weapon_textures_flipped, offset,
+                                        labels))
+
+        # Draw CPUs
+        for cpu in sim.battle_cpus:
+            if view.colliderect(cpu.rect):
+                compositor.mark(cpu.draw(surface, game.weapon_textures, alpha, game.weapon_textures_flipped, offset,
+                                         labels))
+
+
+class ArenaScene(BattleScene):
+    """Battle against hundreds of CPUs, kept in arrays by ArenaSimulation"""
+
+    def __init__(self, game, num_cpus, replay=None, input_source=None):
+        super().__init__(game, num_cpus, replay, input_source)
+        # One stand-in Player per palette colour to bake the CPU sprites from
+        self.templates = []
+        for color in ARENA_PALETTE:
+            template = Player("CPU", is_cpu=True)
+            template.color = color
+            self.templates.append(template)
+
+    def make_simulation(self):
+        game = self.game
+        return ArenaSimulation(game.player, particles=game.sim.particles)
+
+    def draw_entities(self, surface, alpha):
+        game = self.game
+        compositor = game.compositor
+        sim = self.sim
+        camera = self.camera
+        offset = (camera.x, camera.y)
+        view = camera.view(CULL_MARGIN)
+
+        for p in sim.projectiles:
+            if view.collidepoint(p.x, p.y):
+                compositor.mark(p.draw(surface, alpha, offset))
+        compositor.mark(sim.player.draw(surface, game.weapon_textures, alpha, game.weapon_textures_flipped, offset,
+                                        game.quality.tier["labels"]))
+
+        # Every CPU and CPU shot on screen goes out in one blits() call
+        blits = []
+        xs = (sim.prev_x + (sim.x - sim.prev_x) * alpha).round().astype(int) - camera.x
+        ys = (sim.prev_y + (sim.y - sim.prev_y) * alpha).round().astype(int) - camera.y
+        shown = np.nonzero((xs > -CULL_MARGIN) & (xs < camera.width + CULL_MARGIN) &
+                           (ys > -CULL_MARGIN) & (ys < camera.height + CULL_MARGIN))[0]
+        names = sim.weapons.names
+        for x, y, hp, facing, attacking, color, weapon in zip(
+                xs[shown].tolist(), ys[shown].tolist(), sim.hp[shown].tolist(), sim.facing_right[shown].tolist(),
+                sim.attacking[shown].tolist(), sim.color[shown].tolist(), sim.weapon[shown].tolist()):
+            textures = game.weapon_textures if facing else game.weapon_textures_flipped
+            weapon_img = textures.get(names[weapon])
+            body = self.cpu_body(color, facing, hp > 50, weapon_img is not None)
+            blits.append((body, (x - BODY_PAD_X, y - BODY_PAD_Y)))
+            if weapon_img:
+                hand_x = x + CPU_WIDTH + 5 if facing else x - 5
+                img_rect = weapon_img.get_rect(center=(hand_x, y + 35))
+                if attacking:
+                    # Swing effect
+                    img_rect.x += 10 if facing else -10
+                    img_rect.y += 5 if facing else 0
+                blits.append((weapon_img, img_rect))
+            fill = int(hp / ARENA_CPU_HP * HP_BAR_WIDTH)
+            bar = sprite_cache.get(("hp_bar", fill), lambda: self.templates[0].render_hp_bar(fill))
+            blits.append((bar, (x + CPU_WIDTH // 2 - HP_BAR_WIDTH // 2, y - 40)))
+
+        n = sim.shot_count
+        if n:
+            sx = (sim.shot_prev_x[:n] + (sim.shot_x[:n] - sim.shot_prev_x[:n]) * alpha).astype(int) - camera.x
+            sy = (sim.shot_prev_y[:n] + (sim.shot_y[:n] - sim.shot_prev_y[:n]) * alpha).astype(int) - camera.y
+            shown = np.nonzero((sx > -10) & (sx < camera.width + 10) & (sy > -10) & (sy < camera.height + 10))[0]
+            for x, y, weapon in zip(sx[shown].tolist(), sy[shown].tolist(), sim.shot_weapon[:n][shown].tolist()):
+                blits.append((self.shot_sprite(weapon), (x - 5, y - 5)))
+
+        if blits:
+            rects = surface.blits(blits)
+            compositor.mark(rects[0].unionall(rects[1:]))
+
+    def cpu_body(self, color, facing, healthy, has_weapon_img):
+        template = self.templates[color]
+        template.facing_right = facing
+        template.hp = ARENA_CPU_HP if healthy else 0
+        return sprite_cache.get(template.body_key(has_weapon_img), lambda: template.render_body(has_weapon_img))
+
+    def shot_sprite(self, weapon):
+        color = self.sim.weapons.colors[weapon]
+
+        def render():
+            sprite = pygame.Surface((10, 10), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, color, (5, 5), 5)
+            return sprite
+        return sprite_cache.get(("shot", color), render)
+
+
+class PipelinedBattle:
+    """Mixed into a battle scene to run its match in a worker thread or process (see pipeline.py).
+
+    The scene draws the worker's latest snapshot with its usual draw code.
+    If the worker can't be started the scene runs the match itself, as usual.
+    """
+    pipeline = None
+
+    def start_match(self):
+        game = self.game
+        arena = isinstance(self, ArenaScene)
+        try:
+            self.pipeline = Pipeline(game.sim, game.player, self.num_cpus, arena, game.pipeline_mode).start()
+        except (OSError, RuntimeError) as e:
+            print(f"Pipelined battle unavailable ({e}), running it on the main thread")
+            self.pipeline = None
+            super().start_match()
+            return
+        self.sim = self.pipeline.view
+
+    def exit(self):
+        if self.pipeline:
+            # The worker has its own copy of the player: keep the coins it won, even when quitting mid-match
+            self.pipeline.refresh()
+            self.game.player.coins = self.pipeline.view.coins
+            self.pipeline.stop() # The worker saves the replay
+            self.pipeline = None
+        super().exit()
+
+    def update(self):
+        pipeline = self.pipeline
+        if not pipeline:
+            super().update()
+            return
+        pipeline.send_input(self.read_input())
+        self.attack_queued = False
+        pipeline.refresh()
+        sim = self.sim
+        if sim.result:
+            self.end(sim.result) # exit() copies the coins back
+        elif not pipeline.running:
+            self.game.pop_scene()
+            self.game.show_message("The battle stopped unexpectedly")
+
+    def draw(self, surface, alpha=1.0):
+        if self.pipeline:
+            self.pipeline.refresh()
+            alpha = self.pipeline.alpha()
+        super().draw(surface, alpha)
+
+
+class PipelinedBattleScene(PipelinedBattle, BattleScene):
+    pass
+
+
+class PipelinedArenaScene(PipelinedBattle, ArenaScene):
+    pass
+
+
+class NetBattleScene(BattleScene):
+    """A free-for-all on a battle server (server.py), through a joined NetClient"""
+
+    def __init__(self, game, client):
+        super().__init__(game, 0)
+        self.client = client
+
+    def start_match(self):
+        # Drawn like a pipelined battle, the client poses the fighters and shots
+        self.sim = SnapshotView(self.game.sim, self.game.player, False)
+        self.sim.player = self.client.player
+
+    def exit(self):
+        self.client.close()
+        super().exit()
+
+    def update(self):
+        client = self.client
+        client.tick(self.read_input())
+        self.attack_queued = False
+        self.sim.particles.update()
+        if not client.connected:
+            self.game.pop_scene()
+            self.game.show_message("Lost connection to the server")
+
+    def draw(self, surface, alpha=1.0):
+        self.client.update_view(self.sim)
+        super().draw(surface, alpha)
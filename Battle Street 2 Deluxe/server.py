@@ -0,0 +1,303 @@
+"""Dedicated battle server for LAN games: headless, authoritative, over UDP.
+
+    python server.py [--port 7777] [--map Street] [--max-players 32] [--weapons "Fist,Ray Gun"]
+
+Players join with `python main.py --connect HOST[:PORT]` and only ever
+send their input, one bitmask per tick. The server runs the match with
+the single player rules (Simulation's movement, attacks and projectiles)
+as a free-for-all: everyone can hit everyone, and the fallen respawn
+after NET_RESPAWN_TICKS. Every NET_SNAPSHOT_INTERVAL ticks each client
+gets the world, delta-compressed against the last snapshot it acked.
+See net_protocol.py for the packets.
+
+The server can't see anyone's save, so by default a player fights with
+whatever weapon their JOIN names, owned or not. That's fine among friends
+on a LAN; --weapons limits the choice, anything else joins with the Fist.
+"""
+import argparse
+import select
+import socket
+import struct
+import time
+from settings import *
+from player import Player
+from simulation import Simulation, PlayerInput, INPUT_ATTACK
+from arena import ARENA_PALETTE
+from net_protocol import (WorldState, EMPTY_STATE, NO_BASE, PROTOCOL_VERSION, MSG_JOIN, MSG_INPUT, MSG_LEAVE,
+                          MSG_FULL, fighter_record, encode_body, encode_snapshot, decode_input, decode_join,
+                          encode_welcome, encode_roster)
+
+class ServerSimulation(Simulation):
+    """Simulation for a free-for-all between networked players, one Player per slot"""
+    def __init__(self, map_name="Street", weapons=None):
+        super().__init__(Player("Server"), effects=False)
+        self.load_map(map_name)
+        self.allowed_weapons = set(weapons or WEAPONS_DATA) # What a JOIN may pick
+        self.fighters = {} # slot -> Player
+        self.scores = {} # Player -> [kills, deaths]
+        self.respawn_at = {} # Player -> tick
+        # Projectile -> (id, spawn tick, x, y, vx, vy, weapon id), what clients need to fly it themselves
+        self.shot_records = {}
+        self.next_shot_id = 0
+
+    def add_fighter(self, slot, name, weapon="Fist"):
+        fighter = Player(name)
+        fighter.color = ARENA_PALETTE[slot % len(ARENA_PALETTE)]
+        if weapon in self.allowed_weapons and weapon in WEAPONS_DATA:
+            fighter.inventory.append(weapon)
+            fighter.equip_weapon(weapon)
+        self.fighters[slot] = fighter
+        self.scores[fighter] = [0, 0]
+        self.respawn(slot, fighter)
+        return fighter
+
+    def remove_fighter(self, slot):
+        fighter = self.fighters.pop(slot, None)
+        if fighter:
+            fighter.clear_timers()
+        self.scores.pop(fighter, None)
+        self.respawn_at.pop(fighter, None)
+
+    def respawn(self, slot, fighter):
+        fighter.reset_position()
+        # Spread out along the map so nobody spawns on top of someone else
+        fighter.rect.x = 100 + (slot * 211) % max(1, self.world_width - 240)
+        fighter.save_position()
+        self.respawn_at.pop(fighter, None)
+
+    def combatants(self):
+        return [f for f in self.fighters.values() if f.hp > 0]
+
+    def melee_targets(self, attacker):
+        return [f for f in self.combatants() if f is not attacker]
+
+    def hostile(self, owner, target):
+        return target is not owner
+
+    def step(self, inputs):
+        """Advance one tick, inputs maps slot -> PlayerInput"""
+        for slot, fighter in self.fighters.items():
+            if fighter.hp <= 0:
+                if self.tick_count >= self.respawn_at.get(fighter, 0):
+                    self.respawn(slot, fighter)
+                continue
+            self.update_player(inputs.get(slot) or PlayerInput(), fighter)
+
+        self.update_projectiles()
+        alive = set(self.projectiles)
+        for p in [p for p in self.shot_records if p not in alive]:
+            del self.shot_records[p]
+
+        self.end_tick()
+
+    def perform_attack(self, attacker):
+        count = len(self.projectiles)
+        super().perform_attack(attacker)
+        for p in self.projectiles[count:]:
+            self.shot_records[p] = (self.next_shot_id, self.tick_count, p.x, p.y, p.vx, p.vy, p.weapon_id)
+            self.next_shot_id = (self.next_shot_id + 1) & 0xFFFF
+
+    def handle_kill(self, attacker, victim):
+        if victim not in self.scores:
+            return
+        self.scores[victim][1] += 1
+        if attacker in self.scores and attacker is not victim:
+            self.scores[attacker][0] += 1
+        self.respawn_at[victim] = self.tick_count + NET_RESPAWN_TICKS
+
+    def world_state(self):
+        fighters = {slot: fighter_record(f, *self.scores[f]) for slot, f in self.fighters.items()}
+        shots = {record[0]: record[1:] for record in self.shot_records.values()}
+        return WorldState(self.tick_count, fighters, shots)
+
+
+class RemoteClient:
+    """The server's view of one connected player"""
+    def __init__(self, address, slot, name, now):
+        self.address = address
+        self.slot = slot
+        self.name = name
+        self.inputs = {} # Sequence number -> input mask, not applied yet
+        self.next_seq = None
+        self.applied_seq = 0 # Echoed in snapshots so the client can drop its predicted inputs
+        self.last_mask = 0
+        self.acked = None # Tick of the newest snapshot the client has
+        self.last_heard = now
+
+
+class BattleServer:
+    def __init__(self, port=NET_PORT, map_name="Street", max_players=NET_MAX_PLAYERS, host="", verbose=True,
+                 weapons=None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.port = self.sock.getsockname()[1]
+        self.max_players = min(max_players, NET_MAX_PLAYERS)
+        self.verbose = verbose
+        self.sim = ServerSimulation(map_name, weapons)
+        self.clients = {} # address -> RemoteClient
+        self.history = {} # tick -> WorldState, for the last NET_HISTORY ticks
+        self.bytes_sent = 0
+        self.running = True
+
+    def log(self, text):
+        if self.verbose:
+            print(text)
+
+    def serve(self, duration=None):
+        tick_s = TICK_MS / 1000
+        start = next_tick = time.perf_counter()
+        while self.running and (duration is None or time.perf_counter() - start < duration):
+            self.receive()
+            now = time.perf_counter()
+            if now < next_tick:
+                select.select([self.sock], [], [], next_tick - now)
+                continue
+            self.tick(now)
+            next_tick += tick_s
+            if now - next_tick > tick_s * MAX_TICKS_PER_FRAME:
+                next_tick = now # Too far behind, drop the backlog instead of spiraling
+
+    def receive(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except (BlockingIOError, ConnectionResetError):
+                return
+            try:
+                self.handle(data, address)
+            except (struct.error, IndexError, UnicodeDecodeError):
+                pass # Malformed packet, not ours to fix
+
+    def handle(self, data, address):
+        kind = data[0]
+        client = self.clients.get(address)
+        if kind == MSG_JOIN:
+            self.join(data, address, client)
+        elif client is None:
+            return
+        elif kind == MSG_INPUT:
+            self.receive_input(client, data)
+        elif kind == MSG_LEAVE:
+            self.drop(client, "left")
+
+    def join(self, data, address, client):
+        version, name, weapon = decode_join(data)
+        if client is None:
+            taken = {c.slot for c in self.clients.values()}
+            free = [slot for slot in range(self.max_players) if slot not in taken]
+            if version != PROTOCOL_VERSION or not free:
+                self.send(bytes((MSG_FULL,)), address)
+                return
+            client = self.clients[address] = RemoteClient(address, free[0], name, time.perf_counter())
+            self.sim.add_fighter(client.slot, name, weapon)
+            self.log(f"{name} joined in slot {client.slot} from {address[0]}:{address[1]}")
+            self.send_roster()
+        # Repeated JOINs just get the WELCOME again, the first one may have been lost
+        self.send(encode_welcome(client.slot, self.sim.tick_count, self.sim.map_name), address)
+
+    def receive_input(self, client, data):
+        ack, seq, masks = decode_input(data)
+        client.last_heard = time.perf_counter()
+        if ack != NO_BASE and (client.acked is None or ack > client.acked):
+            client.acked = ack
+        first = seq - len(masks) + 1
+        if client.next_seq is None:
+            client.next_seq = first
+        for i, mask in enumerate(masks):
+            if first + i >= client.next_seq:
+                client.inputs[first + i] = mask
+
+    def next_input(self, client):
+        inputs = client.inputs
+        if client.next_seq is None:
+            return PlayerInput()
+        if len(inputs) > NET_INPUT_BUFFER:
+            # The client got ahead (or a burst arrived at once), skip to its newest inputs
+            newest = max(inputs)
+            client.next_seq = newest - NET_INPUT_BUFFER + 1
+            for seq in [seq for seq in inputs if seq < client.next_seq]:
+                del inputs[seq]
+        mask = inputs.pop(client.next_seq, None)
+        if mask is None:
+            # Late or lost, keep walking the same way but don't attack again
+            return PlayerInput.from_mask(client.last_mask & ~INPUT_ATTACK)
+        client.applied_seq = client.next_seq
+        client.next_seq += 1
+        client.last_mask = mask
+        return PlayerInput.from_mask(mask)
+
+    def tick(self, now):
+        inputs = {}
+        for client in list(self.clients.values()):
+            if now - client.last_heard > NET_TIMEOUT:
+                self.drop(client, "timed out")
+                continue
+            inputs[client.slot] = self.next_input(client)
+
+        sim = self.sim
+        sim.step(inputs)
+        state = sim.world_state()
+        self.history[state.tick] = state
+        self.history.pop(state.tick - NET_HISTORY, None)
+        if state.tick % NET_SNAPSHOT_INTERVAL == 0:
+            self.send_snapshots(state)
+        if state.tick % NET_ROSTER_INTERVAL == 0:
+            self.send_roster()
+
+    def send_snapshots(self, state):
+        bodies = {} # Base tick -> encoded body, clients that acked the same snapshot share it
+        for client in self.clients.values():
+            base_tick = client.acked if client.acked in self.history else NO_BASE
+            body = bodies.get(base_tick)
+            if body is None:
+                base = EMPTY_STATE if base_tick == NO_BASE else self.history[base_tick]
+                body = bodies[base_tick] = encode_body(state, base)
+            self.send(encode_snapshot(state.tick, base_tick, client.applied_seq, body), client.address)
+
+    def send_roster(self):
+        packet = encode_roster({c.slot: c.name for c in self.clients.values()})
+        for client in self.clients.values():
+            self.send(packet, client.address)
+
+    def send(self, data, address):
+        try:
+            self.sock.sendto(data, address)
+            self.bytes_sent += len(data)
+        except OSError:
+            pass # Full send buffer or an unreachable client, UDP drops it either way
+
+    def drop(self, client, reason):
+        del self.clients[client.address]
+        self.sim.remove_fighter(client.slot)
+        self.log(f"{client.name} {reason}")
+        self.send_roster()
+
+    def close(self):
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"{TITLE} battle server")
+    parser.add_argument("--port", type=int, default=NET_PORT)
+    parser.add_argument("--map", default="Street", choices=sorted(MAPS))
+    parser.add_argument("--max-players", type=int, default=NET_MAX_PLAYERS)
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--quiet", action="store_true", help="Don't log joins and leaves")
+    parser.add_argument("--weapons", help="Comma separated weapons players may join with (default: any)")
+    args = parser.parse_args()
+    weapons = None
+    if args.weapons:
+        weapons = [name.strip() for name in args.weapons.split(",")]
+        unknown = [name for name in weapons if name not in WEAPONS_DATA]
+        if unknown:
+            parser.error(f"unknown weapons: {', '.join(unknown)}")
+
+    server = BattleServer(args.port, args.map, args.max_players, verbose=not args.quiet, weapons=weapons)
+    server.log(f"Serving {MAPS[args.map]['name']} on UDP port {server.port} for up to {server.max_players} players")
+    try:
+        server.serve(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -8,8 +8,44 @@ pygame.font.init()
 WIDTH = 1000
 HEIGHT = 700
 FPS = 60
+SCALE_MODE = "nearest" # "nearest", "smooth" or "integer" (whole-number scaling only)
+TICK_RATE = 60 # Simulation ticks per second, physics constants are tuned for this
+TICK_MS = 1000 / TICK_RATE
+MAX_TICKS_PER_FRAME = 5 # Cap catch-up so a slow frame can't spiral
+GRAVITY = 0.5 # Added to a fighter's fall speed every tick
+JUMP_SPEED = 12 # Upward speed of a jump, the player's and the CPUs' (see nav.py)
+PIPELINE_MODE = "off" # "thread" or "process" runs battles in a worker and draws its snapshots, see pipeline.py
+SPATIAL_CELL_SIZE = 64 # Grid cell size for collision broadphase
+COLLISION_COLUMN_WIDTH = 64 # Column width of the compiled platform landing index
+PROJECTILE_SIZE = 10 # Projectile hitbox is PROJECTILE_SIZE x PROJECTILE_SIZE
+PROJECTILE_POOL_SIZE = 2048 # Spent projectiles kept around for reuse
+PROJECTILE_LIFE = 100 # Ticks a shot that hits nothing keeps flying
+PARTICLE_CAPACITY = 8192 # Max live explosion particles
+PARTICLES_PER_BURST = 15
+PARTICLE_MAX_LIFE = 40 # Ticks
+PARTICLE_MAX_SIZE = 8 # Radius in pixels
+SHOCKWAVE_PARTICLES = 24 # Particles in the ring a blast sends out
 TITLE = "Battle Street 2 Deluxe"
 
+# World streaming (maps wider or taller than the screen scroll with the player)
+CHUNK_SIZE = 512 # Backgrounds are baked in CHUNK_SIZE x CHUNK_SIZE pieces
+CHUNK_CACHE_SIZE = 16 # Baked chunks kept in memory, about 1 MB each
+CAMERA_DEADZONE = 150 # How far the player can move from the screen centre before it scrolls
+FAR_CHUNKS = 2 # CPUs more than this many chunks from the player are "far"...
+FAR_TICK_INTERVAL = 4 # ...and only update every FAR_TICK_INTERVAL ticks
+
+# Networking (server.py, net_client.py)
+NET_PORT = 7777
+NET_MAX_PLAYERS = 32 # Fighter slots per server, the snapshot bitmaps are 32 bits wide
+NET_SNAPSHOT_INTERVAL = 2 # Ticks between snapshots sent to each client
+NET_HISTORY = 64 # Ticks of world state kept to delta-compress against
+NET_INPUT_REDUNDANCY = 8 # Each input packet repeats this many recent inputs, so a lost packet costs nothing
+NET_INPUT_BUFFER = 4 # Inputs a client may queue on the server before the oldest are skipped
+NET_INTERP_TICKS = 6 # Other players are drawn this far in the past, between two snapshots
+NET_ROSTER_INTERVAL = 60 # Ticks between player name lists
+NET_RESPAWN_TICKS = 180
+NET_TIMEOUT = 5 # Seconds of silence before a client is dropped (or drops the server)
+
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -29,9 +65,52 @@ LIGHT_BLUE = (173, 216, 230)
 
 # Fonts
 FONT_NAME = "arial"
+TEXT_CACHE_SIZE = 512 # Max rendered text surfaces kept around
+SPRITE_CACHE_SIZE = 256 # Max baked player/platform/item sprites kept around
+
+# Textures
+WEAPON_MAX_WIDTH = 60 # Weapon images wider than this are scaled down
+TEXTURE_PACK = "weapons.pack" # Pre-scaled weapon atlas, raw RGBA
+TEXTURE_INDEX = "weapons.pack.json" # Where each weapon sits in the atlas
+ATLAS_WIDTH = 512
+
+# Profiler (F3 overlay, F4 export, F5 memory tracking)
+PROFILER_HISTORY = 600 # Frames kept for percentiles and export
+PROFILER_OVERLAY_REFRESH = 15 # Frames between overlay text updates
+PROFILER_SNAPSHOT_EVERY = 300 # Frames between tracemalloc snapshots
+PROFILE_TRACE_FILE = "profile_trace.json" # Chrome trace (chrome://tracing, Perfetto)
+PROFILE_CSV_FILE = "profile.csv"
+
+# Adaptive quality (quality.py): render quality steps down to hold the frame budget and back up when there's room
+QUALITY_GOVERNOR = True
+QUALITY_TARGET_MS = 1000 / FPS # Frame budget for events, ticks and drawing (not the wait for the next frame)
+QUALITY_WINDOW = 60 # Battle frames averaged before any change
+QUALITY_DOWN_AT = 1.0 # Step down when the window's mean is over this share of the budget...
+QUALITY_UP_AT = 0.6 # ...and only back up when it's under this share...
+QUALITY_UP_DELAY = 180 # ...for this many frames in a row, so it doesn't flip back and forth
+# Best first. "particles" scales the particles a burst or blast spawns, "particle_lod" is 0 circles,
+# 1 squares, 2 every other particle as a square, "scale" caps SCALE_MODE (smooth > nearest > integer,
+# which brings back dirty-rect presents), "labels" draws fighter names
+QUALITY_TIERS = [
+    {"particles": 1.0, "particle_lod": 0, "scale": "smooth", "labels": True},
+    {"particles": 1.0, "particle_lod": 1, "scale": "nearest", "labels": True},
+    {"particles": 0.5, "particle_lod": 1, "scale": "nearest", "labels": False},
+    {"particles": 0.25, "particle_lod": 2, "scale": "integer", "labels": False},
+]
 
 # Gameplay
 STARTING_COINS = 0
+REPLAY_FILE = "last_battle.bs2r" # Every battle's input is recorded here
+MAX_BATTLE_CPUS = 4 # More than this and the match is played as an arena
+ARENA_MAX_CPUS = 1000
+ARENA_CPU_HP = 80 # Max hp of an arena CPU, the same as a Player CPU's
+ARENA_PROJECTILE_CAPACITY = 4096 # CPU shots in flight at once
+ATTACK_POSE_MS = 200 # How long a fighter shows its attack pose
+NAV_SAMPLE_STEP = 16 # Pixels between the takeoff points tried along each platform when building the nav graph
+NAV_MAX_AIR_TICKS = 300 # Jumps and falls that haven't landed by then aren't links
+NAV_SEARCHES_PER_TICK = 8 # New A* searches a simulation runs per tick, CPUs still waiting for theirs just chase
+BLAST_RADIUS = 90 # Explosion weapons hurt everything this close, in pixels, unless they set a "radius"
+BLAST_FALLOFF = 0.25 # Share of a blast's damage left at the edge of its radius
 WIN_REWARD = 50
 LOSE_PENALTY = 20
 
@@ -65,11 +144,11 @@ WEAPONS_DATA = {
     "Plasma Rifle": {"damage": 33, "cost": 250, "speed": 19, "color": (100, 100, 255), "explosion": False, "melee": False},
     "Sticky Bomb": {"damage": 34, "cost": 260, "speed": 7, "color": (100, 255, 100), "explosion": True, "melee": False},
     "Blaster Cannon": {"damage": 35, "cost": 270, "speed": 17, "color": (255, 50, 150), "explosion": False, "melee": False},
-    "Super Grenade": {"damage": 36, "cost": 280, "speed": 9, "color": (255, 50, 255), "explosion": True, "melee": False},
+    "Super Grenade": {"damage": 36, "cost": 280, "speed": 9, "color": (255, 50, 255), "explosion": True, "melee": False, "radius": 120},
     "Ion Blaster": {"damage": 38, "cost": 300, "speed": 23, "color": (150, 200, 255), "explosion": False, "melee": False},
-    "Mega Rocket": {"damage": 40, "cost": 320, "speed": 12, "color": (255, 50, 50), "explosion": True, "melee": False},
+    "Mega Rocket": {"damage": 40, "cost": 320, "speed": 12, "color": (255, 50, 50), "explosion": True, "melee": False, "radius": 130},
     "Photon Cannon": {"damage": 42, "cost": 350, "speed": 24, "color": (255, 255, 255), "explosion": False, "melee": False},
-    "Nuke Launcher": {"damage": 45, "cost": 400, "speed": 10, "color": (255, 255, 0), "explosion": True, "melee": False},
+    "Nuke Launcher": {"damage": 45, "cost": 400, "speed": 10, "color": (255, 255, 0), "explosion": True, "melee": False, "radius": 180},
 }
 
 WEAPON_FILES = {
@@ -194,6 +273,7 @@ COSMETICS = {
 
 MAPS = {
     "Street": {
+        "file": "street.json", # In maps/, see map_loader.py
         "name": "City Street",
         "bg_color": (100, 100, 120),
         "ground_color": (60, 60, 60),
@@ -201,6 +281,7 @@ MAPS = {
         "sky_color": (135, 206, 250)
     },
     "Desert": {
+        "file": "desert.json",
         "name": "Sandy Desert",
         "bg_color": (255, 220, 150),
         "ground_color": (194, 178, 128),
@@ -208,6 +289,7 @@ MAPS = {
         "sky_color": (255, 200, 100)
     },
     "Grassland": {
+        "file": "grassland.json",
         "name": "Green Fields",
         "bg_color": (100, 200, 100),
         "ground_color": (80, 180, 80),
@@ -215,6 +297,7 @@ MAPS = {
         "sky_color": (135, 206, 250)
     },
     "Arena": {
+        "file": "arena.json",
         "name": "Battle Arena",
         "bg_color": (120, 80, 80),
         "ground_color": (90, 60, 60),
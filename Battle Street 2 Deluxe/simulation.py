@@ -0,0 +1,530 @@
+import random
+from settings import *
+from player import Player
+from game_objects import ExplosionParticle, projectile_pool
+from map_loader import load_level
+from spatial_hash import SpatialHash
+from particles import particle_pool
+from timers import TimerWheel, ms_to_ticks
+from nav import JUMP, NavRoutes
+
+# Input bits, as stored in replays
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+INPUT_ATTACK = 8
+
+ATTACK_POSE_TICKS = ms_to_ticks(ATTACK_POSE_MS)
+
+def rect_distance(rect, x, y):
+    """Distance from (x, y) to the closest point of rect, 0 inside it"""
+    dx = max(rect.left - x, 0, x - rect.right)
+    dy = max(rect.top - y, 0, y - rect.bottom)
+    return (dx * dx + dy * dy) ** 0.5
+
+def blast_damage(damage, distance, radius):
+    """Full damage at the centre of a blast, falling off linearly to BLAST_FALLOFF of it at the edge"""
+    return damage * (1 - (1 - BLAST_FALLOFF) * distance / radius)
+
+
+class PlayerInput:
+    """Controls for one simulation tick"""
+    def __init__(self, left=False, right=False, jump=False, attack=False):
+        self.left = left
+        self.right = right
+        self.jump = jump
+        self.attack = attack
+
+    def to_mask(self):
+        return ((INPUT_LEFT if self.left else 0) | (INPUT_RIGHT if self.right else 0) |
+                (INPUT_JUMP if self.jump else 0) | (INPUT_ATTACK if self.attack else 0))
+
+    @classmethod
+    def from_mask(cls, mask):
+        return cls(bool(mask & INPUT_LEFT), bool(mask & INPUT_RIGHT), bool(mask & INPUT_JUMP), bool(mask & INPUT_ATTACK))
+
+
+class Simulation:
+    """Battle rules with no display. Step it one tick at a time with explicit inputs."""
+    GRAVITY = GRAVITY
+
+    def __init__(self, player, seed=None, effects=True, particles=None):
+        self.player = player
+        self.seed = seed
+        self.rng = random.Random(seed) # Every random roll in a match comes from here
+        self.effects = effects # Spawn explosion particles (off for batch runs)
+        self.battle_cpus = []
+        self.platforms = []
+        self.level = None
+        self.collision = None # Landing index for the platforms, from the compiled map
+        self.world_width = WIDTH
+        self.world_height = HEIGHT
+        self.projectiles = []
+        self.collectibles = []
+        self.particles = particles or particle_pool
+        # Cooldowns, attack poses and shot lifetimes all run off this
+        self.timers = TimerWheel()
+        self.nav_searches = NAV_SEARCHES_PER_TICK # Left this tick, see route()
+        self.routes = None # This match's NavRoutes, see start()
+        # Broadphase grids: platforms are static per map, fighters are rebuilt each tick
+        self.platform_grid = SpatialHash(pad=PROJECTILE_SIZE)
+        self.fighter_grid = SpatialHash(pad=PROJECTILE_SIZE)
+        self.blast_grid = SpatialHash(pad=PROJECTILE_SIZE) # Live explosives, only built on ticks with a blast
+        self.map_name = None
+        self.current_map_data = None
+        self.time = 0 # Simulated milliseconds
+        self.tick_count = 0
+        self.result = None # "win" or "loss" once the battle is over
+        self.load_map("Street")
+
+    def load_map(self, map_name):
+        if map_name not in MAPS:
+            map_name = "Street"
+        self.map_name = map_name
+        self.current_map_data = MAPS[map_name]
+
+        # Platforms come from maps/<file>.json, compiled and cached by map_loader
+        level = load_level(map_name)
+        self.level = level
+        self.platforms = level.platforms
+        self.collision = level.collision
+        self.world_width = level.width
+        self.world_height = level.height
+
+        self.platform_grid.clear()
+        for plat in self.platforms:
+            self.platform_grid.insert(plat, plat.rect)
+        self.routes = NavRoutes(level.nav) # Built now (once per map) rather than on a CPU's first tick
+
+    def start(self, num_cpus, cpu_weapon=None, seed=None):
+        """Set up a new match. The same seed and inputs always play out the same way."""
+        if seed is not None:
+            self.seed = seed
+            self.rng.seed(seed)
+            self.particles.seed(seed)
+        self.player.reset_position()
+        self.battle_cpus = []
+        self.clear_projectiles()
+        self.collectibles = []
+        self.particles.clear()
+        self.time = 0
+        self.tick_count = 0
+        # Paths cached by an earlier match would let more CPUs route on the first ticks than a fresh process does
+        self.routes = NavRoutes(self.nav)
+        self.nav_searches = NAV_SEARCHES_PER_TICK
+        self.timers.clear()
+        self.result = None
+
+        # Create CPUs
+        for i in range(num_cpus):
+            cpu = Player(username=f"CPU {i+1}", is_cpu=True, rng=self.rng)
+            cpu.rect.x = WIDTH - 100 - (i * 100)
+            cpu.rect.y = 100
+            cpu.save_position()
+
+            # Match Player Weapon unless told otherwise
+            weapon_name = cpu_weapon or self.player.current_weapon_name
+            # Ensure CPU has it in inventory
+            if weapon_name not in cpu.inventory:
+                cpu.inventory.append(weapon_name)
+            cpu.equip_weapon(weapon_name)
+
+            self.battle_cpus.append(cpu)
+
+    def step(self, player_input=None):
+        """Advance one tick. A player_input of None lets the CPU AI drive the player too."""
+        if self.result:
+            return
+
+        if player_input is None:
+            self.update_cpu(self.player, self.closest_cpu())
+        else:
+            self.update_player(player_input)
+
+        # CPU Logic. CPUs far from the player (off screen on big maps) take
+        # one FAR_TICK_INTERVAL-sized step every FAR_TICK_INTERVAL ticks, staggered
+        player_chunk = self.player.rect.centerx // CHUNK_SIZE
+        for i, cpu in enumerate(self.battle_cpus[:]):
+            if self.result:
+                break
+            if abs(cpu.rect.centerx // CHUNK_SIZE - player_chunk) <= FAR_CHUNKS:
+                self.update_cpu(cpu, self.player)
+            elif (self.tick_count + i) % FAR_TICK_INTERVAL == 0:
+                self.update_cpu(cpu, self.player, FAR_TICK_INTERVAL)
+
+        self.update_projectiles()
+
+        self.particles.update()
+
+        self.end_tick()
+
+    def end_tick(self):
+        self.nav_searches = NAV_SEARCHES_PER_TICK
+        self.tick_count += 1
+        self.time = self.tick_count * TICK_MS
+        self.timers.advance()
+
+    def clear_projectiles(self):
+        projectile_pool.release_all(self.projectiles)
+        self.projectiles = []
+
+    @property
+    def nav(self):
+        """The map's NavGraph, shared by every simulation on it"""
+        return self.level.nav
+
+    @property
+    def cpu_count(self):
+        return len(self.battle_cpus)
+
+    @property
+    def projectile_count(self):
+        return len(self.projectiles)
+
+    def closest_cpu(self):
+        if not self.battle_cpus:
+            return None
+        x = self.player.rect.centerx
+        return min(self.battle_cpus, key=lambda cpu: abs(cpu.rect.centerx - x))
+
+    def update_player(self, player_input, player=None):
+        player = player or self.player
+        if player_input.attack:
+            self.perform_attack(player)
+
+        self.move_player(player, player_input)
+
+    def move_player(self, player, player_input):
+        """Walk, jump and fall one tick. Network clients predict their own player with this."""
+        # Player Movement
+        player.vel_x = 0
+        if player_input.left:
+            player.vel_x = -player.speed
+            player.facing_right = False
+        if player_input.right:
+            player.vel_x = player.speed
+            player.facing_right = True
+
+        # Jump
+        if player_input.jump and player.on_ground:
+            player.vel_y = -JUMP_SPEED
+
+        self.update_physics(player)
+
+    def update_cpu(self, cpu, target, ticks=1):
+        cpu.vel_x = 0
+        if target is None:
+            self.update_physics(cpu, ticks)
+            return
+        dist = abs(cpu.rect.centerx - target.rect.centerx)
+
+        # Face target always
+        if cpu.rect.centerx < target.rect.centerx:
+            cpu.facing_right = True
+        else:
+            cpu.facing_right = False
+
+        weapon = cpu.current_weapon
+        desired_range = weapon.range if weapon.melee else 300
+        speed = cpu.speed * 0.7 # Balanced movement
+
+        edge = self.route(cpu, target)
+        if edge:
+            # On another platform than the target, run there along the nav graph
+            cpu.vel_x = edge.direction * cpu.speed
+            if edge.kind == JUMP and cpu.on_ground:
+                if edge.left <= cpu.rect.x <= edge.right:
+                    cpu.vel_y = -JUMP_SPEED
+                else:
+                    # Get to the takeoff spot first
+                    cpu.vel_x = cpu.speed if cpu.rect.x < (edge.left + edge.right) / 2 else -cpu.speed
+        # Move towards target if far
+        elif dist > desired_range:
+            if cpu.facing_right:
+                cpu.vel_x = speed
+            else:
+                cpu.vel_x = -speed
+        elif dist < desired_range - 100:
+             # Back up if too close (optional for better AI)
+            if cpu.facing_right:
+                cpu.vel_x = -speed
+            else:
+                cpu.vel_x = speed
+
+        self.update_physics(cpu, ticks)
+
+        # Attack
+        if dist < desired_range + 50: # Attack range
+             if self.rng.random() < 0.06 * ticks: # Better reaction time
+                self.perform_attack(cpu)
+
+    def route(self, cpu, target):
+        """The nav edge cpu should follow toward target, None once they share a platform or it can't get there.
+
+        Only looked up again (a cached path, see NavRoutes.path) when either
+        of them lands on another platform; in the air cpu keeps to its edge.
+        Past NAV_SEARCHES_PER_TICK new searches in a tick, the rest wait
+        for the next one.
+        """
+        if not cpu.on_ground:
+            return cpu.route_edge
+        nav = self.nav
+        routes = self.routes
+        key = (nav.locate(cpu), nav.locate(target))
+        if key != cpu.route_key:
+            start, goal = key
+            if start is None or goal is None:
+                cpu.route_edge = None
+            elif routes.cached(start, goal):
+                cpu.route_edge = routes.next_edge(start, goal)
+            elif self.nav_searches:
+                self.nav_searches -= 1
+                cpu.route_edge = routes.next_edge(start, goal)
+            else:
+                return None
+            cpu.route_key = key
+        return cpu.route_edge
+
+    def combatants(self):
+        """Everyone who can be hit"""
+        return [self.player] + self.battle_cpus
+
+    def melee_targets(self, attacker):
+        return self.battle_cpus if attacker == self.player else [self.player]
+
+    def hostile(self, owner, target):
+        # Player shots hit CPUs and CPU shots hit the player
+        return (target is self.player) != (owner is self.player)
+
+    def update_projectiles(self):
+        grid = self.fighter_grid
+        grid.clear()
+        for fighter in self.combatants():
+            grid.insert(fighter, fighter.rect)
+
+        # Both grids share a cell size, so each projectile needs one cell key
+        # and two dict lookups (projectiles are no bigger than the grid padding)
+        size = grid.cell_size
+        fighter_cells = grid.cells
+        platform_cells = self.platform_grid.cells
+        hostile = self.hostile
+
+        # Survivors are compacted into a new list instead of list.remove per hit
+        alive = []
+        blasts = [] # Explosives that hit something this tick
+        release = projectile_pool.release
+        world_width = self.world_width
+        world_height = self.world_height
+        for p in self.projectiles:
+            if not p.update(world_width, world_height):
+                release(p)
+                continue
+            rect = p.rect
+            key = (rect.x // size, rect.y // size)
+
+            # Check hits
+            hit = False
+            targets = fighter_cells.get(key)
+            if targets:
+                for target in targets:
+                    if target.hp <= 0 or not hostile(p.owner, target):
+                        continue
+                    if rect.colliderect(target.rect):
+                        hit = True
+                        if p.blast_radius:
+                            break # The blast does the damage
+                        target.take_damage(p.damage)
+                        self.spawn_explosion(p.x, p.y, p.color)
+                        if target.hp <= 0:
+                            self.handle_kill(p.owner, target)
+                        break
+
+            if not hit:
+                # Platform collision
+                plats = platform_cells.get(key)
+                if plats:
+                    for plat in plats:
+                        if rect.colliderect(plat.rect):
+                            if not p.blast_radius:
+                                self.spawn_explosion(p.x, p.y, GRAY)
+                            hit = True
+                            break
+
+            if not hit:
+                alive.append(p)
+            elif p.blast_radius:
+                blasts.append(p)
+            else:
+                release(p)
+        if blasts:
+            alive = self.explode(blasts, alive)
+        self.projectiles = alive
+
+    def explode(self, blasts, projectiles):
+        """Set off the explosives in `blasts`, and any live ones in `projectiles` they reach.
+
+        Every hostile fighter within a blast's radius takes blast_damage.
+        Returns what's left of `projectiles`.
+        """
+        grid = self.blast_grid
+        grid.clear()
+        for p in projectiles:
+            if p.blast_radius:
+                grid.insert(p, p.rect)
+        fighters = self.fighter_grid
+        hostile = self.hostile
+
+        detonated = set(blasts)
+        queue = list(blasts)
+        waves = []
+        for p in queue: # Grows as blasts set off other explosives
+            x, y = p.rect.center
+            radius = p.blast_radius
+            for target in fighters.query_radius(x, y, radius):
+                if target.hp <= 0 or not hostile(p.owner, target):
+                    continue
+                distance = rect_distance(target.rect, x, y)
+                if distance <= radius:
+                    target.take_damage(blast_damage(p.damage, distance, radius))
+                    if target.hp <= 0:
+                        self.handle_kill(p.owner, target)
+            # Chain reactions
+            for other in grid.query_radius(x, y, radius):
+                if other not in detonated and rect_distance(other.rect, x, y) <= radius:
+                    detonated.add(other)
+                    queue.append(other)
+            waves.append((x, y, radius, p.color))
+
+        if self.effects:
+            self.particles.spawn_shockwaves(waves)
+        for p in queue:
+            projectile_pool.release(p)
+        return [p for p in projectiles if p not in detonated]
+
+    def spawn_explosion(self, x, y, color):
+        if self.effects:
+            ExplosionParticle(x, y, color, self.particles)
+
+    # --- Timers ---
+
+    def start_timer(self, fighter, name, ticks, callback=None):
+        """(Re)start fighter's `name` timer. While it runs `name` is in fighter.timers, then callback(fighter)."""
+        self.cancel_timer(fighter, name)
+        fighter.timers[name] = self.timers.schedule(ticks, self.timer_done, fighter, name, callback)
+
+    def cancel_timer(self, fighter, name):
+        timer = fighter.timers.pop(name, None)
+        if timer:
+            timer.cancel()
+
+    def timer_done(self, fighter, name, callback):
+        del fighter.timers[name]
+        if callback:
+            callback(fighter)
+
+    def end_attack_pose(self, fighter):
+        fighter.is_attacking = False
+
+    # --- Attacks ---
+
+    def start_attack(self, attacker):
+        """Put attacker on cooldown and in its attack pose, False if it's still cooling down"""
+        if "cooldown" in attacker.timers:
+            return False
+
+        # Set cooldown based on weapon speed (higher speed = faster?)
+        # Original: speed 12. Let's map it.
+        # Maybe 1000ms / speed? e.g. 1000/12 = 83ms.
+        base_cooldown = max(200, 2000 // attacker.current_weapon.speed)
+        if attacker.is_cpu:
+            base_cooldown *= 1.5 # Balanced attacks for CPU
+        self.start_timer(attacker, "cooldown", ms_to_ticks(base_cooldown))
+
+        attacker.is_attacking = True
+        self.start_timer(attacker, "attack", ATTACK_POSE_TICKS, self.end_attack_pose)
+        return True
+
+    def perform_attack(self, attacker):
+        if not self.start_attack(attacker):
+            return
+
+        weapon = attacker.current_weapon
+
+        if weapon.melee:
+            # Melee Attack
+            hit_box = attacker.rect.copy()
+            if attacker.facing_right:
+                hit_box.x += hit_box.width
+            else:
+                hit_box.x -= hit_box.width
+
+            # Check collisions
+            for target in self.melee_targets(attacker)[:]:
+                if hit_box.colliderect(target.rect):
+                    target.take_damage(weapon.damage)
+                    # Knockback
+                    if attacker.rect.centerx < target.rect.centerx:
+                        target.rect.x += 10
+                    else:
+                        target.rect.x -= 10
+
+                    if target.hp <= 0:
+                        self.handle_kill(attacker, target)
+
+        else:
+            # Ranged Attack (Projectile)
+            vx = 10 if attacker.facing_right else -10
+            vy = -2 # Slight arc up
+
+            # Spawn at weapon position
+            start_x = attacker.rect.right if attacker.facing_right else attacker.rect.left
+            start_y = attacker.rect.centery
+
+            proj = projectile_pool.acquire(start_x, start_y, vx, vy, attacker.weapon_id, attacker)
+            # Gone before its PROJECTILE_LIFE-th move
+            proj.expiry = self.timers.schedule(PROJECTILE_LIFE - 1, proj.expire)
+            self.projectiles.append(proj)
+
+    def handle_kill(self, attacker, victim):
+        if self.result:
+            return
+        if victim in self.battle_cpus:
+            attacker.coins += WIN_REWARD
+            self.battle_cpus.remove(victim)
+            self.spawn_explosion(victim.rect.centerx, victim.rect.centery, RED)
+            if not self.battle_cpus:
+                self.result = "win"
+        elif victim == self.player:
+            self.player.coins = max(0, self.player.coins - LOSE_PENALTY)
+            self.result = "loss"
+
+    def update_physics(self, entity, ticks=1):
+        """Move entity by one tick, or `ticks` ticks at once for far-away CPUs"""
+        entity.save_position() # For render interpolation
+
+        # Apply Gravity
+        entity.vel_y += self.GRAVITY * ticks
+
+        # Move Y
+        fall = entity.vel_y * ticks
+        entity.rect.y += fall
+        entity.on_ground = False
+
+        # Check Platform Collisions (Y axis), only the platforms under the entity
+        rect = entity.rect
+        platform = self.collision.landing(rect.left, rect.right, rect.bottom, fall)
+        if platform:
+            rect.bottom = platform.y
+            entity.vel_y = 0
+            entity.on_ground = True
+
+        # Keep in bounds
+        if entity.rect.bottom > self.world_height:
+            entity.rect.bottom = self.world_height
+            entity.vel_y = 0
+            entity.on_ground = True
+
+        # Move X (handled by input/AI, but collision check could go here)
+        entity.rect.x += entity.vel_x * ticks
+        if entity.rect.left < 0: entity.rect.left = 0
+        if entity.rect.right > self.world_width: entity.rect.right = self.world_width
@@ -0,0 +1,111 @@
+from bisect import bisect_left, bisect_right
+import numpy as np
+import pygame
+from settings import *
+
+class SpatialHash:
+    """Uniform grid that maps cells to the objects overlapping them.
+
+    Objects are registered with their rect grown up and left by `pad`, so
+    anything no bigger than pad x pad can be looked up by its top-left
+    corner alone (query_point) instead of every cell it touches.
+    """
+    def __init__(self, cell_size=SPATIAL_CELL_SIZE, pad=0):
+        self.cell_size = cell_size
+        self.pad = pad
+        self.cells = {}
+
+    def clear(self):
+        self.cells.clear()
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        return (int(rect.left // size), int((rect.right - 1) // size),
+                int(rect.top // size), int((rect.bottom - 1) // size))
+
+    def insert(self, obj, rect):
+        if self.pad:
+            rect = pygame.Rect(rect.x - self.pad, rect.y - self.pad, rect.width + self.pad, rect.height + self.pad)
+        x0, x1, y0, y1 = self.cell_range(rect)
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = [obj]
+                else:
+                    bucket.append(obj)
+
+    def cell_key(self, x, y):
+        size = self.cell_size
+        return (int(x // size), int(y // size))
+
+    def query_point(self, x, y):
+        """Candidates for a small object whose top-left corner is at (x, y)"""
+        return self.cells.get(self.cell_key(x, y), ())
+
+    def query(self, rect):
+        """Objects in the cells rect touches (candidates, still needs a colliderect)"""
+        x0, x1, y0, y1 = self.cell_range(rect)
+        cells = self.cells
+        if x0 == x1 and y0 == y1:
+            # Small things like projectiles almost always sit in one cell
+            return cells.get((x0, y0), ())
+
+        found = []
+        seen = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    for obj in bucket:
+                        if obj not in seen:
+                            seen.add(obj)
+                            found.append(obj)
+        return found
+
+    def query_radius(self, x, y, radius):
+        """Candidates within radius of (x, y), still needs an exact distance test"""
+        return self.query(pygame.Rect(x - radius, y - radius, radius * 2 + 1, radius * 2 + 1))
+
+
+class CellIndex:
+    """Grid over points kept in NumPy arrays (arena CPUs and shots), for radius queries.
+
+    build() sorts the point indices by cell number, row by row, so the
+    cells a query box covers in one grid row are a single run of the
+    sorted keys, found with two binary searches.
+    """
+    def __init__(self, cell_size=SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.columns = 1
+        self.keys = [] # Sorted cell numbers, a list so bisect stays cheap on small queries
+        self.order = np.zeros(0, np.intp)
+
+    def build(self, x, y, world_width):
+        size = self.cell_size
+        self.columns = int(world_width // size) + 1
+        column = np.clip(x // size, 0, self.columns - 1).astype(np.int64)
+        keys = (y // size).astype(np.int64) * self.columns + column
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order].tolist()
+
+    def query(self, left, top, right, bottom):
+        """Indices of the points in the cells the box touches"""
+        size = self.cell_size
+        columns = self.columns
+        x0 = max(0, int(left // size))
+        x1 = min(columns - 1, int(right // size))
+        order = self.order
+        if x0 > x1 or not self.keys:
+            return order[:0]
+        keys = self.keys
+        runs = []
+        for row in range(int(top // size) * columns, int(bottom // size) * columns + 1, columns):
+            start = bisect_left(keys, row + x0)
+            end = bisect_right(keys, row + x1, start)
+            if end > start:
+                runs.append(order[start:end])
+        if not runs:
+            return order[:0]
+        return runs[0] if len(runs) == 1 else np.concatenate(runs)
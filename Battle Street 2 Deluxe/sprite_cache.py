@@ -0,0 +1,41 @@
+from collections import OrderedDict
+from settings import *
+
+class SpriteCache:
+    """LRU cache of pre-rendered surfaces.
+
+    Keys describe everything that affects how a sprite looks (colour, facing,
+    HP state, weapon...), so changing a player's skin or hat simply misses the
+    cache and bakes a new sprite. The old one ages out.
+    """
+    def __init__(self, max_size=SPRITE_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render):
+        """Cached surface for key, calling render() to bake it on a miss"""
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = render()
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def invalidate(self, kind=None):
+        """Drop every sprite, or only those whose key starts with kind"""
+        if kind is None:
+            self.surfaces.clear()
+            return
+        for key in [key for key in self.surfaces if key[0] == kind]:
+            del self.surfaces[key]
+
+
+sprite_cache = SpriteCache()
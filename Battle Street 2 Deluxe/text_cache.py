@@ -0,0 +1,61 @@
+import pygame
+from collections import OrderedDict
+from settings import *
+
+# Fonts are expensive to look up (SysFont scans the system font list), so we
+# keep one Font object per (name, size) for the whole session.
+_fonts = {}
+
+def get_font(size, name=FONT_NAME):
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.SysFont(name, size)
+        _fonts[key] = font
+    return font
+
+
+class TextCache:
+    """LRU cache of rendered text surfaces"""
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, size, color, antialias=True, name=FONT_NAME):
+        key = (text, size, tuple(color), antialias, name)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = get_font(size, name).render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.surfaces),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+# Shared by Game, Player and Button so a label is rasterized only once
+text_cache = TextCache()
+
+def render_text(text, size, color, antialias=True):
+    return text_cache.render(text, size, color, antialias)
@@ -0,0 +1,181 @@
+"""Weapon texture pack: every weapon PNG, pre-scaled, in one raw RGBA atlas.
+
+Build it ahead of time with
+
+    python texture_pack.py
+
+or let the game do it: the index remembers each source PNG's mtime, size
+and hash, so a changed or added image rebuilds the pack on the next launch.
+"""
+import json
+import os
+import threading
+import pygame
+from settings import *
+from file_hash import file_hash
+
+PACK_VERSION = 1
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+WEAPONS_DIR = os.path.join(SCRIPT_DIR, "weapons")
+
+def source_files(weapons_dir=WEAPONS_DIR):
+    """Weapon name -> PNG path, for the images that actually exist"""
+    files = {}
+    for name, filename in WEAPON_FILES.items():
+        path = os.path.join(weapons_dir, filename)
+        if os.path.exists(path):
+            files[name] = path
+    return files
+
+def read_index(index_path):
+    try:
+        with open(index_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def is_fresh(index, weapons_dir=WEAPONS_DIR):
+    """True if the pack described by index still matches the PNGs on disk"""
+    if not index or index.get("version") != PACK_VERSION or index.get("max_width") != WEAPON_MAX_WIDTH:
+        return False
+    files = source_files(weapons_dir)
+    sources = index.get("sources", {})
+    if set(files) != set(sources):
+        return False
+    for name, path in files.items():
+        entry = sources[name]
+        st = os.stat(path)
+        if st.st_size != entry["size"]:
+            return False
+        # Checkouts and copies touch mtimes, only then is the file hashed
+        if st.st_mtime_ns != entry["mtime_ns"] and file_hash(path) != entry["sha1"]:
+            return False
+    return True
+
+def scale_texture(img):
+    # Scale down if too big
+    if img.get_width() > WEAPON_MAX_WIDTH:
+        scale = WEAPON_MAX_WIDTH / img.get_width()
+        img = pygame.transform.scale(img, (int(img.get_width() * scale), int(img.get_height() * scale)))
+    return img
+
+def pack_rects(sizes, width=ATLAS_WIDTH):
+    """Shelf-pack (w, h) sizes into rows, returns the rects and atlas height"""
+    rects = []
+    x = y = shelf = 0
+    for w, h in sizes:
+        if x + w > width:
+            x = 0
+            y += shelf
+            shelf = 0
+        rects.append(pygame.Rect(x, y, w, h))
+        x += w
+        shelf = max(shelf, h)
+    return rects, y + shelf
+
+def build_pack(weapons_dir=WEAPONS_DIR, pack_path=None, index_path=None):
+    """Decode and scale every weapon PNG once and write the atlas + index"""
+    pack_path = pack_path or os.path.join(SCRIPT_DIR, TEXTURE_PACK)
+    index_path = index_path or os.path.join(SCRIPT_DIR, TEXTURE_INDEX)
+
+    images = {}
+    sources = {}
+    for name, path in source_files(weapons_dir).items():
+        try:
+            images[name] = scale_texture(pygame.image.load(path))
+        except Exception as e:
+            print(f"Failed to load {name}: {e}")
+            continue
+        st = os.stat(path)
+        sources[name] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha1": file_hash(path)}
+
+    # Tallest first keeps the shelves tight
+    names = sorted(images, key=lambda n: -images[n].get_height())
+    rects, height = pack_rects([images[n].get_size() for n in names])
+    atlas = pygame.Surface((ATLAS_WIDTH, max(height, 1)), pygame.SRCALPHA)
+    atlas.fill((0, 0, 0, 0))
+    frames = {}
+    for name, rect in zip(names, rects):
+        atlas.blit(images[name], rect)
+        frames[name] = [rect.x, rect.y, rect.width, rect.height]
+
+    index = {
+        "version": PACK_VERSION,
+        "max_width": WEAPON_MAX_WIDTH,
+        "size": list(atlas.get_size()),
+        "sources": sources,
+        "frames": frames,
+    }
+    # Pack first, index last: a pack without a matching index is just rebuilt
+    with open(pack_path, 'wb') as f:
+        f.write(pygame.image.tobytes(atlas, "RGBA"))
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+    return index
+
+def load_pack(index, pack_path=None):
+    """Read the whole atlas in one go, returns name -> texture subsurfaces"""
+    pack_path = pack_path or os.path.join(SCRIPT_DIR, TEXTURE_PACK)
+    with open(pack_path, 'rb') as f:
+        data = f.read()
+    atlas = pygame.image.frombytes(data, tuple(index["size"]), "RGBA")
+    return {name: atlas.subsurface(frame) for name, frame in index["frames"].items()}
+
+def load_textures(weapons_dir=WEAPONS_DIR, pack_path=None, index_path=None):
+    """Textures from the pack, rebuilding it first if the PNGs changed"""
+    pack_path = pack_path or os.path.join(SCRIPT_DIR, TEXTURE_PACK)
+    index_path = index_path or os.path.join(SCRIPT_DIR, TEXTURE_INDEX)
+    index = read_index(index_path)
+    if not is_fresh(index, weapons_dir) or not os.path.exists(pack_path):
+        index = build_pack(weapons_dir, pack_path, index_path)
+    try:
+        return load_pack(index, pack_path)
+    except (OSError, ValueError) as e:
+        print(f"Texture pack unreadable, rebuilding: {e}")
+        return load_pack(build_pack(weapons_dir, pack_path, index_path), pack_path)
+
+
+class TextureLoader:
+    """Loads the weapon textures on a background thread.
+
+    The menu comes up straight away; call poll() once a frame and it returns
+    the textures (once) when they are ready. Until then players are drawn
+    with the plain no-texture weapon.
+    """
+    def __init__(self, **paths):
+        self.paths = paths
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.delivered = False
+        self.thread = threading.Thread(target=self.run, name="TextureLoader", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            self.result = load_textures(**self.paths)
+        except Exception as e:
+            self.error = e
+        self.done.set()
+
+    def poll(self):
+        if self.delivered or not self.done.is_set():
+            return None
+        self.delivered = True
+        if self.error:
+            print(f"Failed to load weapon textures: {self.error}")
+            return {}
+        return self.result
+
+    def wait(self, timeout=None):
+        """Block until loading finished, the textures still come from poll()"""
+        return self.done.wait(timeout)
+
+
+if __name__ == "__main__":
+    index = build_pack()
+    print(f"Packed {len(index['frames'])} weapon textures into {TEXTURE_PACK} "
+          f"({index['size'][0]}x{index['size'][1]})")
@@ -0,0 +1,95 @@
+from settings import *
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS # Per level
+LEVELS = 4 # 64, 4096, 262144 and 16777216 ticks ahead (about 78 hours at 60 ticks/s)
+
+def ms_to_ticks(ms):
+    """Whole ticks covering `ms` milliseconds, at least one"""
+    return max(1, -int(-ms * TICK_RATE // 1000))
+
+
+class Timer:
+    """A scheduled callback. cancel() is O(1), the wheel skips it when its slot comes up."""
+    __slots__ = ("due", "callback", "args")
+
+    def __init__(self, due, callback, args):
+        self.due = due
+        self.callback = callback
+        self.args = args
+
+    @property
+    def active(self):
+        return self.callback is not None
+
+    def cancel(self):
+        self.callback = None
+        self.args = ()
+
+
+class TimerWheel:
+    """Hierarchical timer wheel on the simulation tick.
+
+    Level 0 has a slot per tick for the next 64 ticks, each level above
+    covers 64 times the span of the one below with 64 times coarser
+    slots. When level 0 wraps around, the next slot of level 1 is spread
+    out over it (and level 2 into level 1 when that wraps, and so on).
+    Scheduling and cancelling are O(1); advance() only touches the timers
+    that are due or cascading down, never the ones still waiting.
+    """
+    def __init__(self):
+        self.levels = [[[] for _ in range(SLOTS)] for _ in range(LEVELS)]
+        self.tick = 0
+
+    def clear(self, tick=0):
+        for level in self.levels:
+            for slot in level:
+                slot.clear()
+        self.tick = tick
+
+    def schedule(self, ticks, callback, *args):
+        """Call callback(*args) `ticks` ticks from now (at least 1), returns the Timer"""
+        timer = Timer(self.tick + max(1, int(ticks)), callback, args)
+        self.place(timer)
+        return timer
+
+    def place(self, timer):
+        delta = timer.due - self.tick
+        level = 0
+        while delta >= SLOTS << (SLOT_BITS * level) and level < LEVELS - 1:
+            level += 1
+        # Anything past the top level sits in its furthest slot and is placed again when that comes up
+        due = min(timer.due, self.tick + (SLOTS << (SLOT_BITS * level)) - 1)
+        self.levels[level][(due >> (SLOT_BITS * level)) & (SLOTS - 1)].append(timer)
+
+    def advance(self):
+        """Move on one tick and run the timers due at it"""
+        self.tick += 1
+        tick = self.tick
+        # Cascade from the highest level that wraps at this tick down to level 1
+        level = 0
+        while level < LEVELS - 1 and not (tick >> (SLOT_BITS * level)) & (SLOTS - 1):
+            level += 1
+        for level in range(level, 0, -1):
+            index = (tick >> (SLOT_BITS * level)) & (SLOTS - 1)
+            slot = self.levels[level][index]
+            if slot:
+                self.levels[level][index] = []
+                for timer in slot:
+                    if timer.callback is not None:
+                        self.place(timer)
+
+        index = tick & (SLOTS - 1)
+        slot = self.levels[0][index]
+        if not slot:
+            return
+        self.levels[0][index] = []
+        for timer in slot:
+            callback = timer.callback
+            if callback is not None:
+                timer.callback = None # Fired, a late cancel() is harmless
+                callback(*timer.args)
+
+    def __len__(self):
+        """Timers still pending. Walks every slot, so for stats rather than every tick."""
+        return sum(1 for level in self.levels for slot in level for timer in slot if timer.callback is not None)
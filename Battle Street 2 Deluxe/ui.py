@@ -1,5 +1,6 @@
 import pygame
 from settings import *
+from text_cache import get_font, render_text
 
 class Button:
     def __init__(self, x, y, width, height, text, font_size=32, bg_color=WHITE, text_color=BLACK, hover_color=GRAY):
@@ -9,8 +10,10 @@ class Button:
         self.bg_color = bg_color
         self.text_color = text_color
         self.hover_color = hover_color
-        self.font = pygame.font.SysFont(FONT_NAME, font_size)
+        self.font = get_font(font_size)
         self.is_hovered = False
+        self.key = None # What the button stands for, so clicks don't parse the label
+        self.index = None # Item a ListView row is bound to
 
     def draw(self, screen):
         color = self.hover_color if self.is_hovered else self.bg_color
@@ -21,7 +24,7 @@ class Button:
         # Draw border
         pygame.draw.rect(screen, BLACK, self.rect, 2, border_radius=5)
 
-        text_surface = self.font.render(self.text, True, self.text_color)
+        text_surface = render_text(self.text, self.font_size, self.text_color)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
 
@@ -41,3 +44,73 @@ class Button:
              if self.rect.collidepoint(mouse_pos):
                 return True
         return False
+
+
+class ListView:
+    """Scrollable list that only ever owns enough buttons to fill its area.
+
+    Rows are recycled: scrolling rebinds the same Button objects to other
+    item indices through bind(button, index), which sets the button's text,
+    colour and key. Items are just indices 0..count-1, so the list costs the
+    same with ten entries or ten thousand.
+    """
+    def __init__(self, x, y, width, height, row_height, bind, padding=10, font_size=24):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.row_height = row_height
+        self.stride = row_height + padding
+        self.bind = bind
+        self.count = 0
+        self.scroll = 0
+        # One extra row covers the partly visible ones at both edges
+        self.pool = [Button(x, y, width, row_height, "", font_size=font_size)
+                     for _ in range(height // self.stride + 2)]
+        self.rows = [] # Pool buttons currently bound to an item
+
+    def set_count(self, count):
+        self.count = count
+        self.scroll_to(self.scroll)
+
+    def max_scroll(self):
+        return max(0, self.count * self.stride - self.rect.height)
+
+    def scroll_to(self, scroll):
+        self.scroll = max(0, min(scroll, self.max_scroll()))
+        self.rebind()
+
+    def scroll_by(self, dy):
+        self.scroll_to(self.scroll + dy)
+
+    def rebind(self):
+        """Point the pool at the items under the current scroll position"""
+        first = self.scroll // self.stride
+        self.rows = []
+        for i, btn in enumerate(self.pool):
+            index = first + i
+            y = self.rect.y + index * self.stride - self.scroll
+            if index >= self.count or y >= self.rect.bottom:
+                break
+            btn.rect.y = y
+            btn.index = index
+            self.bind(btn, index)
+            self.rows.append(btn)
+
+    def handle_event(self, event, mouse_pos):
+        """Returns the key of the clicked row, or None"""
+        if not self.rect.collidepoint(mouse_pos):
+            for btn in self.rows:
+                btn.is_hovered = False
+            return None
+        clicked = None
+        for btn in self.rows:
+            btn.check_hover(mouse_pos)
+            if clicked is None and btn.is_clicked_custom(event, mouse_pos):
+                clicked = btn.key
+        return clicked
+
+    def draw(self, screen):
+        # Rows half scrolled out are cut off at the list's edges
+        old_clip = screen.get_clip()
+        screen.set_clip(self.rect.inflate(4, 4).clip(old_clip))
+        for btn in self.rows:
+            btn.draw(screen)
+        screen.set_clip(old_clip)
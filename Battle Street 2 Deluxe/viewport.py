@@ -0,0 +1,80 @@
+import pygame
+from settings import *
+
+SCALE_MODES = ("nearest", "smooth", "integer")
+
+class Viewport:
+    """Letterboxed transform from the WIDTH x HEIGHT game surface to the display.
+
+    Computed once per display mode (call resize() when it changes). The scaled
+    frame goes into a preallocated surface instead of a new one every frame.
+    """
+    def __init__(self, screen_size, mode=SCALE_MODE):
+        if mode not in SCALE_MODES:
+            raise ValueError(f"Unknown scale mode: {mode}")
+        self.mode = mode
+        self.resize(screen_size)
+
+    def resize(self, screen_size):
+        self.screen_w, self.screen_h = screen_size
+        scale = min(self.screen_w / WIDTH, self.screen_h / HEIGHT)
+        if self.mode == "integer" and scale >= 1:
+            scale = int(scale) # Crisp pixels, bigger black bars
+        self.scale = scale
+        self.width = int(WIDTH * scale)
+        self.height = int(HEIGHT * scale)
+
+        # Center on screen
+        self.x = (self.screen_w - self.width) // 2
+        self.y = (self.screen_h - self.height) // 2
+        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+
+        self.integer_scale = float(scale).is_integer()
+        if scale == 1:
+            self.scaled = None # Blit game_surface straight to the screen
+        else:
+            self.scaled = pygame.Surface((self.width, self.height))
+            if pygame.display.get_surface():
+                self.scaled = self.scaled.convert()
+        self.needs_clear = True # Black bars need painting after a mode change
+
+    def set_mode(self, mode):
+        if mode not in SCALE_MODES:
+            raise ValueError(f"Unknown scale mode: {mode}")
+        self.mode = mode
+        self.resize((self.screen_w, self.screen_h))
+
+    def to_game(self, pos):
+        """Screen (mouse) position to game-space position"""
+        return ((pos[0] - self.x) / self.scale, (pos[1] - self.y) / self.scale)
+
+    def to_screen_rect(self, rect):
+        scale = self.scale
+        return pygame.Rect(self.x + rect.x * scale, self.y + rect.y * scale, rect.width * scale, rect.height * scale)
+
+    def present(self, screen, surface):
+        """Scale the whole game surface onto the screen"""
+        if self.needs_clear:
+            screen.fill(BLACK) # Fill black bars
+            self.needs_clear = False
+
+        if self.scaled is None:
+            screen.blit(surface, self.rect)
+            return
+        if self.mode == "smooth":
+            pygame.transform.smoothscale(surface, (self.width, self.height), self.scaled)
+        else:
+            pygame.transform.scale(surface, (self.width, self.height), self.scaled)
+        screen.blit(self.scaled, self.rect)
+
+    def present_rect(self, screen, surface, rect):
+        """Copy one game-space rect to the screen, only valid at integer scales"""
+        dest = self.to_screen_rect(rect)
+        if self.scaled is None:
+            screen.blit(surface, dest, rect)
+        else:
+            # Scale into the matching area of the preallocated frame, no new surface
+            local = dest.move(-self.x, -self.y)
+            pygame.transform.scale(surface.subsurface(rect), dest.size, self.scaled.subsurface(local))
+            screen.blit(self.scaled, dest, local)
+        return dest
@@ -0,0 +1,57 @@
+from settings import *
+
+class Weapon:
+    """One WEAPONS_DATA entry compiled into plain attributes"""
+    __slots__ = ("id", "name", "damage", "cost", "speed", "color", "explosion", "melee", "range", "gravity",
+                 "blast_radius")
+
+    def __init__(self, weapon_id, name, data):
+        self.id = weapon_id
+        self.name = name
+        self.damage = data['damage']
+        self.cost = data['cost']
+        self.speed = data['speed']
+        self.color = data['color']
+        self.explosion = data.get('explosion', False)
+        self.melee = data.get('melee', False)
+        self.range = data.get('range', 200)
+        self.gravity = 0.5 if self.explosion else 0 # Grenades and rockets arc down
+        self.blast_radius = data.get('radius', BLAST_RADIUS) if self.explosion else 0
+
+
+class WeaponTable:
+    """WEAPONS_DATA as a dense list of Weapon records indexed by weapon id.
+
+    Ids follow catalog order. Weapons added to WEAPONS_DATA after startup
+    (mods) get the next free id the first time they are looked up.
+    """
+    def __init__(self):
+        self.weapons = []
+        self.ids = {}
+        for name in WEAPONS_DATA:
+            self.add(name)
+
+    def add(self, name):
+        weapon_id = len(self.weapons)
+        self.weapons.append(Weapon(weapon_id, name, WEAPONS_DATA[name]))
+        self.ids[name] = weapon_id
+        return weapon_id
+
+    def id_of(self, name):
+        weapon_id = self.ids.get(name)
+        if weapon_id is None:
+            weapon_id = self.add(name) # KeyError for names that aren't weapons at all
+        return weapon_id
+
+    def get(self, name):
+        return self.weapons[self.id_of(name)]
+
+    def __getitem__(self, weapon_id):
+        return self.weapons[weapon_id]
+
+    def __len__(self):
+        return len(self.weapons)
+
+
+weapon_table = WeaponTable()
+FIST_ID = weapon_table.id_of("Fist")
@@ -0,0 +1,68 @@
+"""Ticks per second for arena battles with hundreds of CPUs.
+
+    python benchmarks/bench_arena.py
+
+"objects" is the regular Simulation with one Player object per CPU, "arena"
+is ArenaSimulation with the CPUs in NumPy arrays. Nobody can die here (the
+player and every CPU get a huge hp), so every run is TICKS ticks with all
+its CPUs in play; a run that ends early or loses a CPU fails. The arena
+target is 60 ticks/sec with 500 CPUs.
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+from settings import *
+from player import Player
+from simulation import Simulation
+from arena import ArenaSimulation
+
+CPU_COUNTS = [100, 500, 1000]
+TICKS = 600
+TARGET_CPUS = 500
+TARGET_TICKS_PER_SEC = 60
+
+def run(sim_class, num_cpus):
+    player = Player("Bench")
+    # Explosive ranged weapons, so the CPUs fill the air with shots
+    player.inventory.append("Mega Rocket")
+    player.equip_weapon("Mega Rocket")
+    sim = sim_class(player, seed=7, effects=True)
+    sim.start(num_cpus, seed=7)
+    player.hp = player.max_hp = 10 ** 9
+    # Nobody dies, so every run times a full arena for all of TICKS
+    if sim_class is ArenaSimulation:
+        sim.hp[:] = 10 ** 9
+    else:
+        for cpu in sim.battle_cpus:
+            cpu.hp = cpu.max_hp = 10 ** 9
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        sim.step()
+        if sim.result:
+            break
+    elapsed = time.perf_counter() - start
+    return sim.tick_count / elapsed, sim
+
+def main():
+    print(f"{'cpus':>6} {'objects t/s':>12} {'arena t/s':>10} {'left':>6} {'shots':>6}")
+    ok = True
+    for num_cpus in CPU_COUNTS:
+        objects, object_sim = run(Simulation, num_cpus)
+        arena, sim = run(ArenaSimulation, num_cpus)
+        print(f"{num_cpus:>6} {objects:>12.0f} {arena:>10.0f} {sim.cpu_count:>6} {sim.projectile_count:>6}")
+        for label, done in (("objects", object_sim), ("arena", sim)):
+            if done.cpu_count != num_cpus or done.tick_count != TICKS:
+                print(f"FAIL: {label} run with {num_cpus} CPUs ended after {done.tick_count} ticks"
+                      f" with {done.cpu_count} CPUs left")
+                ok = False
+        if num_cpus == TARGET_CPUS and arena < TARGET_TICKS_PER_SEC:
+            print(f"FAIL: under {TARGET_TICKS_PER_SEC} ticks/sec with {TARGET_CPUS} CPUs")
+            ok = False
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
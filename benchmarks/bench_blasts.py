@@ -0,0 +1,172 @@
+"""Cost of a tick where BLASTS explosives go off among fighters, radius queries vs scanning.
+
+    python benchmarks/bench_blasts.py
+
+Half the grenades sit on a fighter (direct hits) and the rest hang in the
+air around them, so most blasts set off more. "battle" is Simulation with
+ENTITIES Player CPUs, "arena" is ArenaSimulation with its CPUs in arrays,
+with ENTITIES and with ARENA_MAX_CPUS of them on Street, and spread over a
+SCREENS screens wide map. The "scan" rows swap the spatial indexes for
+ones that return everything, the way the blasts would have to check every
+fighter and projectile without them (for the arena, masking the whole
+arrays with no CellIndex sort at all); both must leave every fighter with
+the same hp. Times are the median of REPEATS runs of the blast tick
+(update_projectiles, including the batched shockwave particles).
+
+The arena's CellIndex only pays for its sort once there are enough CPUs
+per blast to skip: with ENTITIES on one screen the scan is about as fast,
+at ARENA_MAX_CPUS or on the wide map the index wins.
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+import numpy as np
+from settings import *
+import map_loader
+from player import Player
+from simulation import Simulation
+from arena import ArenaSimulation, CPU_WIDTH, CPU_HEIGHT
+from game_objects import projectile_pool
+from particles import ParticlePool
+from spatial_hash import SpatialHash, CellIndex
+from weapons import weapon_table
+
+ENTITIES = 200
+BLASTS = 50
+REPEATS = 75
+SCREENS = 10
+GRENADE = weapon_table.id_of("Cartoon Grenade")
+
+class ScanHash(SpatialHash):
+    """Every radius query returns everything inserted"""
+    def clear(self):
+        super().clear()
+        self.everything = []
+
+    def insert(self, obj, rect):
+        super().insert(obj, rect)
+        self.everything.append(obj)
+
+    def query_radius(self, x, y, radius):
+        return self.everything
+
+
+class ScanIndex(CellIndex):
+    """Every query returns every point, without sorting them first"""
+    def build(self, x, y, world_width):
+        self.order = np.arange(len(x))
+
+    def query(self, left, top, right, bottom):
+        return self.order
+
+
+def write_wide_map(path, screens=SCREENS):
+    """Just ground, the fighters hang in the air anyway"""
+    width = WIDTH * screens
+    with open(path, 'w') as f:
+        json.dump({"width": width, "height": HEIGHT,
+                   "platforms": [{"x": 0, "y": HEIGHT - 50, "width": width, "height": 50}]}, f)
+
+def fighter_spots(sim, rng, count):
+    return [(rng.uniform(0, sim.world_width - CPU_WIDTH), rng.uniform(150, sim.world_height - CPU_HEIGHT - 50))
+            for _ in range(count)]
+
+def grenades(sim, spots, rng):
+    """BLASTS player grenades, standing still: every other one on a fighter, the rest near one"""
+    shots = []
+    for i in range(BLASTS):
+        x, y = spots[rng.randrange(len(spots))]
+        if i % 2:
+            x += rng.uniform(-120, 120)
+            y += rng.uniform(-120, 0)
+        else:
+            x += 15
+            y += 20
+        p = projectile_pool.acquire(x, y, 0, 0, GRENADE, sim.player)
+        p.gravity = 0
+        shots.append(p)
+    return shots
+
+def battle(scan, count, map_name):
+    rng = random.Random(1)
+    sim = Simulation(Player("Bench"), seed=1, particles=ParticlePool(seed=1))
+    sim.load_map(map_name)
+    sim.start(0, seed=1)
+    spots = fighter_spots(sim, rng, count)
+    for x, y in spots:
+        cpu = Player("CPU", is_cpu=True)
+        cpu.rect.topleft = (x, y)
+        cpu.hp = cpu.max_hp = 10 ** 6 # Nobody dies, so every run sees the same crowd
+        sim.battle_cpus.append(cpu)
+    sim.projectiles = grenades(sim, spots, rng)
+    if scan:
+        sim.fighter_grid = ScanHash(pad=PROJECTILE_SIZE)
+        sim.blast_grid = ScanHash(pad=PROJECTILE_SIZE)
+    start = time.perf_counter()
+    sim.update_projectiles()
+    elapsed = time.perf_counter() - start
+    return elapsed, sim, [cpu.hp for cpu in sim.battle_cpus]
+
+def arena(scan, count, map_name):
+    rng = random.Random(1)
+    sim = ArenaSimulation(Player("Bench"), seed=1, particles=ParticlePool(seed=1))
+    sim.load_map(map_name)
+    sim.start(count, seed=1)
+    spots = fighter_spots(sim, rng, count)
+    sim.x[:] = [x for x, _ in spots]
+    sim.y[:] = [y for _, y in spots]
+    sim.hp[:] = 10 ** 6
+    sim.projectiles = grenades(sim, spots, rng)
+    if scan:
+        sim.blast_grid = ScanHash(pad=PROJECTILE_SIZE)
+        sim.cpu_index = ScanIndex()
+        sim.shot_index = ScanIndex()
+    start = time.perf_counter()
+    sim.update_projectiles()
+    elapsed = time.perf_counter() - start
+    return elapsed, sim, sim.hp.tolist()
+
+def measure(setup, scan, count, map_name):
+    times = []
+    for _ in range(REPEATS):
+        elapsed, sim, hp = setup(scan, count, map_name)
+        times.append(elapsed)
+    return statistics.median(times) * 1000, sim, hp
+
+def main():
+    scratch = tempfile.mkdtemp(prefix="bs2_blasts_")
+    map_loader.MAP_CACHE_DIR = os.path.join(scratch, "compiled")
+    path = os.path.join(scratch, "wide.json")
+    write_wide_map(path)
+    MAPS["Wide"] = dict(MAPS["Street"], file=path, name=f"{SCREENS} Screens")
+
+    print(f"{BLASTS} grenades, median of {REPEATS} blast ticks")
+    print("                   fighters  map      ms/tick   blasts   fighters hit   particles")
+    ok = True
+    cases = (("battle", battle, ENTITIES, "Street"), ("arena", arena, ENTITIES, "Street"),
+             ("arena", arena, ARENA_MAX_CPUS, "Street"), ("arena", arena, ARENA_MAX_CPUS, "Wide"))
+    for name, setup, count, map_name in cases:
+        results = {}
+        for scan in (False, True):
+            ms, sim, hp = measure(setup, scan, count, map_name)
+            results[scan] = hp
+            blasts = sim.particles.count // SHOCKWAVE_PARTICLES
+            hit = sum(1 for value in hp if value < 10 ** 6)
+            label = f"{name} {'scan' if scan else 'index'}"
+            print(f"{label:<18} {count:8}  {map_name:<7} {ms:8.3f} {blasts:8} {hit:14} {sim.particles.count:11}")
+        if not np.allclose(results[False], results[True]):
+            print(f"FAIL: {name} blasts among {count} fighters on {map_name} hurt different fighters"
+                  " with and without the index")
+            ok = False
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Memory per projectile and per-tick cost, dict-backed entities vs slotted + pooled.
+
+    python benchmarks/bench_entities.py
+
+"before" is a copy of the old Projectile: an instance __dict__, a reference
+to the weapon's WEAPONS_DATA dict, and a new object for every shot.
+"after" is the current Projectile with __slots__ and a weapon id, handed out
+by projectile_pool, expiring through a TimerWheel. Memory is measured with tracemalloc over COUNT live
+projectiles. The tick test fires SHOTS_PER_TICK shots a tick, moves every
+live shot and applies its damage, like Simulation.update_projectiles
+without the collision part.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+import pygame
+from settings import *
+from game_objects import Projectile, ProjectilePool
+from player import Player
+from weapons import weapon_table
+from timers import TimerWheel
+
+COUNT = 10000
+TICKS = 600
+SHOTS_PER_TICK = 40
+
+class DictProjectile:
+    """Projectile as it was before weapon ids and __slots__"""
+    def __init__(self, x, y, vx, vy, weapon_name, owner):
+        self.x = x
+        self.y = y
+        self.vx = vx
+        self.vy = vy
+        self.weapon_name = weapon_name
+        self.data = WEAPONS_DATA[weapon_name]
+        self.owner = owner
+        self.radius = 5
+        self.color = self.data['color']
+        self.rect = pygame.Rect(x, y, PROJECTILE_SIZE, PROJECTILE_SIZE)
+        self.prev_x = x
+        self.prev_y = y
+        self.life = 100
+        self.gravity = 0.5 if self.data.get('explosion') else 0
+
+    def update(self, world_width=WIDTH, world_height=HEIGHT):
+        self.prev_x = self.x
+        self.prev_y = self.y
+        self.x += self.vx
+        self.y += self.vy
+        self.vy += self.gravity
+        self.rect.x = self.x
+        self.rect.y = self.y
+        self.life -= 1
+        if self.y > world_height or self.x < 0 or self.x > world_width:
+            self.life = 0
+        return self.life > 0
+
+
+def bytes_per_projectile(make):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    live = [make(i) for i in range(COUNT)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del live
+    return used / COUNT
+
+def run_ticks(fire, expire, damage_of, advance=None):
+    target = Player("Target")
+    target.hp = target.max_hp = 10 ** 9
+    live = []
+    start = time.perf_counter()
+    for tick in range(TICKS):
+        for i in range(SHOTS_PER_TICK):
+            live.append(fire(i))
+        alive = []
+        for p in live:
+            if p.update():
+                alive.append(p)
+                if tick % 10 == 0:
+                    target.take_damage(damage_of(p))
+            else:
+                expire(p)
+        live = alive
+        if advance:
+            advance()
+    return (time.perf_counter() - start) / TICKS * 1000
+
+def main():
+    owner = Player("Owner")
+    name = "Mega Rocket"
+    weapon_id = weapon_table.id_of(name)
+    # Shots spread over the screen so some leave it early and some run out of life
+    def spot(i):
+        return 20 + (i * 37) % (WIDTH - 40), 20 + (i * 53) % (HEIGHT - 100), (i % 7) - 3
+
+    def old_shot(i):
+        x, y, vx = spot(i)
+        return DictProjectile(x, y, vx, -2, name, owner)
+
+    pool = ProjectilePool()
+    wheel = TimerWheel()
+    def new_shot(i):
+        x, y, vx = spot(i)
+        p = pool.acquire(x, y, vx, -2, weapon_id, owner)
+        p.expiry = wheel.schedule(PROJECTILE_LIFE - 1, p.expire)
+        return p
+
+    old_bytes = bytes_per_projectile(old_shot)
+    new_bytes = bytes_per_projectile(lambda i: Projectile(*spot(i), -2, weapon_id, owner))
+    old_ms = min(run_ticks(old_shot, lambda p: None, lambda p: p.data['damage']) for _ in range(3))
+    new_ms = min(run_ticks(new_shot, pool.release, lambda p: p.damage, wheel.advance) for _ in range(3))
+
+    print(f"{'':>10}{'bytes/projectile':>18}{'ms/tick':>10}")
+    print(f"{'before':>10}{old_bytes:>18.0f}{old_ms:>10.3f}")
+    print(f"{'after':>10}{new_bytes:>18.0f}{new_ms:>10.3f}")
+    print(f"{'':>10}{old_bytes / new_bytes:>17.1f}x{old_ms / new_ms:>9.2f}x")
+    print(f"{len(pool.free)} projectiles waiting in the pool, {SHOTS_PER_TICK * TICKS} shots fired per run")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Map loading and platform landing on a generated 5,000 platform map.
+
+    python benchmarks/bench_maps.py
+
+Writes the test map to a scratch dir and registers it in MAPS as "Stress".
+"compile" parses the JSON and builds the landing index, "cached" reads the
+compiled map from maps/compiled/ (here, the scratch dir). "scan" is the old
+landing check, Platform.check_collision against every platform, and
+"index" is CollisionIndex.landing. The last rows are whole battle frames
+(tick + draw) on the stock Street map and the stress map. A regular 4 CPU
+battle on the stress map has to stay under the 60 FPS frame budget; the
+100 CPU arena rows show what the map adds on top of drawing the crowd.
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+import pygame
+from settings import *
+import map_loader
+from player import Player
+
+PLATFORMS = 5000
+LANDING_ENTITIES = 100
+LANDING_TICKS = 300
+FRAMES = 600
+FRAME_BUDGET_MS = 1000 / FPS
+
+def write_stress_map(path, count=PLATFORMS, seed=1):
+    rng = random.Random(seed)
+    platforms = [{"x": 0, "y": HEIGHT - 50, "width": WIDTH, "height": 50}]
+    while len(platforms) < count:
+        width = rng.randint(20, 80)
+        platforms.append({"x": rng.randint(0, WIDTH - width), "y": rng.randint(80, HEIGHT - 70),
+                          "width": width, "height": rng.randint(6, 16)})
+    with open(path, 'w') as f:
+        json.dump({"platforms": platforms}, f)
+
+def time_loads(repeats=5):
+    compile_ms = []
+    cached_ms = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        map_loader.compile_map("Stress")
+        compile_ms.append((time.perf_counter() - start) * 1000)
+        path = map_loader.map_path("Stress")
+        start = time.perf_counter()
+        assert map_loader.read_cache(map_loader.cache_path("Stress"), path, "Stress")
+        cached_ms.append((time.perf_counter() - start) * 1000)
+    return min(compile_ms), min(cached_ms)
+
+def time_landing(level):
+    rng = random.Random(2)
+    entities = []
+    for _ in range(LANDING_ENTITIES):
+        p = Player(is_cpu=True, rng=rng)
+        p.rect.topleft = (rng.randint(0, WIDTH - 40), rng.randint(0, HEIGHT - 60))
+        p.vel_y = rng.uniform(0.5, 12)
+        entities.append(p)
+
+    def scan():
+        landed = 0
+        for e in entities:
+            for platform in level.platforms:
+                if platform.check_collision(e, e.vel_y):
+                    landed += 1
+        return landed
+
+    def index():
+        landed = 0
+        landing = level.collision.landing
+        for e in entities:
+            rect = e.rect
+            if landing(rect.left, rect.right, rect.bottom, e.vel_y):
+                landed += 1
+        return landed
+
+    results = []
+    for check, ticks in ((scan, 3), (index, LANDING_TICKS)):
+        start = time.perf_counter()
+        for _ in range(ticks):
+            check()
+        results.append((time.perf_counter() - start) / ticks * 1000)
+    return results
+
+def time_frames(game, map_name, num_cpus):
+    game.load_map(map_name)
+    game.start_battle(num_cpus)
+    samples = []
+    for i in range(FRAMES):
+        start = time.perf_counter()
+        game.step()
+        game.draw(0.5)
+        samples.append((time.perf_counter() - start) * 1000)
+        if game.state != "BATTLE":
+            game.start_battle(num_cpus)
+    while game.state != "MENU":
+        game.pop_scene()
+    samples.sort()
+    return statistics.mean(samples), samples[int(len(samples) * 0.95)]
+
+def main():
+    scratch = tempfile.mkdtemp(prefix="bs2_maps_")
+    map_loader.MAP_CACHE_DIR = os.path.join(scratch, "compiled")
+    path = os.path.join(scratch, "stress.json")
+    write_stress_map(path)
+    MAPS["Stress"] = dict(MAPS["Street"], file=path, name="5,000 Platforms")
+
+    compile_ms, cached_ms = time_loads()
+    level = map_loader.load_level("Stress")
+    scan_ms, index_ms = time_landing(level)
+    print(f"{len(level.platforms)} platforms, {len(level.collision.columns)} index columns")
+    print(f"load:    compile {compile_ms:8.2f} ms   cached {cached_ms:8.2f} ms")
+    print(f"landing for {LANDING_ENTITIES} entities:  scan {scan_ms:8.3f} ms/tick   index {index_ms:8.3f} ms/tick"
+          f"   ({scan_ms / index_ms:.0f}x)")
+
+    os.chdir(scratch) # Keep the save file out of the way
+    from main import Game
+    game = Game()
+    game.player.username = "Bench"
+    while game.state != "MENU":
+        game.pop_scene()
+    ok = True
+    print(f"battle frames (budget {FRAME_BUDGET_MS:.1f} ms):")
+    for num_cpus in (4, 100):
+        for map_name in ("Street", "Stress"):
+            mean_ms, p95_ms = time_frames(game, map_name, num_cpus)
+            print(f"  {map_name:<7} {num_cpus:>3} CPUs:  mean {mean_ms:6.2f} ms   p95 {p95_ms:6.2f} ms")
+            if map_name == "Stress" and num_cpus == 4:
+                ok = p95_ms < FRAME_BUDGET_MS
+    game.load_map("Street")
+    if not ok:
+        print("FAIL: over the frame budget on the stress map")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
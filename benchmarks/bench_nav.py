@@ -0,0 +1,197 @@
+"""CPU navigation: building the nav graph and following it with 100 CPUs.
+
+    python benchmarks/bench_nav.py
+
+Generates a map SCREENS screens wide with ledges stacked up to four high
+in a scratch dir and registers it in MAPS as "Ledges". "build" times
+NavGraph for every map. "battle" runs CPUS Player CPUs after a player who
+is moved to a random ledge every MOVE_EVERY ticks, timing
+Simulation.route (node lookups, cached A* and repaths) per tick, and
+counts the CPUs standing on the player's ledge at each move. "arena" does
+the same with ARENA_CPUS arena CPUs and ArenaSimulation.follow_routes.
+The battle's path queries have to fit in 1 ms per tick. "replay" records
+a REPLAY_CPUS arena match with random inputs and plays it back in a fresh
+process (nothing cached) and twice in this one, after the runs above;
+all three have to end the same way.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+from settings import *
+import map_loader
+from map_loader import load_level
+from nav import NavGraph
+from player import Player
+from simulation import Simulation, PlayerInput
+from arena import ArenaSimulation
+from replay import ReplayRecorder, Replay, play_headless
+
+SCREENS = 10
+CPUS = 100
+ARENA_CPUS = 1000
+TICKS = 3600
+MOVE_EVERY = 600
+BUDGET_MS = 1.0
+REPLAY_CPUS = 200
+REPLAY_TICKS = 600
+
+def write_ledges_map(path, screens=SCREENS, seed=1):
+    """Ground, then rows of ledges 100 px apart, each row offset from the one below"""
+    rng = random.Random(seed)
+    width = WIDTH * screens
+    platforms = [{"x": 0, "y": HEIGHT - 50, "width": width, "height": 50}]
+    for row in range(1, 5):
+        x = rng.randint(0, 200) + row * 60
+        while x < width - 300:
+            platforms.append({"x": x, "y": HEIGHT - 50 - row * 100, "width": rng.randint(140, 260), "height": 20})
+            x += rng.randint(320, 480)
+    with open(path, 'w') as f:
+        json.dump({"width": width, "height": HEIGHT, "platforms": platforms}, f)
+
+
+class TimedSimulation(Simulation):
+    route_time = 0.0
+
+    def route(self, cpu, target):
+        start = time.perf_counter()
+        edge = super().route(cpu, target)
+        self.route_time += time.perf_counter() - start
+        return edge
+
+
+class TimedArena(ArenaSimulation):
+    route_time = 0.0
+
+    def follow_routes(self):
+        start = time.perf_counter()
+        super().follow_routes()
+        self.route_time += time.perf_counter() - start
+
+
+def build_times():
+    rows = []
+    for name in MAPS:
+        level = load_level(name)
+        start = time.perf_counter()
+        nav = NavGraph(level)
+        rows.append((name, len(level.platforms), nav.edge_count, (time.perf_counter() - start) * 1000))
+    return rows
+
+def chase(sim_class, count):
+    rng = random.Random(2)
+    player = Player("Bench")
+    sim = sim_class(player, seed=2, effects=False)
+    sim.load_map("Ledges")
+    sim.start(count, seed=2)
+    if sim_class is TimedSimulation:
+        # Spread along the map like an arena, instead of lined up by the spawn
+        for cpu in sim.battle_cpus:
+            cpu.rect.x = rng.randrange(sim.world_width - cpu.rect.width)
+            cpu.save_position()
+    player.hp = player.max_hp = 10 ** 9
+    ledges = sim.platforms[1:]
+    samples = []
+    arrived = []
+    spot = None
+    for tick in range(TICKS):
+        if tick % MOVE_EVERY == 0:
+            if spot:
+                arrived.append(on_ledge(sim, spot))
+            plat = rng.choice(ledges)
+            spot = (plat.x + plat.width // 2, plat.y)
+        player.rect.midbottom = spot # Pinned, knockback would make the goal wander
+        player.on_ground = True
+        if sim_class is TimedSimulation:
+            for cpu in sim.battle_cpus:
+                cpu.hp = cpu.max_hp
+        else:
+            sim.hp[:] = ARENA_CPU_HP
+        sim.route_time = 0.0
+        sim.step(PlayerInput())
+        samples.append(sim.route_time * 1000)
+    arrived.append(on_ledge(sim, spot))
+    samples.sort()
+    return statistics.mean(samples), samples[int(len(samples) * 0.99)], samples[-1], arrived, sim.routes
+
+def on_ledge(sim, spot):
+    if isinstance(sim, ArenaSimulation):
+        return int(((sim.y + 60).round() == spot[1]).sum())
+    return sum(1 for cpu in sim.battle_cpus if cpu.rect.bottom == spot[1])
+
+def record_match():
+    """A REPLAY_CPUS arena match on Ledges, the player pressing random keys"""
+    rng = random.Random(3)
+    recorder = ReplayRecorder(3, REPLAY_CPUS, Player("Bench").current_weapon_name, "Ledges")
+    sim = Replay(3, REPLAY_CPUS, recorder.weapon, "Ledges", []).make_simulation()
+    player_input = PlayerInput()
+    for tick in range(REPLAY_TICKS):
+        if tick % 15 == 0:
+            player_input = PlayerInput(left=rng.random() < 0.3, right=rng.random() < 0.4,
+                                       jump=rng.random() < 0.3, attack=rng.random() < 0.5)
+        recorder.record(player_input)
+        sim.step(player_input)
+        if sim.result:
+            break
+    return recorder.to_bytes()
+
+def outcome(data):
+    """How a replay ends: ticks, result, the player and a hash of every CPU"""
+    sim = play_headless(Replay.from_bytes(data))
+    cpus = hashlib.sha1(b"".join(array.tobytes() for array in (sim.x, sim.y, sim.hp))).hexdigest()[:12]
+    return sim.tick_count, sim.result, tuple(sim.player.rect.topleft), sim.player.hp, cpus
+
+def cold_outcome(scratch, data):
+    """outcome() in a process that has never routed a CPU on Ledges"""
+    use_ledges(scratch)
+    return outcome(data)
+
+def use_ledges(scratch):
+    map_loader.MAP_CACHE_DIR = os.path.join(scratch, "compiled")
+    path = os.path.join(scratch, "ledges.json")
+    if not os.path.exists(path):
+        write_ledges_map(path)
+    MAPS["Ledges"] = dict(MAPS["Street"], file=path, name="Ledges")
+
+def main():
+    scratch = tempfile.mkdtemp(prefix="bs2_nav_")
+    use_ledges(scratch)
+
+    print("build        platforms   edges      ms")
+    for name, platforms, edges, ms in build_times():
+        print(f"{name:<12} {platforms:9} {edges:7} {ms:7.1f}")
+
+    ok = True
+    print(f"{TICKS} ticks, player moved to a random ledge every {MOVE_EVERY}")
+    print("             cpus   mean ms   p99 ms   max ms   on the player's ledge at each move")
+    for label, sim_class, count in (("battle", TimedSimulation, CPUS), ("arena", TimedArena, ARENA_CPUS)):
+        mean, p99, worst, arrived, routes = chase(sim_class, count)
+        print(f"{label:<12} {count:5} {mean:9.3f} {p99:8.3f} {worst:8.3f}   {arrived}")
+        if label == "battle" and p99 > BUDGET_MS:
+            print(f"FAIL: path queries for {CPUS} CPUs took over {BUDGET_MS} ms a tick")
+            ok = False
+    print(f"{len(routes.paths)} (from, to) paths cached")
+
+    data = record_match()
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        cold = pool.apply(cold_outcome, (scratch, data))
+    warm = [outcome(data) for _ in range(2)]
+    print(f"replay {REPLAY_CPUS:11} cpus, cold process: {cold}")
+    for run in warm:
+        print(f"{'':18} warm process: {run}")
+    if any(run != cold for run in warm):
+        print("FAIL: the replay played out differently once this process had routed CPUs on the map")
+        ok = False
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
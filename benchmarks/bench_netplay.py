@@ -0,0 +1,127 @@
+"""Loopback battle server with bot clients.
+
+    python benchmarks/bench_netplay.py [--bots 32] [--seconds 10]
+
+Starts server.py on a free localhost port and joins it with bots (one
+NetClient each, all in this process) that wander, jump and attack at
+random. Reported per client: snapshot bytes per server tick down, input
+bytes per tick up, the average snapshot next to what the same world would
+cost as a full (non-delta) snapshot, and tick latency: the time from
+sending an input to getting the first snapshot that has it applied.
+Rows for a few player counts up to --bots. Fails if a bot never got a
+snapshot.
+"""
+import argparse
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+GAME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe")
+sys.path.insert(0, GAME_DIR)
+
+from settings import *
+from simulation import PlayerInput
+from net_client import NetClient
+from net_protocol import EMPTY_STATE, SNAPSHOT, encode_body
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class Bot:
+    def __init__(self, client, rng):
+        self.client = client
+        self.rng = rng
+        self.mask = 0
+        self.hold = 0
+
+    def next_input(self):
+        rng = self.rng
+        if self.hold <= 0:
+            self.hold = rng.randint(10, 60)
+            self.mask = rng.choice((0, 1, 2, 1, 2, 5, 6)) # Stand, walk, walk and jump
+        self.hold -= 1
+        return PlayerInput.from_mask(self.mask | (8 if rng.random() < 0.1 else 0))
+
+def server_tick(bots):
+    return max((bot.client.latest.tick for bot in bots if bot.client.latest), default=0)
+
+def run(players, seconds):
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "server.py", "--port", str(port), "--max-players", str(players), "--quiet"],
+                              cwd=GAME_DIR, stdout=subprocess.DEVNULL)
+    bots = []
+    try:
+        rng = random.Random(players)
+        for i in range(players):
+            weapon = rng.choice(("Fist", "Water Gun", "Splat Bomb", "Laser Pistol")) if i % 2 else "Fist"
+            client = NetClient("127.0.0.1", port, f"Bot {i + 1}", weapon).join(timeout=10)
+            bots.append(Bot(client, random.Random(i)))
+
+        # Let everyone settle in, then count from zero
+        for bot in bots:
+            bot.client.latencies = []
+            bot.client.bytes_in = bot.client.bytes_out = bot.client.snapshots = 0
+        first_tick = server_tick(bots)
+
+        tick_s = TICK_MS / 1000
+        start = next_tick = time.perf_counter()
+        full_sizes = []
+        while time.perf_counter() - start < seconds:
+            for bot in bots:
+                bot.client.tick(bot.next_input())
+            # Sample what a full snapshot of the same world would have cost
+            latest = bots[0].client.latest
+            if latest and (not full_sizes or latest.tick != full_sizes[-1][0]):
+                full_sizes.append((latest.tick, SNAPSHOT.size + len(encode_body(latest, EMPTY_STATE))))
+            next_tick += tick_s
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        last_tick = server_tick(bots)
+    finally:
+        for bot in bots:
+            bot.client.close()
+        server.terminate()
+        server.wait()
+
+    ticks = max(1, last_tick - first_tick)
+    latencies = sorted(ms for bot in bots for ms in bot.client.latencies)
+    snapshots = sum(bot.client.snapshots for bot in bots)
+    return {
+        "players": players,
+        "down": sum(bot.client.bytes_in for bot in bots) / len(bots) / ticks,
+        "up": sum(bot.client.bytes_out for bot in bots) / len(bots) / ticks,
+        "snapshot": sum(bot.client.bytes_in for bot in bots) / max(1, snapshots),
+        "full": statistics.mean(size for _, size in full_sizes) if full_sizes else 0,
+        "p50": latencies[len(latencies) // 2] if latencies else float("nan"),
+        "p95": latencies[int(len(latencies) * 0.95)] if latencies else float("nan"),
+        "starved": sum(1 for bot in bots if not bot.client.snapshots),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bots", type=int, default=NET_MAX_PLAYERS)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{TICK_RATE} ticks/s, a snapshot every {NET_SNAPSHOT_INTERVAL} ticks, {args.seconds:.0f}s per row")
+    print("players   down B/tick   up B/tick   snapshot B   full B   latency p50 ms   p95 ms")
+    ok = True
+    for players in sorted({2, 8, args.bots}):
+        r = run(players, args.seconds)
+        print(f"{r['players']:>7} {r['down']:>13.1f} {r['up']:>11.1f} {r['snapshot']:>12.1f} {r['full']:>8.1f}"
+              f" {r['p50']:>16.1f} {r['p95']:>8.1f}")
+        if r["starved"]:
+            print(f"FAIL: {r['starved']} bots never got a snapshot")
+            ok = False
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
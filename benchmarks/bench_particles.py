@@ -0,0 +1,91 @@
+"""Particles per second for explosion effects.
+
+    python benchmarks/bench_particles.py
+
+Compares the NumPy particle pool behind ExplosionParticle with the old
+implementation that kept 15 dicts per burst.
+"""
+import math
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+import pygame
+from settings import *
+from particles import ParticlePool
+
+BURSTS_PER_TICK = [2, 10, 40]
+TICKS = 300
+
+class DictBurst:
+    # The pre-pool ExplosionParticle, kept here for comparison
+    def __init__(self, x, y, color):
+        self.base_color = color
+        self.particles = []
+        for i in range(15):
+            angle = (i / 15) * 2 * math.pi
+            speed = random.uniform(2, 5)
+            self.particles.append({'x': x, 'y': y, 'vx': math.cos(angle) * speed, 'vy': math.sin(angle) * speed,
+                                   'size': random.randint(3, 8), 'life': random.randint(20, 40), 'max_life': 40})
+
+    def update(self):
+        for particle in self.particles[:]:
+            particle['x'] += particle['vx']
+            particle['y'] += particle['vy']
+            particle['life'] -= 1
+            if particle['life'] <= 0:
+                self.particles.remove(particle)
+        return len(self.particles) > 0
+
+    def draw(self, screen):
+        for particle in self.particles:
+            life_ratio = particle['life'] / particle['max_life']
+            size = int(particle['size'] * life_ratio)
+            if size > 0:
+                colors = [self.base_color, YELLOW, ORANGE, RED, WHITE]
+                color_idx = int((1 - life_ratio) * (len(colors) - 1))
+                color = colors[min(color_idx, len(colors) - 1)]
+                pygame.draw.circle(screen, color, (int(particle['x']), int(particle['y'])), size)
+
+def run_dicts(screen, bursts_per_tick, rng):
+    bursts = []
+    processed = 0
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        for _ in range(bursts_per_tick):
+            bursts.append(DictBurst(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), RED))
+        for burst in bursts[:]:
+            if not burst.update():
+                bursts.remove(burst)
+        for burst in bursts:
+            burst.draw(screen)
+            processed += len(burst.particles)
+    return processed / (time.perf_counter() - start)
+
+def run_pool(screen, bursts_per_tick, rng):
+    pool = ParticlePool(capacity=bursts_per_tick * PARTICLES_PER_BURST * (PARTICLE_MAX_LIFE + 1), seed=1)
+    processed = 0
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        for _ in range(bursts_per_tick):
+            pool.spawn_burst(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), RED)
+        pool.update()
+        pool.draw(screen)
+        processed += pool.count
+    return processed / (time.perf_counter() - start), processed // TICKS
+
+def main():
+    pygame.init()
+    screen = pygame.Surface((WIDTH, HEIGHT))
+    print(f"{'Bursts/tick':>12}{'Live (avg)':>12}{'Dicts p/s':>14}{'Pool p/s':>14}{'Speedup':>10}")
+    for bursts in BURSTS_PER_TICK:
+        old = run_dicts(screen, bursts, random.Random(bursts))
+        new, live = run_pool(screen, bursts, random.Random(bursts))
+        print(f"{bursts:>12}{live:>12}{old:>14,.0f}{new:>14,.0f}{new / old:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Single-threaded loop vs the pipelined modes (simulation in a worker thread or process).
+
+    python benchmarks/bench_pipeline.py [--flat-out]
+
+Every mode runs Game.run's fixed-timestep loop without the FPS cap: the
+simulation is meant to advance TICK_RATE ticks a second and the main
+thread draws as many frames as it can in between. "frames/s" is what got
+drawn and "ticks/s" how far the simulation actually got; single-threaded,
+a slow tick costs frames and a slow frame costs ticks. With --flat-out
+the worker ticks as fast as it can instead (the single-threaded loop then
+does one tick per frame). Matches that end are restarted, only the time
+spent inside a match counts. The gain depends on free cores: "process"
+needs at least two to beat "off", "thread" only overlaps the simulation
+with the parts of drawing that release the GIL.
+"""
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+from settings import *
+from pipeline import Pipeline
+from simulation import PlayerInput
+
+MODES = ("off", "thread", "process")
+WORKLOADS = (4, 500) # CPUs: a regular battle and an arena
+SECONDS = 5 # In-match time per mode and workload
+
+def attack_input():
+    return PlayerInput(attack=True)
+
+def run_match(game, seconds, flat_out):
+    """Play until the match ends or time is up, returns (frames, ticks, seconds)"""
+    scene = game.scene
+    sim = scene.sim
+    first_tick = sim.tick_count
+    frames = 0
+    accumulator = 0.0
+    start = last = time.perf_counter()
+    while game.state == "BATTLE" and time.perf_counter() - start < seconds:
+        if flat_out:
+            game.step()
+        else:
+            # Game.run, minus the clock
+            now = time.perf_counter()
+            accumulator += min((now - last) * 1000, TICK_MS * MAX_TICKS_PER_FRAME)
+            last = now
+            ticks = 0
+            while accumulator >= TICK_MS and ticks < MAX_TICKS_PER_FRAME:
+                game.step()
+                accumulator -= TICK_MS
+                ticks += 1
+            if ticks == MAX_TICKS_PER_FRAME:
+                accumulator = min(accumulator, TICK_MS)
+        game.draw(accumulator / TICK_MS)
+        frames += 1
+    # Single-threaded, the scene lets go of its simulation when the match ends
+    return frames, (scene.sim or sim).tick_count - first_tick, time.perf_counter() - start
+
+def measure(game, mode, num_cpus, flat_out):
+    game.pipeline_mode = mode
+    frames = ticks = 0
+    elapsed = 0.0
+    while elapsed < SECONDS:
+        game.start_battle(num_cpus, input_source=attack_input)
+        f, t, seconds = run_match(game, SECONDS - elapsed, flat_out)
+        frames += f
+        ticks += t
+        elapsed += seconds
+        while game.state != "MENU":
+            game.pop_scene()
+    return frames / elapsed, ticks / elapsed
+
+def main():
+    flat_out = "--flat-out" in sys.argv
+    os.chdir(tempfile.mkdtemp(prefix="bs2_pipeline_")) # Keep the save and replay files out of the way
+    from main import Game
+    game = Game()
+    game.player.username = "Bench"
+    while game.state != "MENU":
+        game.pop_scene()
+    Pipeline.realtime = not flat_out
+    print(f"{os.cpu_count()} cores, {SECONDS}s per row, {'flat out' if flat_out else f'{TICK_RATE} ticks/s target'}")
+    ok = True
+    for num_cpus in WORKLOADS:
+        print(f"{num_cpus} CPUs:")
+        base = None
+        for mode in MODES:
+            fps, tps = measure(game, mode, num_cpus, flat_out)
+            base = base or (fps, tps)
+            print(f"  {mode:<8} {fps:8.1f} frames/s  {tps:8.1f} ticks/s"
+                  f"   ({fps / base[0]:.2f}x frames, {tps / base[1]:.2f}x ticks)")
+            ok = ok and fps > 0 and tps > 0
+    if not ok:
+        print("FAIL: a mode drew no frames or ran no ticks")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
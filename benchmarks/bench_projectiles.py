@@ -0,0 +1,80 @@
+"""Per-tick cost of projectile collision at 10 to 10,000 live projectiles.
+
+    python benchmarks/bench_projectiles.py
+
+Compares the spatial hash broadphase in Simulation.update_projectiles with
+the old brute force loop (every projectile against every target and platform,
+removed with list.remove).
+"""
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+from settings import *
+from player import Player
+from simulation import Simulation
+from game_objects import Projectile
+from weapons import weapon_table
+
+COUNTS = [10, 100, 1000, 10000]
+
+def make_sim():
+    sim = Simulation(Player(), seed=1, effects=False)
+    sim.start(4, cpu_weapon="Ray Gun")
+    # Make the fighters unkillable so every tick does the same work
+    for fighter in [sim.player] + sim.battle_cpus:
+        fighter.hp = fighter.max_hp = 10 ** 9
+    return sim
+
+def spawn(sim, count, rng):
+    owners = [sim.player] + sim.battle_cpus
+    ray_gun = weapon_table.id_of("Ray Gun")
+    return [Projectile(rng.uniform(20, WIDTH - 20), rng.uniform(20, HEIGHT - 60),
+                       rng.choice((-20, 20)), rng.uniform(-2, 2), ray_gun, rng.choice(owners))
+            for _ in range(count)]
+
+def brute_force(sim):
+    # The pre-broadphase loop, kept here for comparison
+    for p in sim.projectiles[:]:
+        if not p.update():
+            sim.projectiles.remove(p)
+            continue
+        targets = sim.battle_cpus if p.owner == sim.player else [sim.player]
+        hit = False
+        for target in targets:
+            if p.rect.colliderect(target.rect):
+                target.take_damage(p.damage)
+                hit = True
+                break
+        if hit:
+            sim.projectiles.remove(p)
+        else:
+            for plat in sim.platforms:
+                if p.rect.colliderect(plat.rect):
+                    sim.projectiles.remove(p)
+                    break
+
+def measure(sim, count, tick_fn, rng):
+    reps = max(3, 20000 // count)
+    total = 0.0
+    for _ in range(reps):
+        sim.projectiles = spawn(sim, count, rng)
+        start = time.perf_counter()
+        tick_fn()
+        total += time.perf_counter() - start
+    return total / reps
+
+def main():
+    sim = make_sim()
+    print(f"{'Projectiles':>12}{'Brute force':>16}{'Spatial hash':>16}{'Speedup':>10}")
+    for count in COUNTS:
+        brute = measure(sim, count, lambda: brute_force(sim), random.Random(count))
+        hashed = measure(sim, count, sim.update_projectiles, random.Random(count))
+        print(f"{count:>12}{brute * 1000:>13.3f} ms{hashed * 1000:>13.3f} ms{brute / hashed:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
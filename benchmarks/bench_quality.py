@@ -0,0 +1,106 @@
+"""Battle frame cost at each quality tier, and the governor holding a frame budget.
+
+    python benchmarks/bench_quality.py [budget ms]
+
+Runs a 4 CPU battle on a 1920x1080 display with BURSTS explosion bursts
+going off every frame, the player's scale mode set to "smooth". "tiers"
+times a frame (tick + draw) at every QUALITY_TIERS entry. "governor" then
+starts at the best tier with a budget between the best and the cheapest
+tier's cost (or the one given) and feeds it real frame times for FRAMES
+frames; it has to end up on a tier that fits the budget, and every tier
+change has to be in the profiler's notes.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+import pygame
+from settings import *
+from simulation import PlayerInput
+from profiler import profiler
+
+DISPLAY = (1920, 1080)
+BURSTS = 12 # Per frame, about 5000 live particles at the best tier
+TIER_FRAMES = 120
+FRAMES = 2400
+COLORS = (RED, ORANGE, YELLOW, PURPLE)
+
+def frame(game, rng):
+    particles = game.scene.sim.particles
+    for _ in range(BURSTS):
+        particles.spawn_burst(rng.uniform(0, WIDTH), rng.uniform(100, HEIGHT - 100), rng.choice(COLORS))
+    start = time.perf_counter()
+    game.step()
+    game.draw(0.5)
+    return (time.perf_counter() - start) * 1000
+
+def warm_up(game, rng):
+    for _ in range(PARTICLE_MAX_LIFE):
+        frame(game, rng)
+
+def tier_costs(game):
+    rng = random.Random(1)
+    costs = []
+    for level in range(len(QUALITY_TIERS)):
+        game.quality.set_level(level)
+        warm_up(game, rng)
+        samples = [frame(game, rng) for _ in range(TIER_FRAMES)]
+        costs.append((statistics.mean(samples), game.scene.sim.particles.count, game.viewport.mode))
+    return costs
+
+def governor(game, budget):
+    rng = random.Random(2)
+    quality = game.quality
+    quality.target_ms = budget
+    quality.set_level(0)
+    notes = len(profiler.notes)
+    samples = []
+    for _ in range(FRAMES):
+        ms = frame(game, rng)
+        quality.record(ms)
+        samples.append((quality.level, ms))
+    settled = [ms for level, ms in samples[-QUALITY_WINDOW:] if level == quality.level]
+    return quality.level, statistics.mean(settled), list(profiler.notes)[notes:]
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else None
+    os.chdir(tempfile.mkdtemp(prefix="bs2_quality_")) # Keep the save file out of the way
+    from main import Game
+    game = Game()
+    pygame.display.set_mode(DISPLAY)
+    game.on_display_changed()
+    game.set_scale_mode("smooth")
+    game.player.username = "Bench"
+    while game.state != "MENU":
+        game.pop_scene()
+    game.start_battle(4, input_source=PlayerInput)
+    game.scene.sim.player.hp = game.scene.sim.player.max_hp = 10 ** 9
+
+    costs = tier_costs(game)
+    print(f"{DISPLAY[0]}x{DISPLAY[1]}, {BURSTS} bursts per frame, mean of {TIER_FRAMES} frames")
+    print("tier   ms/frame   particles   scale     labels")
+    for level, (ms, count, mode) in enumerate(costs):
+        print(f"{level:>4} {ms:10.2f} {count:11}   {mode:<9} {QUALITY_TIERS[level]['labels']}")
+
+    if budget is None:
+        budget = (costs[0][0] + costs[-1][0]) / 2
+    level, settled_ms, notes = governor(game, budget)
+    print(f"governor, budget {budget:.2f} ms: settled on tier {level} at {settled_ms:.2f} ms/frame"
+          f" after {len(notes)} changes")
+
+    if settled_ms > budget and level < len(QUALITY_TIERS) - 1:
+        print("FAIL: the governor settled over budget with cheaper tiers left")
+        return 1
+    if not notes or notes[-1][3]["tier"] != level:
+        print("FAIL: the tier changes didn't reach the profiler")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
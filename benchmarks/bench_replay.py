@@ -0,0 +1,72 @@
+"""Recorded matches have to replay to the same result, and how fast they re-simulate.
+
+    python benchmarks/bench_replay.py
+
+Plays MATCHES battles with random (but seeded) key presses while a
+ReplayRecorder records them, round-trips each recording through bytes and
+re-runs it with play_headless, twice. Every playback has to end on the
+same tick with the same result and the same fighters in the same spots
+with the same hp as the recorded match.
+"""
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+from settings import *
+from player import Player
+from simulation import Simulation, PlayerInput
+from replay import ReplayRecorder, Replay, play_headless
+
+MATCHES = [ # seed, CPUs, weapon
+    (1, 1, "Fist"),
+    (2, 3, "Ray Gun"),
+    (3, 4, "Cartoon Grenade"),
+    (4, 4, "Mega Rocket"),
+]
+MAX_TICKS = TICK_RATE * 60
+HOLD_TICKS = 12 # Ticks each random set of keys is held for
+
+def record(seed, num_cpus, weapon):
+    """Play a match with random keys, returns (replay bytes, outcome)"""
+    rng = random.Random(seed)
+    recorder = ReplayRecorder(seed, num_cpus, weapon)
+    sim = Replay(seed, num_cpus, weapon, "Street", []).make_simulation()
+    player_input = PlayerInput()
+    for tick in range(MAX_TICKS):
+        if tick % HOLD_TICKS == 0:
+            player_input = PlayerInput(left=rng.random() < 0.3, right=rng.random() < 0.4,
+                                       jump=rng.random() < 0.2, attack=rng.random() < 0.6)
+        recorder.record(player_input)
+        sim.step(player_input)
+        if sim.result:
+            break
+    return recorder.to_bytes(), outcome(sim)
+
+def outcome(sim):
+    fighters = [(fighter.rect.topleft, fighter.hp) for fighter in [sim.player] + sim.battle_cpus]
+    return sim.tick_count, sim.result, fighters
+
+def main():
+    print("seed  cpus  weapon             ticks  result  bytes  replay ticks/s")
+    ok = True
+    for seed, num_cpus, weapon in MATCHES:
+        data, recorded = record(seed, num_cpus, weapon)
+        for _ in range(2):
+            start = time.perf_counter()
+            sim = play_headless(Replay.from_bytes(data))
+            elapsed = time.perf_counter() - start
+            if outcome(sim) != recorded:
+                print(f"FAIL: seed {seed} with {num_cpus} CPUs and the {weapon} replayed differently:")
+                print(f"  recorded {recorded}")
+                print(f"  replayed {outcome(sim)}")
+                ok = False
+        print(f"{seed:4} {num_cpus:5}  {weapon:<17} {recorded[0]:6}  {str(recorded[1]):<6} {len(data):6}"
+              f" {sim.tick_count / elapsed:15.0f}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Time and allocation per frame for presenting the game surface at 1080p and 4K.
+
+    python benchmarks/bench_scaling.py
+
+"old" is the previous path: recompute the letterbox and allocate a new
+scaled surface with pygame.transform.scale every frame. The Viewport rows
+reuse one preallocated destination surface.
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+import pygame
+from settings import *
+from viewport import Viewport
+
+RESOLUTIONS = {"1080p": (1920, 1080), "4K": (3840, 2160)}
+FRAMES = 120
+
+def old_present(screen, surface):
+    # The pre-Viewport code from Game.draw
+    screen_width, screen_height = screen.get_size()
+    scale = min(screen_width / WIDTH, screen_height / HEIGHT)
+    new_w = int(WIDTH * scale)
+    new_h = int(HEIGHT * scale)
+    scaled_surface = pygame.transform.scale(surface, (new_w, new_h))
+    screen.fill(BLACK)
+    screen.blit(scaled_surface, ((screen_width - new_w) // 2, (screen_height - new_h) // 2))
+    return new_w * new_h * scaled_surface.get_bytesize()
+
+def time_frames(present):
+    start = time.perf_counter()
+    allocated = 0
+    for _ in range(FRAMES):
+        allocated += present() or 0
+    return (time.perf_counter() - start) / FRAMES * 1000, allocated / FRAMES
+
+def main():
+    pygame.init()
+    surface = pygame.Surface((WIDTH, HEIGHT))
+    surface.fill(LIGHT_BLUE)
+    print(f"{'Output':<8}{'Path':<12}{'ms/frame':>10}{'Alloc/frame':>14}")
+    for label, size in RESOLUTIONS.items():
+        screen = pygame.Surface(size)
+        ms, alloc = time_frames(lambda: old_present(screen, surface))
+        print(f"{label:<8}{'old':<12}{ms:>10.2f}{alloc / 1e6:>11.1f} MB")
+        for mode in ("nearest", "smooth", "integer"):
+            viewport = Viewport(size, mode)
+            ms, alloc = time_frames(lambda: viewport.present(screen, surface))
+            print(f"{label:<8}{mode:<12}{ms:>10.2f}{alloc / 1e6:>11.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Shop scrolling with a large modded weapon catalog.
+
+    python benchmarks/bench_shop.py
+
+Fills WEAPONS_DATA up to each catalog size, opens the shop and scrolls
+through it one mouse-wheel notch per frame. "old" is the previous
+update_shop_buttons: sort the whole catalog and build a Button for every
+visible row on each notch.
+"""
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+import pygame
+from settings import *
+from ui import Button
+
+CATALOG_SIZES = [31, 1000, 10000]
+NOTCHES = 300
+
+def old_shop_buttons(player, shop_scroll):
+    # The pre-ListView Game.update_shop_buttons
+    shop_buttons = []
+    start_y = 100
+    btn_height = 50
+    padding = 10
+    sorted_weapons = sorted(WEAPONS_DATA.items(), key=lambda x: x[1]['cost'])
+    for i, (name, data) in enumerate(sorted_weapons):
+        color = WHITE
+        status = f"{data['cost']} Coins"
+        if name in player.inventory:
+            color = LIGHT_BLUE
+            status = "Owned"
+            if name == player.current_weapon_name:
+                color = GREEN
+                status = "Equipped"
+        btn_text = f"{name} ({data['damage']} dmg) - {status}"
+        y_pos = start_y + i * (btn_height + padding) - shop_scroll
+        if 50 < y_pos < HEIGHT - 50:
+            shop_buttons.append(Button(WIDTH/2 - 250, y_pos, 500, btn_height, btn_text, font_size=24, bg_color=color))
+    return shop_buttons
+
+def fill_catalog(size, rng_seed=1):
+    import random
+    rng = random.Random(rng_seed)
+    base = dict(WEAPONS_DATA)
+    WEAPONS_DATA.clear()
+    WEAPONS_DATA.update(base)
+    i = 0
+    while len(WEAPONS_DATA) < size:
+        WEAPONS_DATA[f"Mod Weapon {i}"] = {"damage": rng.randint(1, 60), "cost": rng.randint(0, 5000),
+                                          "speed": rng.randint(5, 30), "color": (200, 200, 200),
+                                          "explosion": False, "melee": False}
+        i += 1
+    return base
+
+def main():
+    os.chdir(tempfile.mkdtemp(prefix="bs2_shop_"))
+    from main import Game
+    from scenes import ShopScene
+
+    game = Game()
+    wheel = pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=-1, flipped=False)
+    mouse = (WIDTH / 2, HEIGHT / 2)
+
+    print(f"{'catalog':>8} {'old ms/notch':>13} {'new ms/notch':>13} {'new ms/frame':>13}")
+    for size in CATALOG_SIZES:
+        base = fill_catalog(size)
+
+        start = time.perf_counter()
+        for notch in range(NOTCHES):
+            old_shop_buttons(game.player, notch * 20)
+        old = (time.perf_counter() - start) / NOTCHES * 1000
+
+        game.push_scene(ShopScene(game))
+        shop = game.scene
+        start = time.perf_counter()
+        for _ in range(NOTCHES):
+            shop.handle_event(wheel, mouse)
+        new = (time.perf_counter() - start) / NOTCHES * 1000
+
+        # Scroll + full shop redraw + present, what a real frame costs
+        start = time.perf_counter()
+        for _ in range(NOTCHES):
+            shop.handle_event(wheel, mouse)
+            game.draw()
+        frame = (time.perf_counter() - start) / NOTCHES * 1000
+        game.pop_scene()
+
+        WEAPONS_DATA.clear()
+        WEAPONS_DATA.update(base)
+        print(f"{size:>8} {old:>13.3f} {new:>13.3f} {frame:>13.3f}")
+
+if __name__ == "__main__":
+    main()
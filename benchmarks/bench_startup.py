@@ -0,0 +1,120 @@
+"""Startup time: how long until the menu is on screen and the weapon textures are in.
+
+    python benchmarks/bench_startup.py
+
+Each launch runs in a fresh interpreter. "cold" deletes the texture pack
+first so it has to be rebuilt from the PNGs, "warm" reuses it. The "old"
+row is the previous load_resources: decode and scale every PNG on the main
+thread before the first frame (it skips building the rest of Game, so its
+menu time is a lower bound). Most of a launch is importing pygame and NumPy,
+so the texture loading is also timed on its own.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+GAME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe")
+sys.path.insert(0, GAME_DIR)
+
+RUNS = 5
+LOADER_RUNS = 20
+
+def old_load_resources():
+    # The pre-pack Game.load_resources
+    import pygame
+    from settings import WEAPON_FILES
+    textures = {}
+    weapons_dir = os.path.join(GAME_DIR, "weapons")
+    for name, filename in WEAPON_FILES.items():
+        path = os.path.join(weapons_dir, filename)
+        if os.path.exists(path):
+            img = pygame.image.load(path).convert_alpha()
+            if img.get_width() > 60:
+                scale = 60 / img.get_width()
+                img = pygame.transform.scale(img, (int(img.get_width() * scale), int(img.get_height() * scale)))
+            textures[name] = img
+    return textures
+
+def child(mode):
+    """One launch, prints its timings as JSON"""
+    start = time.perf_counter()
+    import pygame
+    os.chdir(tempfile.mkdtemp(prefix="bs2_startup_")) # Keep the save file out of the way
+    if mode == "old":
+        import main # Same imports as a real launch
+        from settings import WIDTH, HEIGHT
+        pygame.init()
+        pygame.display.set_mode((WIDTH, HEIGHT))
+        old_load_resources()
+        menu = textures = time.perf_counter() - start
+    else:
+        from main import Game
+        game = Game()
+        game.draw()
+        menu = time.perf_counter() - start
+        game.texture_loader.wait()
+        game.poll_resources()
+        textures = time.perf_counter() - start
+        assert game.weapon_textures, "no textures loaded"
+    print(json.dumps({"menu": menu * 1000, "textures": textures * 1000}))
+
+def time_loaders():
+    """Just the texture loading, in this process, without interpreter startup"""
+    import pygame
+    import texture_pack
+    pygame.init()
+    pygame.display.set_mode((100, 100))
+    scratch = tempfile.mkdtemp(prefix="bs2_pack_")
+    paths = {"pack_path": os.path.join(scratch, "weapons.pack"), "index_path": os.path.join(scratch, "weapons.pack.json")}
+
+    def cold():
+        if os.path.exists(paths["index_path"]):
+            os.remove(paths["index_path"])
+        texture_pack.load_textures(**paths)
+
+    timings = {}
+    for mode, load in (("old", old_load_resources), ("cold", cold), ("warm", lambda: texture_pack.load_textures(**paths))):
+        start = time.perf_counter()
+        for _ in range(LOADER_RUNS):
+            load()
+        timings[mode] = (time.perf_counter() - start) / LOADER_RUNS * 1000
+    pygame.quit()
+    return timings
+
+def launch(mode):
+    out = subprocess.run([sys.executable, __file__, "--child", mode], capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    from settings import TEXTURE_PACK, TEXTURE_INDEX
+    pack_files = [os.path.join(GAME_DIR, TEXTURE_PACK), os.path.join(GAME_DIR, TEXTURE_INDEX)]
+
+    rows = {"old": [], "cold": [], "warm": []}
+    for _ in range(RUNS):
+        rows["old"].append(launch("old"))
+        for path in pack_files:
+            if os.path.exists(path):
+                os.remove(path)
+        rows["cold"].append(launch("cold"))
+        rows["warm"].append(launch("warm"))
+
+    print(f"{'launch':>8} {'menu ms':>10} {'textures ms':>12}   (median of {RUNS})")
+    for mode, runs in rows.items():
+        menu = statistics.median(r["menu"] for r in runs)
+        textures = statistics.median(r["textures"] for r in runs)
+        print(f"{mode:>8} {menu:>10.1f} {textures:>12.1f}")
+
+    print(f"\n{'loader':>8} {'ms':>10}   (texture loading only, mean of {LOADER_RUNS})")
+    for mode, ms in time_loaders().items():
+        print(f"{mode:>8} {ms:>10.2f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        child(sys.argv[2])
+    else:
+        main()
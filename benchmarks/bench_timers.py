@@ -0,0 +1,73 @@
+"""Per-tick cost of timed state: polling every entity vs the simulation's TimerWheel.
+
+    python benchmarks/bench_timers.py
+
+Every entity holds one timer at a time, from an attack pose or cooldown
+to a long shot lifetime (12 to 900 ticks), and starts another when it
+runs out. "poll" checks every entity's due tick every tick, the way
+cooldowns and lifetimes used to be checked; "wheel" schedules each timer
+once and only touches it when it fires. Both have to fire the same
+number of timers.
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+from settings import *
+from timers import TimerWheel
+
+COUNTS = (100, 1000, 10000)
+TICKS = 3000
+DURATIONS = (12, 15, 18, 30, ROLES["Trapper"]["trap_duration"], ROLES["Engineer"]["vent_duration"], 900)
+
+def length(entity, k):
+    """How long entity's k-th timer runs, the same for both runs"""
+    return DURATIONS[(entity * 7 + k * 3) % len(DURATIONS)]
+
+def poll(count):
+    started = [1] * count
+    due = [length(i, 0) for i in range(count)]
+    fired = 0
+    start = time.perf_counter()
+    for tick in range(1, TICKS + 1):
+        for i in range(count):
+            if due[i] <= tick:
+                due[i] = tick + length(i, started[i])
+                started[i] += 1
+                fired += 1
+    return (time.perf_counter() - start) / TICKS * 1e6, fired
+
+def wheel(count):
+    timers = TimerWheel()
+    started = [1] * count
+    fired = 0
+    def done(i):
+        nonlocal fired
+        fired += 1
+        timers.schedule(length(i, started[i]), done, i)
+        started[i] += 1
+    for i in range(count):
+        timers.schedule(length(i, 0), done, i)
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        timers.advance()
+    return (time.perf_counter() - start) / TICKS * 1e6, fired
+
+def main():
+    print(f"{TICKS} ticks, one timer per entity at a time")
+    print("entities   fired/tick   poll us/tick   wheel us/tick")
+    ok = True
+    for count in COUNTS:
+        poll_us, poll_fired = poll(count)
+        wheel_us, wheel_fired = wheel(count)
+        print(f"{count:>8} {wheel_fired / TICKS:>12.1f} {poll_us:>14.1f} {wheel_us:>15.1f}   ({poll_us / wheel_us:.1f}x)")
+        if poll_fired != wheel_fired:
+            print(f"FAIL: polling fired {poll_fired} timers, the wheel {wheel_fired}")
+            ok = False
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Scrolling through a world 100 screens wide.
+
+    python benchmarks/bench_world.py
+
+Generates the map in a scratch dir and registers it in MAPS as "Wide".
+"sweep" drags the player from one end of the world to the other, one
+battle frame (tick + draw) at a time, and reports frame times and how many
+background chunks were baked and are still held. Chunk memory has to stay
+within CHUNK_CACHE_SIZE chunks the whole way. "far ticks" times the
+simulation with 100 CPUs spread along the world, with far CPUs on the
+lower tick rate and with every CPU updated every tick.
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+from settings import *
+import map_loader
+import simulation
+from player import Player
+from simulation import Simulation, PlayerInput
+
+SCREENS = 100
+SWEEP_STEP = 40 # Pixels the player is moved per frame
+FAR_CPUS = 100
+FAR_TICKS = 600
+
+def write_wide_map(path, screens=SCREENS, seed=1):
+    rng = random.Random(seed)
+    width = WIDTH * screens
+    platforms = [{"x": 0, "y": HEIGHT - 50, "width": width, "height": 50}]
+    x = 100
+    while x < width - 300:
+        platforms.append({"x": x, "y": rng.choice((HEIGHT - 150, HEIGHT - 250, HEIGHT - 400)),
+                          "width": rng.randint(100, 250), "height": 20})
+        x += rng.randint(150, 400)
+    with open(path, 'w') as f:
+        json.dump({"width": width, "height": HEIGHT, "platforms": platforms}, f)
+    return len(platforms)
+
+def sweep(game):
+    game.load_map("Wide")
+    game.start_battle(4, input_source=PlayerInput)
+    scene = game.scene
+    player = scene.sim.player
+    player.hp = player.max_hp = 10 ** 9
+    chunks = game.chunks
+    samples = []
+    most_chunks = 0
+    most_bytes = 0
+    for x in range(100, scene.sim.world_width - 100, SWEEP_STEP):
+        player.rect.x = x
+        player.save_position()
+        start = time.perf_counter()
+        game.step()
+        game.draw(0.5)
+        samples.append((time.perf_counter() - start) * 1000)
+        most_chunks = max(most_chunks, len(chunks.surfaces))
+        most_bytes = max(most_bytes, chunks.memory_bytes())
+    while game.state != "MENU":
+        game.pop_scene()
+    samples.sort()
+    return {
+        "frames": len(samples),
+        "mean_ms": statistics.mean(samples),
+        "p95_ms": samples[int(len(samples) * 0.95)],
+        "builds": chunks.builds,
+        "most_chunks": most_chunks,
+        "most_mb": most_bytes / 2 ** 20,
+    }
+
+def far_ticks():
+    player = Player("Bench")
+    sim = Simulation(player, seed=3, effects=False)
+    sim.load_map("Wide")
+    sim.start(FAR_CPUS, seed=3)
+    for i, cpu in enumerate(sim.battle_cpus):
+        cpu.rect.x = 500 + i * (sim.world_width - 1000) // FAR_CPUS
+        cpu.save_position()
+    player.hp = player.max_hp = 10 ** 9
+    start = time.perf_counter()
+    for _ in range(FAR_TICKS):
+        sim.step(PlayerInput())
+    return (time.perf_counter() - start) / FAR_TICKS * 1000
+
+def main():
+    scratch = tempfile.mkdtemp(prefix="bs2_world_")
+    map_loader.MAP_CACHE_DIR = os.path.join(scratch, "compiled")
+    path = os.path.join(scratch, "wide.json")
+    count = write_wide_map(path)
+    MAPS["Wide"] = dict(MAPS["Street"], file=path, name="100 Screens")
+    print(f"world {WIDTH * SCREENS}x{HEIGHT}, {count} platforms, {CHUNK_SIZE}px chunks, cache {CHUNK_CACHE_SIZE}")
+
+    os.chdir(scratch) # Keep the save file out of the way
+    from main import Game
+    game = Game()
+    game.player.username = "Bench"
+    while game.state != "MENU":
+        game.pop_scene()
+    result = sweep(game)
+    game.load_map("Street")
+    print(f"sweep: {result['frames']} frames, mean {result['mean_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms")
+    print(f"       {result['builds']} chunks baked, at most {result['most_chunks']} held ({result['most_mb']:.1f} MB)")
+
+    lower = far_ticks()
+    interval = simulation.FAR_TICK_INTERVAL
+    simulation.FAR_TICK_INTERVAL = 1
+    full = far_ticks()
+    simulation.FAR_TICK_INTERVAL = interval
+    print(f"far ticks, {FAR_CPUS} CPUs: every tick {full:.3f} ms/tick, far every {interval} ticks {lower:.3f} ms/tick"
+          f" ({full / lower:.1f}x)")
+
+    if result["most_chunks"] > CHUNK_CACHE_SIZE:
+        print("FAIL: chunk cache grew past CHUNK_CACHE_SIZE")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Soak test: many back-to-back matches through the real scene stack.
+
+    python benchmarks/soak_matches.py [--matches 1000]
+
+Each match is started from the menu the same way a player would (CPU select
+then battle), the CPU AI drives the player and every few ticks a frame is
+drawn. Fails if memory or the Python stack keeps growing from match to match.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Battle Street 2 Deluxe"))
+
+import pygame
+from settings import *
+from save_manager import flush_saves
+
+MAX_MATCH_TICKS = TICK_RATE * 120
+DRAW_EVERY = 10 # Ticks between drawn frames
+WARMUP = 50 # Matches before the memory baseline is taken
+MEMORY_SLACK = 256 * 1024 # Bytes of growth allowed after warmup
+
+def stack_depth():
+    depth = 0
+    frame = sys._getframe(1)
+    while frame:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--matches", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Saves and replays land in a scratch directory, not next to the real save
+    os.chdir(tempfile.mkdtemp(prefix="bs2_soak_"))
+
+    from main import Game
+    from scenes import CpuSelectScene, BattleScene
+
+    game = Game()
+    game.player.username = "Soak"
+    while game.state != "MENU":
+        game.pop_scene()
+
+    depths = set()
+    def ai_input():
+        if battle.sim.tick_count == 0:
+            depths.add(stack_depth())
+        return None # Let the CPU AI play for us
+
+    results = {"win": 0, "loss": 0}
+    battle = None
+    baseline = None
+    warmup = min(WARMUP, args.matches // 2)
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    for match in range(args.matches):
+        if match == warmup:
+            flush_saves()
+            baseline = tracemalloc.get_traced_memory()[0]
+            depths.clear()
+
+        game.push_scene(CpuSelectScene(game))
+        game.switch_scene(BattleScene(game, 1 + match % 4, input_source=ai_input))
+        battle = game.scene
+        ticks = 0
+        while game.scene is battle and ticks < MAX_MATCH_TICKS:
+            game.step()
+            ticks += 1
+            if ticks % DRAW_EVERY == 0 and game.scene is battle:
+                game.draw()
+        if game.scene is battle:
+            game.pop_scene() # Timed out
+        results["win" if game.message.startswith("You Won") else "loss"] += 1
+        game.draw()
+
+        if len(game.scenes) != 1 or game.state != "MENU":
+            print(f"Scene stack leaked after match {match}: {[s.name for s in game.scenes]}")
+            return 1
+
+    flush_saves()
+    elapsed = time.perf_counter() - start
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    growth = current - (baseline or current)
+    print(f"{args.matches} matches in {elapsed:.1f}s  "
+          f"({results['win']} won, {results['loss']} lost)")
+    print(f"Memory after warmup: {baseline or current} -> {current} bytes ({growth:+d})")
+    print(f"Stack depth inside update: {sorted(depths)}")
+
+    failed = False
+    if growth > MEMORY_SLACK:
+        print("FAIL: memory grew across matches")
+        failed = True
+    if len(depths) > 1:
+        print("FAIL: stack depth changed across matches")
+        failed = True
+    pygame.quit()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""Headless benchmark suite, checked against benchmarks/baseline.json.
+
+    python benchmarks/suite.py                    # run everything, compare to the baseline
+    python benchmarks/suite.py --only particle_storm battle_projectile_spam
+    python benchmarks/suite.py --update-baseline  # after an intended speed change
+
+Every scenario times each tick or frame on its own and reports ticks/sec
+and p50/p95/p99 of its fastest of REPEATS runs. A short fixed workload is timed first as a calibration,
+and baseline ticks/sec are scaled by it, so a slower CI machine is not
+mistaken for a regression. Exits with 1 if any scenario's ticks/sec falls
+more than --threshold below its (scaled) baseline.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "Battle Street 2 Deluxe"))
+
+import pygame
+from settings import *
+
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+THRESHOLD = 0.30 # Allowed drop in ticks/sec before a scenario fails
+REPEATS = 3 # Each scenario keeps its fastest run, the others are mostly noise
+
+SCENARIOS = {}
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+def timed(iterations, body):
+    """Run body(i) iterations times, returns each call's duration in seconds"""
+    perf = time.perf_counter
+    samples = []
+    for i in range(iterations):
+        start = perf()
+        body(i)
+        samples.append(perf() - start)
+    return samples
+
+# --- Shared setup ---
+
+_game = None
+
+def get_game():
+    """One Game for the scenarios that need the real screens, saving into a scratch dir"""
+    global _game
+    if _game is None:
+        os.chdir(tempfile.mkdtemp(prefix="bs2_suite_"))
+        from main import Game
+        _game = Game()
+        _game.player.username = "Bench"
+        while _game.state != "MENU":
+            _game.pop_scene()
+    return _game
+
+def calibrate():
+    """Fixed pure-Python + pygame workload, in iterations per second"""
+    surface = pygame.Surface((256, 256))
+    rects = [pygame.Rect(i % 200, i % 180, 20, 20) for i in range(64)]
+    def body(i):
+        total = 0
+        for j in range(2000):
+            total += j * j % 7
+        for rect in rects:
+            surface.fill((i % 255, 0, 0), rect)
+        return total
+    return max(summarize(timed(400, body))["ticks_per_sec"] for _ in range(REPEATS))
+
+# --- Scenarios ---
+
+@scenario
+def battle_projectile_spam():
+    """4 CPUs with explosive weapons attacking every tick, nobody dies"""
+    from player import Player
+    from simulation import Simulation
+    player = Player("Bench")
+    sim = Simulation(player, effects=True)
+    player.inventory.append("Mega Rocket")
+    player.equip_weapon("Mega Rocket")
+    sim.start(4, seed=1234)
+    fighters = [player] + sim.battle_cpus
+    for fighter in fighters:
+        fighter.hp = fighter.max_hp = 10 ** 9
+
+    def tick(i):
+        for fighter in fighters:
+            sim.cancel_timer(fighter, "cooldown")
+            sim.perform_attack(fighter)
+        sim.step()
+    return timed(600, tick)
+
+@scenario
+def particle_storm():
+    """20 ExplosionParticle bursts a tick into the shared pool, updated and drawn"""
+    from game_objects import ExplosionParticle
+    from particles import ParticlePool
+    pool = ParticlePool(seed=1)
+    surface = pygame.Surface((WIDTH, HEIGHT))
+    rng = random.Random(1)
+    colors = [RED, BLUE, GREEN, PURPLE]
+
+    def tick(i):
+        for _ in range(20):
+            ExplosionParticle(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), colors[i % 4], pool)
+        pool.update()
+        pool.draw(surface)
+    return timed(600, tick)
+
+@scenario
+def player_draw_many():
+    """Player.draw for 200 players with weapon textures, half facing left"""
+    from player import Player
+    game = get_game()
+    game.texture_loader.wait()
+    game.poll_resources()
+    surface = pygame.Surface((WIDTH, HEIGHT))
+    rng = random.Random(1)
+    names = list(WEAPON_FILES)
+    players = []
+    for i in range(200):
+        p = Player(f"P{i}", is_cpu=True, rng=rng)
+        p.rect.topleft = (rng.randint(0, WIDTH - 50), rng.randint(60, HEIGHT - 100))
+        p.save_position()
+        p.inventory.append(names[i % len(names)])
+        p.equip_weapon(names[i % len(names)])
+        p.facing_right = i % 2 == 0
+        players.append(p)
+
+    def frame(i):
+        surface.fill(LIGHT_BLUE)
+        for p in players:
+            p.draw(surface, game.weapon_textures, 0.5, game.weapon_textures_flipped)
+    return timed(300, frame)
+
+@scenario
+def shop_scroll():
+    """Shop over WEAPONS_DATA, one wheel notch and a full redraw per frame"""
+    from scenes import ShopScene
+    game = get_game()
+    game.push_scene(ShopScene(game))
+    shop = game.scene
+    mouse = (WIDTH / 2, HEIGHT / 2)
+    down = pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=-1, flipped=False)
+    up = pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=1, flipped=False)
+
+    def frame(i):
+        # Scroll to the bottom and back so every frame changes something
+        shop.handle_event(down if (i // 60) % 2 == 0 else up, mouse)
+        game.draw()
+    samples = timed(600, frame)
+    game.pop_scene()
+    return samples
+
+@scenario
+def save_round_trip():
+    """save_game through the background writer, flushed to disk, then load_game"""
+    from player import Player
+    from save_manager import save_game, flush_saves, load_game
+    path = os.path.join(tempfile.mkdtemp(prefix="bs2_save_"), "save.json")
+    player = Player("Bench")
+
+    def round_trip(i):
+        player.coins = i
+        save_game(player, path)
+        flush_saves()
+        assert load_game(path)["coins"] == i
+    return timed(100, round_trip)
+
+@scenario
+def startup_load_resources():
+    """Game.load_resources until the weapon textures are usable (warm texture pack)"""
+    game = get_game()
+
+    def load(i):
+        game.load_resources()
+        game.texture_loader.wait()
+        game.poll_resources()
+    load(0) # Make sure the pack exists, this is the warm path
+    return timed(30, load)
+
+# --- Reporting ---
+
+def summarize(samples):
+    ordered = sorted(samples)
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+    return {
+        "ticks_per_sec": len(samples) / sum(samples),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+def load_baseline():
+    if not os.path.exists(BASELINE_FILE):
+        return None
+    with open(BASELINE_FILE, 'r') as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=sorted(SCENARIOS), help="Run just these scenarios")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Allowed ticks/sec drop, 0.3 = 30%%")
+    parser.add_argument("--update-baseline", action="store_true", help=f"Write the results to {os.path.basename(BASELINE_FILE)}")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json) # Some scenarios chdir to a scratch dir
+
+    pygame.init()
+    pygame.display.set_mode((WIDTH, HEIGHT))
+    baseline = load_baseline()
+    calibration = calibrate()
+    # Baseline numbers are scaled by how fast this machine is compared to the baseline one
+    speed = calibration / baseline["calibration"] if baseline else 1.0
+
+    results = {}
+    failed = []
+    print(f"calibration {calibration:.0f}/s ({speed:.2f}x the baseline machine)")
+    print(f"{'scenario':<24} {'ticks/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'vs base':>9}")
+    for name in args.only or SCENARIOS:
+        stats = max((summarize(SCENARIOS[name]()) for _ in range(REPEATS)), key=lambda run: run["ticks_per_sec"])
+        results[name] = stats
+        change = ""
+        base = baseline and baseline["scenarios"].get(name)
+        if base:
+            expected = base["ticks_per_sec"] * speed
+            ratio = stats["ticks_per_sec"] / expected
+            change = f"{(ratio - 1) * 100:+.0f}%"
+            if ratio < 1 - args.threshold:
+                failed.append(name)
+                change += " FAIL"
+        print(f"{name:<24} {stats['ticks_per_sec']:>10.1f} {stats['p50_ms']:>8.3f} "
+              f"{stats['p95_ms']:>8.3f} {stats['p99_ms']:>8.3f} {change:>9}")
+
+    output = {"calibration": calibration, "scenarios": results}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(output, f, indent=2)
+    if args.update_baseline:
+        if baseline and args.only:
+            # Keep the scenarios that weren't rerun, rescaled to this machine
+            for name, stats in baseline["scenarios"].items():
+                if name not in results:
+                    results[name] = dict(stats, ticks_per_sec=stats["ticks_per_sec"] * speed)
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f"Baseline written to {BASELINE_FILE}")
+    elif not baseline:
+        print("No baseline yet, run with --update-baseline to record one")
+
+    if failed:
+        print(f"Regressed more than {args.threshold:.0%}: {', '.join(failed)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())